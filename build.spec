@@ -16,11 +16,28 @@ hiddenimports = collect_submodules('pyqtlet2') + [
     'PyQt5.QtWebChannel',
     'PyQt5.QtWebEngineCore',
     # Ajouter vos modules personnalisés
+    'core.aggregates',
+    'core.cache',
     'core.gpx',
+    'core.geo',
+    'core.gpx_stream',
+    'core.importer',
+    'core.map_view',
+    'core.metrics',
+    'core.point_memory',
+    'core.points',
+    'core.profile',
+    'core.settings',
+    'core.shared_points',
+    'core.simplify',
+    'core.spatial_index',
     'core.user_config',
     'utils.calculator',
+    'utils.metrics_cache',
     'utils.info_display',
     'utils.export_data',
+    'utils.export_engine',
+    'utils.point_export',
 ]
 
 a = Analysis(
@@ -0,0 +1,165 @@
+"""
+Agrégats incrémentaux sur les traces chargées
+"""
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class BoundsAggregate:
+    """
+    Union des emprises d'un ensemble de traces, tenue à jour à chaque ajout ou retrait.
+
+    Un ajout élargit l'union en O(1). Un retrait ne force un recalcul (en
+    O(nombre de traces), au prochain union()) que si l'emprise retirée touchait
+    un bord de l'union.
+    """
+
+    def __init__(self):
+        self._members: Dict[Hashable, list] = {}
+        self._union: Optional[list] = None
+        self._dirty = False
+
+    def add(self, key: Hashable, bounds):
+        """Ajoute l'emprise [[lat_min, lon_min], [lat_max, lon_max]] d'une trace"""
+        if not bounds:
+            return
+        if key in self._members:
+            self.remove(key)
+        self._members[key] = bounds
+        if not self._dirty:
+            self._union = _merge(self._union, bounds)
+
+    def remove(self, key: Hashable):
+        bounds = self._members.pop(key, None)
+        if bounds is None or self._dirty:
+            return
+        if not self._members:
+            self._union = None
+        elif _touches(self._union, bounds):
+            self._dirty = True
+
+    def clear(self):
+        self._members.clear()
+        self._union = None
+        self._dirty = False
+
+    def union(self) -> Optional[list]:
+        """Emprise englobant toutes les traces, ou None si aucune"""
+        if self._dirty:
+            self._union = None
+            for bounds in self._members.values():
+                self._union = _merge(self._union, bounds)
+            self._dirty = False
+        return self._union
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, key):
+        return key in self._members
+
+
+class TraceTotals:
+    """Sommes des statistiques d'un ensemble de traces"""
+    __slots__ = ('count', 'distance_km', 'denivele_positif', 'denivele_negatif',
+                 'nb_points', 'duration_s')
+
+    def __init__(self):
+        self.count = 0
+        self.distance_km = 0.0
+        self.denivele_positif = 0.0
+        self.denivele_negatif = 0.0
+        self.nb_points = 0
+        self.duration_s = 0.0
+
+    def apply(self, contribution: Tuple, sign: int):
+        distance_km, denivele_positif, denivele_negatif, nb_points, duration_s = contribution
+        self.count += sign
+        if self.count == 0:
+            # Repart de zéro plutôt que de garder les erreurs d'arrondi des soustractions
+            self.__init__()
+            return
+        self.distance_km += sign * distance_km
+        self.denivele_positif += sign * denivele_positif
+        self.denivele_negatif += sign * denivele_negatif
+        self.nb_points += sign * nb_points
+        self.duration_s += sign * duration_s
+
+    def duree_dict(self) -> Dict[str, int]:
+        """Durée totale au format {'heures', 'minutes', 'secondes'}"""
+        return {
+            'heures': int(self.duration_s // 3600),
+            'minutes': int((self.duration_s % 3600) // 60),
+            'secondes': int(self.duration_s % 60)
+        }
+
+
+class TraceAggregate:
+    """
+    Totaux d'un ensemble de traces, globaux et par activité.
+
+    Chaque ajout ou retrait est en O(1) : l'affichage des statistiques globales
+    ne reparcourt pas les traces.
+    """
+
+    def __init__(self):
+        self.totals = TraceTotals()
+        self.by_activity: Dict[str, TraceTotals] = {}
+        self._members: Dict[Hashable, Tuple[str, Tuple]] = {}
+
+    def add(self, key: Hashable, gpx_data: Dict):
+        """Ajoute une trace (dict retourné par get_info, avec son activité)"""
+        if key in self._members:
+            return
+        summary = gpx_data['summary']
+        contribution = (
+            summary.distance_km,
+            summary.denivele_positif,
+            summary.denivele_negatif,
+            summary.nb_points,
+            summary.duration_s,
+        )
+        activity = gpx_data.get('activity_display', 'Non défini')
+        self._members[key] = (activity, contribution)
+        self.totals.apply(contribution, 1)
+        self.by_activity.setdefault(activity, TraceTotals()).apply(contribution, 1)
+
+    def remove(self, key: Hashable):
+        member = self._members.pop(key, None)
+        if member is None:
+            return
+        activity, contribution = member
+        self.totals.apply(contribution, -1)
+        subtotal = self.by_activity[activity]
+        subtotal.apply(contribution, -1)
+        if subtotal.count == 0:
+            del self.by_activity[activity]
+
+    def clear(self):
+        self.totals = TraceTotals()
+        self.by_activity.clear()
+        self._members.clear()
+
+    def activity_counts(self) -> Dict[str, int]:
+        """Nombre de traces par activité (dans l'ordre d'apparition)"""
+        return {activity: subtotal.count for activity, subtotal in self.by_activity.items()}
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, key):
+        return key in self._members
+
+
+def _merge(union, bounds):
+    if union is None:
+        return [list(bounds[0]), list(bounds[1])]
+    return [
+        [min(union[0][0], bounds[0][0]), min(union[0][1], bounds[0][1])],
+        [max(union[1][0], bounds[1][0]), max(union[1][1], bounds[1][1])]
+    ]
+
+
+def _touches(union, bounds):
+    """Vrai si l'emprise contribue à un bord de l'union"""
+    return (bounds[0][0] <= union[0][0] or bounds[0][1] <= union[0][1]
+            or bounds[1][0] >= union[1][0] or bounds[1][1] >= union[1][1])
@@ -0,0 +1,313 @@
+"""
+Cache disque des fichiers GPX déjà analysés, adressé par le contenu du fichier
+"""
+import hashlib
+import json
+import os
+import os.path
+import shutil
+import time
+import uuid
+from datetime import datetime
+from os import getcwd
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from core.gpx_stream import map_file
+from core.metrics import TrackSummary
+from core.points import PointStore
+
+CACHE_DIR = os.path.join(getcwd(), "ressources", "cache")
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 Mo
+
+LOCK_STALE_SECONDS = 60
+
+COLUMNS = ('latitudes', 'longitudes', 'elevations', 'times', 'validity')
+SUMMARY_FILE = 'summary.json'
+SIGNIFICANCE_FILE = 'significance.npy'
+
+# Index fichier → empreinte, pour retrouver un résumé sans relire le fichier
+FILES_DIR = 'files'
+
+# Âge minimal d'une entrée d'index supprimée faute d'entrée de cache : l'index
+# est écrit avant la publication de l'entrée (analyse en cours)
+INDEX_STALE_SECONDS = 60
+
+
+def buffer_content_hash(buffer) -> str:
+    """Empreinte BLAKE2b d'un tampon binaire (clé du cache), sans copie"""
+    return hashlib.blake2b(buffer, digest_size=20).hexdigest()
+
+
+def file_content_hash(filepath: str) -> str:
+    """Empreinte BLAKE2b du contenu d'un fichier (clé du cache)"""
+    with map_file(filepath) as buffer:
+        return buffer_content_hash(buffer)
+
+
+class CachedParse:
+    """Résultat d'analyse relu depuis le cache"""
+
+    def __init__(self, points: PointStore, cumulative_distance: np.ndarray,
+                 summary: TrackSummary, metadata: Dict, source_type: Optional[str]):
+        self.points = points
+        self.cumulative_distance = cumulative_distance
+        self.summary = summary
+        self.metadata = metadata
+        self.source_type = source_type
+
+
+class ParseCache:
+    """
+    Cache des points (colonnes .npy projetées en mémoire) et des résumés.
+
+    Chaque entrée est un dossier nommé par l'empreinte du fichier GPX. Les
+    entrées sont publiées par renommage atomique, ce qui permet à plusieurs
+    processus de partager le cache. Au-delà de max_bytes, les entrées les
+    moins récemment utilisées sont supprimées.
+
+    Args:
+        directory: Dossier du cache
+        max_bytes: Taille maximale du cache en octets
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"v{CACHE_FORMAT_VERSION}-{key}")
+
+    def get(self, key: str) -> Optional[CachedParse]:
+        """Retourne l'entrée associée à la clé, ou None si absente"""
+        entry = self._entry_path(key)
+        try:
+            summary, metadata, source_type = self._read_summary(entry)
+            columns = [np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r')
+                       for name in COLUMNS]
+            cumulative = np.load(os.path.join(entry, "cumulative_distance.npy"), mmap_mode='r')
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+        # Marque l'entrée comme récemment utilisée (LRU)
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        return CachedParse(
+            points=PointStore(*columns),
+            cumulative_distance=cumulative,
+            summary=summary,
+            metadata=metadata,
+            source_type=source_type,
+        )
+
+    def get_summary(self, key: str) -> Optional[Tuple[TrackSummary, Dict, Optional[str]]]:
+        """Retourne (résumé, métadonnées, type de source) sans ouvrir les colonnes de points"""
+        try:
+            return self._read_summary(self._entry_path(key))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _read_summary(self, entry: str):
+        with open(os.path.join(entry, SUMMARY_FILE), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+
+        metadata = dict(info['metadata'])
+        if metadata.get('date_creation'):
+            metadata['date_creation'] = datetime.fromisoformat(metadata['date_creation'])
+
+        return TrackSummary.from_dict(info['summary']), metadata, info['source_type']
+
+    def get_significance(self, key: str) -> Optional[np.ndarray]:
+        """Significance Douglas-Peucker d'une entrée (pyramide d'affichage), ou None"""
+        try:
+            return np.load(os.path.join(self._entry_path(key), SIGNIFICANCE_FILE), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_significance(self, key: str, significance: np.ndarray):
+        """Ajoute la significance à une entrée existante (publiée par renommage atomique)"""
+        entry = self._entry_path(key)
+        temp_path = os.path.join(entry, f".tmp-{os.getpid()}-{uuid.uuid4().hex}.npy")
+        try:
+            np.save(temp_path, np.asarray(significance))
+            os.replace(temp_path, os.path.join(entry, SIGNIFICANCE_FILE))
+        except OSError:
+            # Entrée absente ou supprimée entre-temps
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _file_index_path(self, filepath: str) -> str:
+        """Entrée d'index d'un fichier : chemin, taille et date de modification"""
+        stat = os.stat(filepath)
+        identity = f"{os.path.realpath(filepath)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        digest = hashlib.blake2b(identity.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, FILES_DIR, digest)
+
+    def lookup_file(self, filepath: str) -> Optional[str]:
+        """
+        Empreinte du contenu d'un fichier déjà analysé, sans le relire.
+
+        Retourne None si le fichier est inconnu ou a changé (taille ou date de
+        modification) depuis son analyse.
+        """
+        try:
+            with open(self._file_index_path(filepath), 'r', encoding='ascii') as f:
+                return f.read().strip() or None
+        except (OSError, ValueError):
+            return None
+
+    def remember_file(self, filepath: str, key: str):
+        """Associe un fichier (dans son état actuel) à l'empreinte de son contenu"""
+        try:
+            index_path = self._file_index_path(filepath)
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='ascii') as f:
+                f.write(key)
+            os.replace(temp_path, index_path)
+        except OSError:
+            pass
+
+    def put(self, key: str, points: PointStore, cumulative_distance: np.ndarray,
+            summary: TrackSummary, metadata: Dict, source_type: Optional[str]):
+        """Enregistre une analyse puis applique la limite de taille"""
+        entry = self._entry_path(key)
+        if os.path.isdir(entry):
+            return
+
+        metadata = dict(metadata)
+        if isinstance(metadata.get('date_creation'), datetime):
+            metadata['date_creation'] = metadata['date_creation'].isoformat()
+
+        temp_entry = os.path.join(self.directory, f".tmp-{os.getpid()}-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(temp_entry)
+            for name in COLUMNS:
+                np.save(os.path.join(temp_entry, f"{name}.npy"), getattr(points, name))
+            np.save(os.path.join(temp_entry, "cumulative_distance.npy"), cumulative_distance)
+            with open(os.path.join(temp_entry, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'summary': summary.to_dict(),
+                    'metadata': metadata,
+                    'source_type': source_type,
+                }, f, ensure_ascii=False)
+            # Publication atomique : un autre processus a pu écrire la même entrée
+            os.replace(temp_entry, entry)
+        except OSError:
+            shutil.rmtree(temp_entry, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        lock_path = os.path.join(self.directory, "cache.lock")
+        if not self._acquire_lock(lock_path):
+            return  # Un autre processus fait déjà le ménage
+        try:
+            entries = []
+            total = 0
+            for item in os.scandir(self.directory):
+                if not item.is_dir() or not item.name.startswith('v'):
+                    continue
+                size = _directory_size(item.path)
+                try:
+                    last_used = item.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                entries.append((last_used, size, item.path))
+                total += size
+
+            entries.sort()
+            evicted = False
+            surviving = set()
+            for last_used, size, path in entries:
+                if total > self.max_bytes:
+                    shutil.rmtree(path, ignore_errors=True)
+                    if not os.path.exists(path):
+                        total -= size
+                        evicted = True
+                        continue
+                surviving.add(os.path.basename(path))
+            
+            # L'index des fichiers n'est parcouru que si des entrées ont disparu
+            if evicted:
+                self._prune_file_index(surviving)
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _prune_file_index(self, surviving):
+        """Supprime les entrées d'index qui désignent une entrée de cache absente"""
+        prefix = f"v{CACHE_FORMAT_VERSION}-"
+        stale_before = time.time() - INDEX_STALE_SECONDS
+        try:
+            items = list(os.scandir(os.path.join(self.directory, FILES_DIR)))
+        except FileNotFoundError:
+            return
+        for item in items:
+            try:
+                if item.stat().st_mtime > stale_before:
+                    continue
+                if not item.name.endswith('.tmp'):
+                    with open(item.path, 'r', encoding='ascii') as f:
+                        if prefix + f.read().strip() in surviving:
+                            continue
+                os.remove(item.path)
+            except (OSError, ValueError):
+                pass
+
+    def clear(self):
+        """Vide complètement le cache"""
+        for item in os.scandir(self.directory):
+            if item.is_dir():
+                shutil.rmtree(item.path, ignore_errors=True)
+
+    def _acquire_lock(self, lock_path: str) -> bool:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            # Verrou abandonné par un processus interrompu
+            try:
+                if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+                    os.remove(lock_path)
+                    return self._acquire_lock(lock_path)
+            except OSError:
+                pass
+            return False
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    try:
+        for item in os.scandir(path):
+            try:
+                total += item.stat().st_size
+            except FileNotFoundError:
+                pass
+    except FileNotFoundError:
+        pass
+    return total
+
+
+_default_cache = None
+
+
+def get_parse_cache() -> ParseCache:
+    """Retourne le cache partagé par l'application"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
@@ -0,0 +1,114 @@
+"""
+Calculs géographiques vectorisés (NumPy)
+"""
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Rayon de la Terre en mètres
+
+
+def haversine_segments(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Calcule la longueur de chaque segment entre points consécutifs (formule de Haversine).
+
+    Args:
+        latitudes: Latitudes en degrés
+        longitudes: Longitudes en degrés
+
+    Returns:
+        np.ndarray: n-1 distances en mètres
+    """
+    if len(latitudes) < 2:
+        return np.zeros(0, dtype=np.float64)
+
+    lat_rad = np.radians(latitudes)
+    lon_rad = np.radians(longitudes)
+    cos_lat = np.cos(lat_rad)
+
+    a = np.sin(np.diff(lat_rad) * 0.5)
+    a *= a
+    sin_dlon = np.sin(np.diff(lon_rad) * 0.5)
+    sin_dlon *= sin_dlon
+    sin_dlon *= cos_lat[:-1]
+    sin_dlon *= cos_lat[1:]
+    a += sin_dlon
+    np.clip(a, 0.0, 1.0, out=a)
+
+    # 2·atan2(√a, √(1-a)) == 2·asin(√a), en évitant une racine et un atan2
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_M
+    return a
+
+
+def haversine_distances(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Calcule la distance totale et la distance cumulée en chaque point.
+
+    Args:
+        latitudes: Latitudes en degrés
+        longitudes: Longitudes en degrés
+
+    Returns:
+        tuple: (distance_totale_m, distances_cumulees_m)
+        - distances_cumulees_m a la même longueur que les entrées et commence à 0
+    """
+    cumulative = np.zeros(len(latitudes), dtype=np.float64)
+    if len(latitudes) < 2:
+        return 0.0, cumulative
+
+    np.cumsum(haversine_segments(latitudes, longitudes), out=cumulative[1:])
+    return float(cumulative[-1]), cumulative
+
+
+# Précision des polylignes encodées (6 décimales ≈ 0,1 m)
+POLYLINE_PRECISION = 6
+
+
+def encode_polyline(latitudes: np.ndarray, longitudes: np.ndarray,
+                    precision: int = POLYLINE_PRECISION) -> str:
+    """
+    Encode des coordonnées au format « encoded polyline » de Google, sans boucle Python.
+
+    Chaque coordonnée est arrondie à precision décimales, codée en écart avec
+    la précédente puis découpée en groupes de 5 bits (caractères ASCII 63 à 126).
+
+    Args:
+        latitudes: Latitudes en degrés
+        longitudes: Longitudes en degrés
+        precision: Nombre de décimales conservées
+
+    Returns:
+        str: Polyligne encodée
+    """
+    n = len(latitudes)
+    if n == 0:
+        return ''
+
+    factor = 10 ** precision
+    values = np.empty((n, 2), dtype=np.int64)
+    values[:, 0] = np.round(np.asarray(latitudes) * factor)
+    values[:, 1] = np.round(np.asarray(longitudes) * factor)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+    # Signe dans le bit de poids faible
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+
+    # Nombre de groupes de 5 bits de chaque valeur
+    counts = np.ones(len(zigzag), dtype=np.int64)
+    rest = zigzag >> np.uint64(5)
+    while rest.any():
+        counts += rest > 0
+        rest >>= np.uint64(5)
+
+    offsets = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    owners = np.repeat(np.arange(len(counts)), counts)
+    positions = np.arange(len(owners)) - offsets[owners]
+
+    chunks = (zigzag[owners] >> (np.uint64(5) * positions.astype(np.uint64))) & np.uint64(0x1f)
+    # Bit de continuation sur tous les groupes sauf le dernier de chaque valeur
+    chunks |= (positions < counts[owners] - 1).astype(np.uint64) << np.uint64(5)
+    chunks += np.uint64(63)
+    return chunks.astype(np.uint8).tobytes().decode('ascii')
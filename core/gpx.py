@@ -1,10 +1,15 @@
-import gpxpy
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Optional
 from shutil import copy
 from os import getcwd
 import os.path
-from math import radians, sin, cos, sqrt, atan2
+from xml.parsers.expat import ExpatError
+
+from core.cache import ParseCache, buffer_content_hash, file_content_hash, get_parse_cache
+from core.gpx_stream import StreamingGPXReader, map_file, read_gpx_header
+from core.metrics import TrackMetricsAccumulator, TrackSummary
+from core.points import PointStore, PointStoreBuilder
+from core.simplify import SimplificationPyramid
 
 class TrackPoint:
     def __init__(self, latitude: float, longitude: float, 
@@ -18,49 +23,125 @@ class TrackPoint:
     def __repr__(self):
         return f"Point(lat={self.latitude:.6f}, lon={self.longitude:.6f}, elev={self.elevation}m, time={self.time})"
 
+# Dossier où sont copiés les fichiers GPX que l'utilisateur choisit d'archiver
+ARCHIVE_DIR = os.path.join(getcwd(), "ressources", "archives")
+
 
 class GPXParser:
-    def __init__(self, filepath: str):
-        current_main_directory = getcwd()
-        
-        # Créer le chemin du dossier temp_files
-        temp_dir = os.path.join(current_main_directory, "ressources", "temp_files")
-        
-        # Créer le dossier s'il n'existe pas
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Extraire le nom du fichier et créer le chemin complet de destination
-        filename = os.path.basename(filepath)
-        self.filepath = os.path.join(temp_dir, filename)
-        self.filename = filename  # Garder le nom du fichier
+    def __init__(self, filepath: str, use_cache: bool = True, cache: Optional[ParseCache] = None):
+        # Le fichier est lu à son emplacement d'origine (plus de copie dans temp_files)
+        self.filepath = filepath
+        self.filename = os.path.basename(filepath)  # Garder le nom du fichier
         
-        # Copier le fichier
-        copy(filepath, self.filepath)
+        # Cache des analyses, indexé par l'empreinte du contenu
+        self.cache = (cache or get_parse_cache()) if use_cache else None
+        self.content_hash: Optional[str] = None
         
         self.gpx_data = None
-        self.points: List[TrackPoint] = []
+        self.points: PointStore = PointStore.empty()
         self.metadata: Dict = {}
         self.source_type = None
+        self.summary: Optional[TrackSummary] = None
+        self._cumulative_distance = None
+        self.error: Optional[str] = None  # Message du dernier échec de parse()
     
-    def parse(self):
+    def parse(self, use_gpxpy: bool = False):
+        """
+        Parse le fichier GPX.
+
+        Par défaut le fichier est lu en flux (mémoire constante hors points) ;
+        gpxpy reste utilisé si use_gpxpy est demandé ou si le flux échoue.
+        """
+        self.summary = None
+        self._cumulative_distance = None
+        self.error = None
         try:
-            with open(self.filepath, 'r', encoding='utf-8') as gpx_file:
-                self.gpx_data = gpxpy.parse(gpx_file)
+            # Le fichier d'origine est projeté en mémoire : ni copie, ni lecture texte
+            with map_file(self.filepath) as buffer:
+                # Empreinte calculée même sans cache : elle identifie la trace
+                self.content_hash = buffer_content_hash(buffer)
+                if self.cache is not None:
+                    self.cache.remember_file(self.filepath, self.content_hash)
+                    if not use_gpxpy and self._load_from_cache():
+                        return True
+                
+                if use_gpxpy:
+                    self._parse_gpxpy()
+                else:
+                    try:
+                        self._parse_stream(buffer)
+                    except ExpatError as e:
+                        print(f"Lecture en flux impossible ({e}), utilisation de gpxpy")
+                        self._parse_gpxpy()
             
-            self._extract_metadata()
-            self._extract_all_points()
+            if self.cache is not None:
+                self.cache.put(self.content_hash, self.points, self._cumulative_distance,
+                               self.summary, self.metadata, self.source_type)
             
             return True
             
         except FileNotFoundError:
-            print(f"Erreur : Fichier '{self.filepath}' introuvable")
+            self.error = f"Fichier '{self.filepath}' introuvable"
+            print(f"Erreur : {self.error}")
             return False
         except Exception as e:
+            self.error = str(e)
             print(f"Erreur lors du parsing : {e}")
             import traceback
             traceback.print_exc()
             return False
     
+    def archive(self, archive_dir: str = ARCHIVE_DIR) -> str:
+        """Copie le fichier GPX d'origine dans le dossier d'archives"""
+        return archive_gpx_file(self.filepath, archive_dir)
+
+    def _load_from_cache(self):
+        """Recharge points et résumé depuis le cache ; False si absent"""
+        cached = self.cache.get(self.content_hash)
+        if cached is None:
+            return False
+        
+        self.gpx_data = None
+        self.points = cached.points
+        self._cumulative_distance = cached.cumulative_distance
+        self.summary = cached.summary
+        self.metadata = cached.metadata
+        self.source_type = cached.source_type
+        return True
+
+    def _parse_stream(self, buffer):
+        """Lit les points au fil de l'eau sans construire l'arbre gpxpy"""
+        reader = StreamingGPXReader(lambda: PointStoreBuilder(TrackMetricsAccumulator()))
+        reader.read_buffer(buffer)
+        
+        self.gpx_data = None
+        self.metadata = reader.metadata
+        self.source_type = reader.source_type
+        if reader.points is not None:
+            # Les métriques ont été accumulées pendant la lecture
+            self.points = reader.points.build()
+            accumulator = reader.points.accumulator
+        else:
+            self.points = PointStore.empty()
+            accumulator = TrackMetricsAccumulator()
+        self.summary = accumulator.summary()
+        self._cumulative_distance = accumulator.cumulative_distance()
+
+    def _parse_gpxpy(self):
+        """Parsing complet via gpxpy (solution de repli)"""
+        import gpxpy
+        
+        with open(self.filepath, 'r', encoding='utf-8') as gpx_file:
+            self.gpx_data = gpxpy.parse(gpx_file)
+        
+        self._extract_metadata()
+        self._extract_all_points()
+        
+        accumulator = TrackMetricsAccumulator()
+        accumulator.update_store(self.points)
+        self.summary = accumulator.summary()
+        self._cumulative_distance = accumulator.cumulative_distance()
+
     def _extract_metadata(self):
         if self.gpx_data:
             self.metadata = {
@@ -74,132 +155,241 @@ class GPXParser:
             }
     
     def _extract_all_points(self):
-        self.points = []
+        builder = PointStoreBuilder()
+        self.points = PointStore.empty()
         
         if self.gpx_data.tracks:
             self.source_type = 'tracks'
             for track in self.gpx_data.tracks:
                 for segment in track.segments:
                     for point in segment.points:
-                        self.points.append(TrackPoint(
-                            latitude=point.latitude,
-                            longitude=point.longitude,
-                            elevation=point.elevation,
-                            time=point.time
-                        ))
+                        builder.append(point.latitude, point.longitude,
+                                       point.elevation, point.time)
+            self.points = builder.build()
             return
         if self.gpx_data.routes:
             self.source_type = 'routes'
             for route in self.gpx_data.routes:
                 for point in route.points:
-                    self.points.append(TrackPoint(
-                        latitude=point.latitude,
-                        longitude=point.longitude,
-                        elevation=point.elevation,
-                        time=getattr(point, 'time', None)
-                    ))
+                    builder.append(point.latitude, point.longitude,
+                                   point.elevation, getattr(point, 'time', None))
+            self.points = builder.build()
             return
         
         if self.gpx_data.waypoints:
             self.source_type = 'waypoints'
             for waypoint in self.gpx_data.waypoints:
-                self.points.append(TrackPoint(
-                    latitude=waypoint.latitude,
-                    longitude=waypoint.longitude,
-                    elevation=waypoint.elevation,
-                    time=waypoint.time
-                ))
+                builder.append(waypoint.latitude, waypoint.longitude,
+                               waypoint.elevation, waypoint.time)
+            self.points = builder.build()
             return
     
+    def get_summary(self) -> TrackSummary:
+        """Retourne le résumé calculé en une passe (distance, D+/D-, durée, emprise)"""
+        if self.summary is None:
+            accumulator = TrackMetricsAccumulator()
+            accumulator.update_store(self.points)
+            self.summary = accumulator.summary()
+            self._cumulative_distance = accumulator.cumulative_distance()
+        return self.summary
+    
     def get_denivele(self):
-        deniveles = [self.points[i+1].elevation - self.points[i].elevation for i in range(len(self.points) - 1) if self.points[i].elevation is not None and self.points[i+1].elevation is not None]
-        denivele_pos, denivele_neg = 0, 0
-        for denivele in deniveles:
-            if denivele >= 0: 
-                denivele_pos += denivele
-            else: 
-                denivele_neg += abs(denivele)
-        print((denivele_pos, denivele_neg))
-        return (denivele_pos, denivele_neg)
+        summary = self.get_summary()
+        return (summary.denivele_positif, summary.denivele_negatif)
 
     def get_duration(self):
         """Calcule la durée totale en secondes entre le premier et le dernier point"""
-        times = [p.time for p in self.points if p.time is not None]
-        if len(times) < 2:
-            return 0
-        
-        times_sorted = sorted(times)
-        duree_secondes = (times_sorted[-1] - times_sorted[0]).total_seconds()
-        return duree_secondes
+        return self.get_summary().duration_s
+    
+    def get_cumulative_distance(self):
+        """Retourne la distance cumulée (m) en chaque point, calculée une seule fois"""
+        self.get_summary()
+        return self._cumulative_distance
     
     def get_distance(self):
         """Calcule la distance totale en mètres en utilisant la formule de Haversine"""
-        if len(self.points) < 2:
-            return 0
-        
-        def haversine(lat1, lon1, lat2, lon2):
-            """Calcule la distance entre deux points GPS en mètres"""
-            R = 6371000  # Rayon de la Terre en mètres
-            
-            lat1_rad = radians(lat1)
-            lat2_rad = radians(lat2)
-            delta_lat = radians(lat2 - lat1)
-            delta_lon = radians(lon2 - lon1)
-            
-            a = sin(delta_lat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon / 2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            
-            return R * c
-        
-        distance_totale = 0
-        for i in range(len(self.points) - 1):
-            distance_totale += haversine(
-                self.points[i].latitude,
-                self.points[i].longitude,
-                self.points[i+1].latitude,
-                self.points[i+1].longitude
-            )
-        
-        return distance_totale
+        return self.get_summary().distance_m
 
 
-def get_info(fichier_gpx="ressources/test_files/fells_loop.gpx"):
+def archive_gpx_file(filepath: str, archive_dir: str = ARCHIVE_DIR) -> str:
+    """
+    Copie un fichier GPX dans le dossier d'archives (uniquement sur demande).
+
+    Un fichier identique déjà archivé n'est pas recopié ; un autre fichier du
+    même nom est archivé sous un nom suffixé par l'empreinte de son contenu.
+
+    Returns:
+        str: Chemin de la copie archivée
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    destination = os.path.join(archive_dir, os.path.basename(filepath))
+    if os.path.exists(destination):
+        content_hash = file_content_hash(filepath)
+        if file_content_hash(destination) == content_hash:
+            return destination  # Déjà archivé
+        # Même nom, contenu différent (autre dossier) : suffixe tiré de l'empreinte
+        stem, extension = os.path.splitext(os.path.basename(filepath))
+        destination = os.path.join(archive_dir, f"{stem}-{content_hash[:12]}{extension}")
+        if os.path.exists(destination):
+            return destination
+    copy(filepath, destination)
+    return destination
+
+
+def get_info(fichier_gpx="ressources/test_files/fells_loop.gpx", verbose=True,
+             use_cache=True, cache: Optional[ParseCache] = None):
     """
     Analyse un fichier GPX et retourne ses informations
     
+    Args:
+        fichier_gpx: Chemin du fichier GPX
+        verbose: Afficher le résumé de la trace sur la sortie standard
+        use_cache: Utiliser le cache des analyses
+        cache: Cache à utiliser (celui de l'application par défaut)
+    
     Returns:
-        dict: Contient denivele, durée, distance_km, points, filename, parser
+        dict: Contient denivele, durée, distance_km, points, summary, bounds, filename, parser
     """
-    parser = GPXParser(fichier_gpx)
+    parser = GPXParser(fichier_gpx, use_cache=use_cache, cache=cache)
     
     # Valeurs par défaut
-    deniv_pos, deniv_neg = 0, 0
-    heures, minutes, secondes = 0, 0, 0
-    distance_km = 0
+    summary = TrackSummary()
 
     if parser.parse():
-        deniv_pos, deniv_neg = parser.get_denivele()
-        print(f"D+ : {deniv_pos:.1f} m")
-        print(f"D- : {deniv_neg:.1f} m")
-        
-        duree = parser.get_duration()
-        heures = int(duree // 3600)
-        minutes = int((duree % 3600) // 60)
-        secondes = int(duree % 60)
-        
-        print(f"Durée : {heures}h {minutes}m {secondes}s")
-        
-        distance_m = parser.get_distance()
-        distance_km = distance_m / 1000
-        print(f"Distance : {distance_km:.2f} km")
-    else:
+        summary = parser.get_summary()
+        if verbose:
+            print(f"D+ : {summary.denivele_positif:.1f} m")
+            print(f"D- : {summary.denivele_negatif:.1f} m")
+            
+            duree = summary.duree_dict()
+            print(f"Durée : {duree['heures']}h {duree['minutes']}m {duree['secondes']}s")
+            
+            print(f"Distance : {summary.distance_km:.2f} km")
+    elif verbose:
         print("Échec du parsing du fichier GPX")
         
     return {
-        "denivele": {"positif": deniv_pos, "negatif": deniv_neg},
-        "durée": {"heures": heures, "minutes": minutes, "secondes": secondes},
-        "distance_km": distance_km,
+        "denivele": {"positif": summary.denivele_positif, "negatif": summary.denivele_negatif},
+        "durée": summary.duree_dict(),
+        "distance_km": summary.distance_km,
         "points": parser.points,
+        "cumulative_distance_m": parser.get_cumulative_distance(),
+        "summary": summary,
+        "bounds": summary.bounds,
+        "metadata": parser.metadata,
+        "content_hash": parser.content_hash,
         "filename": parser.filename,  # Ajout du nom de fichier
+        "filepath": parser.filepath,
         "parser": parser  # Ajout du parser pour référence
-    }
\ No newline at end of file
+    }
+
+
+def get_header_info(fichier_gpx, cache: Optional[ParseCache] = None):
+    """
+    Première phase du chargement paresseux : informations d'une trace sans ses points.
+
+    Un fichier déjà analysé (et inchangé depuis) est résumé depuis le cache des
+    analyses, sans être relu. Sinon seul le début du fichier est lu
+    (métadonnées et <bounds>) et 'summary_pending' indique que le résumé reste
+    à calculer par une analyse complète.
+
+    Returns:
+        dict: Mêmes clés que get_info (sans 'parser'), avec 'points' à None
+            tant que ensure_points n'a pas été appelé
+    """
+    cache = cache or get_parse_cache()
+    content_hash = cache.lookup_file(fichier_gpx)
+    cached = cache.get_summary(content_hash) if content_hash else None
+    
+    if cached is not None:
+        summary, metadata, _ = cached
+        pending = False
+    else:
+        content_hash = None
+        metadata = read_gpx_header(fichier_gpx)
+        summary = TrackSummary(bounds=metadata.pop('bounds', None))
+        pending = True
+    
+    return {
+        "denivele": {"positif": summary.denivele_positif, "negatif": summary.denivele_negatif},
+        "durée": summary.duree_dict(),
+        "distance_km": summary.distance_km,
+        "points": None,
+        "cumulative_distance_m": None,
+        "summary": summary,
+        "summary_pending": pending,
+        "bounds": summary.bounds,
+        "metadata": metadata,
+        "content_hash": content_hash,
+        "filename": os.path.basename(fichier_gpx),
+        "filepath": fichier_gpx,
+    }
+
+
+def load_trace_points(gpx_data):
+    """
+    Points et distances cumulées d'une trace, relus si elle n'est pas chargée.
+
+    gpx_data n'est pas modifié : utilisable hors du thread de l'interface
+    (export). Le cache des analyses est essayé avant le fichier d'origine.
+
+    Returns:
+        tuple: (PointStore, distances cumulées en m)
+    """
+    # Distances lues avant les points : une libération concurrente les remet
+    # à None après les points, jamais l'inverse
+    cumulative_distance = gpx_data.get('cumulative_distance_m')
+    points = gpx_data.get('points')
+    if points is not None:
+        return points, cumulative_distance
+    
+    cache = get_parse_cache()
+    content_hash = gpx_data.get('content_hash')
+    cached = cache.get(content_hash) if content_hash else None
+    if cached is not None:
+        return cached.points, cached.cumulative_distance
+    
+    parser = GPXParser(gpx_data['filepath'], cache=cache)
+    if not parser.parse():
+        raise OSError(f"Impossible de relire le fichier '{gpx_data['filepath']}'")
+    return parser.points, parser.get_cumulative_distance()
+
+
+def ensure_points(gpx_data):
+    """Seconde phase du chargement paresseux : charge les points d'une trace si besoin"""
+    if gpx_data.get('points') is None:
+        gpx_data['points'], gpx_data['cumulative_distance_m'] = load_trace_points(gpx_data)
+    return gpx_data['points']
+
+
+def load_simplification(points: PointStore, content_hash: Optional[str] = None,
+                        cache: Optional[ParseCache] = None) -> SimplificationPyramid:
+    """
+    Pyramide de simplification d'une trace, relue depuis le cache des analyses.
+
+    Calculée (puis enregistrée dans le cache) si l'entrée n'en contient pas encore.
+    """
+    cache = cache or get_parse_cache()
+    significance = cache.get_significance(content_hash) if content_hash else None
+    if significance is not None and len(significance) == len(points):
+        return SimplificationPyramid(significance)
+    
+    pyramid = SimplificationPyramid.from_points(points)
+    if content_hash:
+        cache.put_significance(content_hash, pyramid.significance)
+    return pyramid
+
+
+
+def load_gpx_data(fichier_gpx):
+    """
+    Analyse un fichier GPX dans un processus d'import.
+
+    Identique à get_info, sans la référence au parser pour que le résultat
+    puisse être renvoyé au processus principal. La pyramide de simplification
+    de l'affichage est calculée ici, hors du thread de l'interface.
+    """
+    gpx_data = get_info(fichier_gpx)
+    gpx_data.pop("parser", None)
+    gpx_data["simplification"] = load_simplification(gpx_data["points"], gpx_data["content_hash"])
+    return gpx_data
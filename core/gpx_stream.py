@@ -0,0 +1,329 @@
+"""
+Lecture en flux des fichiers GPX (sans construire l'arbre d'objets gpxpy)
+"""
+import mmap
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+from xml.parsers import expat
+
+# Types de points GPX par ordre de priorité (tracks → routes → waypoints)
+POINT_TAGS = {'trkpt': 'tracks', 'rtept': 'routes', 'wpt': 'waypoints'}
+POINT_DEPTHS = {'trkpt': 4, 'rtept': 3, 'wpt': 2}
+SOURCE_PRIORITY = ('tracks', 'routes', 'waypoints')
+
+# Éléments conteneurs qui déclarent une source (même vide)
+CONTAINER_TAGS = {'trk': 'tracks', 'rte': 'routes', 'wpt': 'waypoints'}
+
+# Chemins des métadonnées : GPX 1.1 (<metadata>) puis GPX 1.0 (racine)
+METADATA_PATHS = {
+    ('gpx', 'metadata', 'name'): 'nom',
+    ('gpx', 'name'): 'nom',
+    ('gpx', 'metadata', 'desc'): 'description',
+    ('gpx', 'desc'): 'description',
+    ('gpx', 'metadata', 'author', 'name'): 'auteur',
+    ('gpx', 'author'): 'auteur',
+    ('gpx', 'metadata', 'time'): 'date_creation',
+    ('gpx', 'time'): 'date_creation',
+}
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Taille lue au plus pour l'en-tête (métadonnées et <bounds> précèdent les points)
+HEADER_MAX_BYTES = 64 * 1024
+
+
+def parse_gpx_time(text: Optional[str]) -> Optional[datetime]:
+    """Convertit un horodatage ISO 8601 GPX en datetime (None si invalide)"""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    # Formats exotiques : on délègue à gpxpy s'il est disponible
+    try:
+        from gpxpy.gpxfield import parse_time
+        return parse_time(text)
+    except Exception:
+        return None
+
+
+@contextmanager
+def map_file(filepath: str):
+    """
+    Projette un fichier en mémoire en lecture seule (mmap).
+
+    Le contenu est lu à la demande par le système, sans copie dans une chaîne
+    Python. Un fichier vide donne un tampon vide.
+    """
+    with open(filepath, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuse les fichiers de taille nulle
+            yield b''
+            return
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+class StreamingGPXReader:
+    """
+    Parcourt un fichier GPX avec expat et transmet chaque point à un collecteur.
+
+    La mémoire utilisée reste constante (hors collecteurs) : aucun arbre XML
+    n'est conservé, seuls le chemin courant et le point en cours sont gardés.
+
+    Args:
+        sink_factory: Fonction sans argument qui crée un collecteur de points.
+            Le collecteur doit exposer append(lat, lon, elevation, time).
+    """
+
+    def __init__(self, sink_factory):
+        self.sink_factory = sink_factory
+        self.metadata: Dict = {}
+        self.source_type: Optional[str] = None
+        self.points = None
+
+        self._sinks = {}
+        self._blocked = set()
+        self._counts = {'tracks': 0, 'routes': 0, 'waypoints': 0}
+        self._path = []
+        self._local_names = {}
+        self._text = None
+        self._text_depth = 0
+        self._text_open = False
+        self._point = None
+        self._point_kind = None
+        self._point_depth = 0
+
+    def read(self, source) -> bool:
+        """
+        Lit une source binaire (fichier ouvert en 'rb' ou objet exposant read()).
+
+        Returns:
+            bool: True si au moins un conteneur de points a été trouvé
+        """
+        parser = self._create_parser()
+        parser.ParseFile(source)
+        self._finish()
+        return self.source_type is not None
+
+    def read_buffer(self, buffer) -> bool:
+        """
+        Lit un tampon binaire (bytes, mmap...) par tranches, sans le copier.
+
+        Returns:
+            bool: True si au moins un conteneur de points a été trouvé
+        """
+        parser = self._create_parser()
+        with memoryview(buffer) as view:
+            size = len(view)
+            for start in range(0, size, READ_CHUNK_SIZE):
+                with view[start:start + READ_CHUNK_SIZE] as chunk:
+                    parser.Parse(chunk, False)
+            parser.Parse(b'', True)
+        self._finish()
+        return self.source_type is not None
+
+    def _create_parser(self):
+        parser = expat.ParserCreate(namespace_separator='}')
+        parser.buffer_text = True
+        parser.buffer_size = READ_CHUNK_SIZE
+        parser.StartElementHandler = self._on_start
+        parser.EndElementHandler = self._on_end
+        parser.CharacterDataHandler = self._on_text
+        return parser
+
+    def _local(self, name):
+        local = self._local_names.get(name)
+        if local is None:
+            local = name.rpartition('}')[2].rpartition(':')[2]
+            self._local_names[name] = local
+        return local
+
+    def _on_start(self, name, attrs):
+        local = self._local(name)
+        path = self._path
+        path.append(local)
+        depth = len(path)
+
+        if self._text is not None:
+            # Élément enfant d'un texte collecté : comme gpxpy, seul le texte
+            # qui précède le premier enfant est gardé
+            self._text_open = False
+            return
+
+        if depth == 2 and local in CONTAINER_TAGS:
+            self._declare_source(CONTAINER_TAGS[local])
+
+        if POINT_DEPTHS.get(local) == depth:
+            kind = POINT_TAGS[local]
+            if kind in self._blocked:
+                return
+            try:
+                self._point = [float(attrs['lat']), float(attrs['lon']), None, None]
+                self._point_kind = kind
+                self._point_depth = depth
+            except (KeyError, ValueError):
+                self._point = None
+            return
+
+        if self._point is not None:
+            if local in ('ele', 'time') and depth == self._point_depth + 1:
+                self._start_text(depth)
+        elif tuple(path) in METADATA_PATHS:
+            self._start_text(depth)
+
+    def _start_text(self, depth):
+        self._text = []
+        self._text_depth = depth
+        self._text_open = True
+
+    def _on_text(self, data):
+        if self._text_open:
+            self._text.append(data)
+
+    def _on_end(self, name):
+        path = self._path
+        local = path[-1]
+
+        if self._text is not None:
+            if len(path) != self._text_depth:
+                # Fin d'un élément enfant du texte collecté
+                path.pop()
+                return
+            self._text_open = False
+            text = ''.join(self._text)
+            self._text = None
+            if self._point is not None and local == 'ele':
+                try:
+                    self._point[2] = float(text)
+                except ValueError:
+                    pass
+            elif self._point is not None and local == 'time':
+                self._point[3] = parse_gpx_time(text)
+            else:
+                key = METADATA_PATHS.get(tuple(path))
+                if key and key not in self.metadata:
+                    text = text.strip()
+                    self.metadata[key] = parse_gpx_time(text) if key == 'date_creation' else text
+
+        elif self._point is not None and len(path) == self._point_depth:
+            kind = self._point_kind
+            if kind not in self._blocked:
+                lat, lon, ele, time = self._point
+                self._sinks[kind].append(lat, lon, ele, time)
+            self._point = None
+            self._point_kind = None
+
+        if len(path) == 2 and local in CONTAINER_TAGS:
+            self._counts[CONTAINER_TAGS[local]] += 1
+
+        path.pop()
+
+    def _declare_source(self, kind):
+        """Ouvre un collecteur pour une source et abandonne celles de priorité inférieure"""
+        if kind in self._blocked or kind in self._sinks:
+            return
+        self._sinks[kind] = self.sink_factory()
+        rank = SOURCE_PRIORITY.index(kind)
+        for lower in SOURCE_PRIORITY[rank + 1:]:
+            self._blocked.add(lower)
+            self._sinks.pop(lower, None)
+
+    def _finish(self):
+        for kind in SOURCE_PRIORITY:
+            if kind in self._sinks:
+                self.source_type = kind
+                self.points = self._sinks[kind]
+                break
+
+        self.metadata = {
+            'nom': self.metadata.get('nom') or "Sans nom",
+            'description': self.metadata.get('description') or "Aucune description",
+            'auteur': self.metadata.get('auteur') or "Inconnu",
+            'date_creation': self.metadata.get('date_creation'),
+            'nb_tracks': self._counts['tracks'],
+            'nb_routes': self._counts['routes'],
+            'nb_waypoints': self._counts['waypoints'],
+        }
+
+
+class _HeaderComplete(Exception):
+    """Arrête la lecture de l'en-tête au premier conteneur de points"""
+
+
+def read_gpx_header(filepath: str, max_bytes: int = HEADER_MAX_BYTES) -> Dict:
+    """
+    Lit les métadonnées et l'emprise déclarée (<bounds>) en début de fichier.
+
+    La lecture s'arrête au premier conteneur de points (trk, rte, wpt) ou après
+    max_bytes : le coût ne dépend pas de la taille du fichier.
+
+    Returns:
+        dict: Métadonnées lues (clés de METADATA_PATHS) et 'bounds'
+            [[lat_min, lon_min], [lat_max, lon_max]] si le fichier la déclare
+    """
+    header: Dict = {}
+    path = []
+    text = None
+    text_depth = 0  # Profondeur de l'élément dont le texte est collecté
+    text_open = False
+
+    def on_start(name, attrs):
+        nonlocal text, text_depth, text_open
+        local = name.rpartition('}')[2].rpartition(':')[2]
+        path.append(local)
+        if text is not None:
+            # Comme gpxpy : seul le texte qui précède le premier enfant est gardé
+            text_open = False
+            return
+        if len(path) == 2 and local in CONTAINER_TAGS:
+            raise _HeaderComplete()
+        if local == 'bounds' and len(path) <= 3:
+            try:
+                header['bounds'] = [[float(attrs['minlat']), float(attrs['minlon'])],
+                                    [float(attrs['maxlat']), float(attrs['maxlon'])]]
+            except (KeyError, ValueError):
+                pass
+        elif tuple(path) in METADATA_PATHS:
+            text = []
+            text_depth = len(path)
+            text_open = True
+
+    def on_text(data):
+        if text_open:
+            text.append(data)
+
+    def on_end(name):
+        nonlocal text, text_open
+        # Seule la fin de l'élément qui a ouvert le texte le termine
+        # (<name>Tour <b>x</b></name>)
+        if text is not None and len(path) == text_depth:
+            text_open = False
+            key = METADATA_PATHS[tuple(path)]
+            value = ''.join(text).strip()
+            text = None
+            if key not in header:
+                header[key] = parse_gpx_time(value) if key == 'date_creation' else value
+        path.pop()
+
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.buffer_text = True
+    parser.StartElementHandler = on_start
+    parser.EndElementHandler = on_end
+    parser.CharacterDataHandler = on_text
+
+    with open(filepath, 'rb') as f:
+        prefix = f.read(max_bytes)
+    try:
+        parser.Parse(prefix, len(prefix) < max_bytes)
+    except (_HeaderComplete, expat.ExpatError):
+        # Fin de l'en-tête, ou préfixe tronqué : les valeurs déjà lues suffisent
+        pass
+    return header
@@ -0,0 +1,197 @@
+"""
+Import parallèle de fichiers GPX dans un pool de processus
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from core.cache import get_parse_cache
+from core.gpx import get_header_info
+from core.shared_points import attach_shared_trace, discard_shared_points, load_gpx_data_shared
+
+# Nombre de processus d'import (None = nombre de cœurs)
+IMPORT_MAX_WORKERS = None
+
+# Remise des entrées lues par la première phase : par lots de
+# HEADER_BATCH_SIZE fichiers, ou toutes les HEADER_BATCH_SECONDS
+HEADER_BATCH_SIZE = 64
+HEADER_BATCH_SECONDS = 0.05
+
+
+def create_import_executor(max_workers=IMPORT_MAX_WORKERS):
+    """
+    Crée le pool de processus utilisé pour analyser les fichiers GPX.
+
+    Les processus sont lancés par 'spawn' : un fork du processus Qt (déjà
+    multi-thread, QtWebEngine compris) peut se bloquer.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+class HeaderScanJob(QThread):
+    """
+    Première phase de l'import dans un thread : en-têtes ou résumés en cache.
+
+    Les entrées sont remises par lots au thread Qt, qui les ajoute au fur et à
+    mesure sans attendre la fin de la lecture.
+
+    Signaux:
+        headers_read(lot): liste de (index, gpx_data), index dans la liste de fichiers
+        header_failed(index, message): fichier illisible
+    """
+    headers_read = pyqtSignal(list)
+    header_failed = pyqtSignal(int, str)
+
+    def __init__(self, file_paths, parent=None):
+        super().__init__(parent)
+        self.file_paths = list(file_paths)
+        # Cache créé dans le thread de l'interface (instance partagée)
+        self.cache = get_parse_cache()
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Demande l'arrêt de la lecture (pris en compte au fichier suivant)"""
+        self._cancel_requested = True
+
+    def run(self):
+        batch = []
+        last_emit = time.monotonic()
+        for index, file_path in enumerate(self.file_paths):
+            if self._cancel_requested:
+                return
+            try:
+                batch.append((index, get_header_info(file_path, self.cache)))
+            except Exception as e:
+                # Un fichier illisible n'interrompt pas la lecture des suivants
+                self.header_failed.emit(index, str(e))
+            
+            now = time.monotonic()
+            if batch and (len(batch) >= HEADER_BATCH_SIZE or now - last_emit >= HEADER_BATCH_SECONDS):
+                self.headers_read.emit(batch)
+                batch = []
+                last_emit = now
+        
+        if batch:
+            self.headers_read.emit(batch)
+
+
+class GPXImportJob(QObject):
+    """
+    Analyse une liste de fichiers GPX dans un pool de processus.
+
+    Les résultats sont remis au thread Qt dans l'ordre des fichiers : une trace
+    terminée en avance attend que les précédentes soient arrivées. Les points
+    reviennent par mémoire partagée et sont attachés sans copie au registre dès
+    la fin de leur analyse (sous Windows, le processus d'import ne garde ses
+    segments que WINDOWS_SEGMENT_GRACE_SECONDS).
+
+    Signaux:
+        trace_loaded(index, gpx_data): trace prête, index dans la liste de fichiers
+        trace_failed(index, message): échec d'analyse d'un fichier
+        progress(terminés, total): avancement
+        finished(annulé): fin de l'import
+    """
+    trace_loaded = pyqtSignal(int, dict)
+    trace_failed = pyqtSignal(int, str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(bool)
+
+    # Émis depuis les threads du pool, reçu dans le thread Qt
+    _future_done = pyqtSignal(int)
+
+    def __init__(self, executor, file_paths, registry, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.registry = registry
+        self.file_paths = list(file_paths)
+        self.futures = []
+        self.cancelled = False
+        self.done = False
+        self._results = {}  # index → (gpx_data attaché, message d'erreur), en attente de remise
+        self._handled = set()  # index des résultats attachés ou détruits
+        self._next_index = 0
+        self._done_count = 0
+        self._future_done.connect(self._on_future_done)
+
+    def start(self):
+        """Soumet tous les fichiers au pool"""
+        if not self.file_paths:
+            self.done = True
+            self.finished.emit(False)
+            return
+        for index, file_path in enumerate(self.file_paths):
+            future = self.executor.submit(load_gpx_data_shared, file_path)
+            # Ajouté avant le rappel : un futur déjà terminé l'appelle immédiatement
+            self.futures.append(future)
+            future.add_done_callback(lambda f, i=index: self._future_done.emit(i))
+
+    def cancel(self):
+        """Annule les fichiers pas encore commencés et ignore les résultats restants"""
+        if self.cancelled or self.done:
+            return
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
+        # Les traces attachées mais pas encore remises ne seront pas utilisées
+        for gpx_data, _ in self._results.values():
+            if gpx_data is not None:
+                self.registry.release(gpx_data.get('shared_segment'))
+        self._results.clear()
+        self.finished.emit(True)
+
+    def abort(self):
+        """
+        Abandon à la fermeture : détruit les segments publiés et jamais remis.
+
+        À appeler après l'arrêt du pool (shutdown(wait=True)) : les analyses en
+        cours sont alors terminées et leurs segments peuvent être détruits.
+        """
+        # Plus aucun signal vers l'interface en cours de fermeture
+        self.blockSignals(True)
+        self.cancel()
+        for index, future in enumerate(self.futures):
+            if index not in self._handled:
+                self._handled.add(index)
+                self._discard(future)
+
+    @pyqtSlot(int)
+    def _on_future_done(self, index):
+        if index in self._handled:
+            return
+        self._handled.add(index)
+        future = self.futures[index]
+        if self.cancelled:
+            self._discard(future)
+            return
+
+        # Attaché tout de suite, même si les fichiers précédents ne sont pas prêts
+        try:
+            self._results[index] = (attach_shared_trace(future.result(), self.registry), None)
+        except Exception as e:
+            self._results[index] = (None, str(e))
+        self._done_count += 1
+        self.progress.emit(self._done_count, len(self.file_paths))
+
+        # Remise dans l'ordre des fichiers
+        while self._next_index in self._results:
+            index = self._next_index
+            gpx_data, error = self._results.pop(index)
+            self._next_index += 1
+            if error is not None:
+                self.trace_failed.emit(index, error)
+            else:
+                self.trace_loaded.emit(index, gpx_data)
+
+        if self._next_index == len(self.file_paths):
+            self.done = True
+            self.finished.emit(False)
+
+    def _discard(self, future):
+        """Détruit le segment d'un résultat qui ne sera pas utilisé (import annulé)"""
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return
+        discard_shared_points(future.result().get('shared_points'))
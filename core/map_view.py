@@ -0,0 +1,217 @@
+"""
+Carte Leaflet de l'application (extension de la carte pyqtlet2)
+"""
+import json
+
+from PyQt5.QtCore import QJsonValue, QTimer, pyqtSignal, pyqtSlot
+from pyqtlet2 import L
+
+from core.geo import POLYLINE_PRECISION, encode_polyline
+
+# Décodeur des polylignes encodées côté carte (arithmétique flottante : les
+# opérateurs binaires JS sont limités à 32 bits)
+GANDALF_JS = """
+var gandalf = {
+    decode: function(encoded, precision) {
+        var factor = Math.pow(10, precision);
+        var coords = [];
+        var index = 0, lat = 0, lng = 0;
+        function next() {
+            var result = 0, scale = 1, byte;
+            do {
+                byte = encoded.charCodeAt(index++) - 63;
+                result += (byte & 0x1f) * scale;
+                scale *= 32;
+            } while (byte >= 0x20);
+            return (result % 2) ? -(result + 1) / 2 : result / 2;
+        }
+        while (index < encoded.length) {
+            lat += next();
+            lng += next();
+            coords.push([lat / factor, lng / factor]);
+        }
+        return coords;
+    }
+};
+"""
+
+# Transmet le zoom et l'emprise visible à Python à la fin de chaque déplacement
+VIEW_CHANGED_JS = """
+map.on("moveend", function() {
+    if (!channelObjects) { return; }
+    var bounds = map.getBounds();
+    channelObjects.mapObject._onViewChanged({
+        zoom: map.getZoom(),
+        south: bounds.getSouth(),
+        west: bounds.getWest(),
+        north: bounds.getNorth(),
+        east: bounds.getEast()
+    });
+});
+"""
+
+
+class GandalfMap(L.map):
+    """
+    Carte pyqtlet2 qui signale les changements de vue.
+
+    Les commandes envoyées à la carte et à ses couches sont mises en file puis
+    exécutées en un seul appel runJavaScript par tour de boucle d'événements,
+    au lieu d'un aller-retour vers la page par opération.
+
+    Signaux:
+        viewChanged(vue): {'zoom', 'south', 'west', 'north', 'east'} après un
+            déplacement ou un zoom
+    """
+    viewChanged = pyqtSignal(dict)
+
+    def __init__(self, map_widget, options=None):
+        super().__init__(map_widget, options)
+        self._pendingJs = []
+        self.runJavaScriptForMap(GANDALF_JS)
+        self.runJavaScriptForMap(VIEW_CHANGED_JS)
+
+    @pyqtSlot(QJsonValue)
+    def _onViewChanged(self, event):
+        self.viewChanged.emit(self._qJsonValueToDict(event))
+
+    def runJavaScriptForMap(self, js):
+        self.enqueueJavaScript(js)
+
+    def getJsresponseForMap(self, js, callback):
+        # La réponse doit tenir compte des commandes encore en file
+        self.flushJavaScript()
+        return super().getJsresponseForMap(js, callback)
+
+    def enqueueJavaScript(self, js):
+        """Ajoute une commande à la file, exécutée au prochain tour de boucle"""
+        if not self._pendingJs:
+            QTimer.singleShot(0, self.flushJavaScript)
+        self._pendingJs.append(js)
+
+    def flushJavaScript(self):
+        """Exécute toutes les commandes en file en un seul appel"""
+        if not self._pendingJs:
+            return
+        # Une commande en erreur ne doit pas empêcher les suivantes
+        js = '\n'.join('try {{ {js}; }} catch (e) {{ console.error(e); }}'.format(js=command)
+                        for command in self._pendingJs)
+        self._pendingJs = []
+        self.runJavaScript(js, self.mapWidgetIndex)
+
+
+class QueuedLayerMixin:
+    """Envoie les commandes d'une couche pyqtlet2 dans la file de sa GandalfMap"""
+
+    def runJavaScript(self, js, mapWidgetIndex):
+        if isinstance(self._map, GandalfMap):
+            self._map.enqueueJavaScript(js)
+        else:
+            super().runJavaScript(js, mapWidgetIndex)
+
+
+class TraceLayerGroup(QueuedLayerMixin, L.layerGroup):
+    """
+    Groupe Leaflet des traces affichées.
+
+    Une couche retirée du groupe garde son objet JS : la réafficher ne renvoie
+    pas sa géométrie. Afficher, masquer ou effacer toutes les traces se fait en
+    une seule commande. Les couches du groupe sont gardées dans un dict pour
+    tester l'appartenance en O(1).
+    """
+
+    @property
+    def layers(self):
+        return list(self._layers)
+
+    def __init__(self):
+        super().__init__()
+        self._layers = {}
+
+    def hasLayer(self, layer):
+        return layer in self._layers
+
+    def addLayer(self, layer):
+        self.addLayers([layer])
+
+    def removeLayer(self, layer):
+        self.removeLayers([layer])
+
+    def addLayers(self, layers):
+        """Ajoute plusieurs couches au groupe en une commande"""
+        layers = [layer for layer in layers if layer not in self._layers]
+        if not layers:
+            return
+        for layer in layers:
+            if layer.map is None:
+                # Première apparition : création de l'objet JS
+                layer.map = self._map
+                layer._initJs()
+            self._layers[layer] = None
+        self.runJavaScriptForMapIndex('[{layers}].forEach(function(l) {{ {group}.addLayer(l); }})'.format(
+            layers=', '.join(layer.jsName for layer in layers), group=self.jsName))
+
+    def removeLayers(self, layers):
+        """Retire plusieurs couches du groupe en une commande"""
+        layers = [layer for layer in layers if layer in self._layers]
+        if not layers:
+            return
+        for layer in layers:
+            del self._layers[layer]
+        self.runJavaScriptForMapIndex('[{layers}].forEach(function(l) {{ {group}.removeLayer(l); }})'.format(
+            layers=', '.join(layer.jsName for layer in layers), group=self.jsName))
+
+    def clearLayers(self):
+        self._layers = {}
+        super().clearLayers()
+
+    def disposeLayers(self, layers):
+        """Libère côté page les couches supprimées (et leur géométrie)"""
+        layers = [layer for layer in layers if layer.map is not None]
+        if not layers:
+            return
+        self.removeLayers(layers)
+        self.runJavaScriptForMapIndex('{layers} = null'.format(
+            layers=' = '.join(layer.jsName for layer in layers)))
+        channel = self.getMapWidgetAtIndex(self._map.mapWidgetIndex).channel
+        for layer in layers:
+            channel.deregisterObject(layer)
+            layer.map = None
+
+
+class EncodedPolyline(QueuedLayerMixin, L.polyline):
+    """
+    Polyligne pyqtlet2 dont la géométrie est transmise encodée.
+
+    La chaîne encodée est environ dix fois plus courte que la liste
+    [[lat, lon], ...] et décodée par la carte.
+
+    Args:
+        encoded: Polyligne encodée (voir core.geo.encode_polyline)
+        options: Options Leaflet de la polyligne
+    """
+
+    def __init__(self, encoded, options=None):
+        super().__init__(encoded, options)
+
+    @classmethod
+    def fromPoints(cls, points, options=None):
+        return cls(encode_polyline(points.latitudes, points.longitudes), options)
+
+    def _decodeJs(self):
+        # json.dumps échappe les « \ » que l'encodage peut produire
+        return 'gandalf.decode({encoded}, {precision})'.format(
+            encoded=json.dumps(self.latLngs), precision=POLYLINE_PRECISION)
+
+    def _initJs(self):
+        leafletJsObject = 'L.polyline({latLngs}'.format(latLngs=self._decodeJs())
+        if self.options:
+            leafletJsObject += ', {options}'.format(options=self.options)
+        leafletJsObject += ')'
+        self._createJsObject(leafletJsObject, self._map.mapWidgetIndex)
+
+    def setEncoded(self, encoded):
+        """Remplace la géométrie (immédiatement si la polyligne est sur la carte)"""
+        self.latLngs = encoded
+        self.runJavaScriptForMapIndex('{name}.setLatLngs({latLngs})'.format(
+            name=self.jsName, latLngs=self._decodeJs()))
@@ -0,0 +1,150 @@
+"""
+Calcul des métriques d'une trace en une seule passe (distance, D+/D-, durée, emprise)
+"""
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+import numpy as np
+
+from core.geo import haversine_segments
+from core.points import ELEVATION_VALID, TIME_VALID
+
+
+@dataclass
+class TrackSummary:
+    """Résumé typé d'une trace GPS"""
+    distance_m: float = 0.0
+    denivele_positif: float = 0.0
+    denivele_negatif: float = 0.0
+    duration_s: float = 0.0
+    start_time_us: Optional[int] = None
+    end_time_us: Optional[int] = None
+    bounds: Optional[List[List[float]]] = None  # [[lat_min, lon_min], [lat_max, lon_max]]
+    nb_points: int = 0
+    nb_points_elevation: int = 0
+    nb_points_time: int = 0
+
+    @property
+    def distance_km(self) -> float:
+        return self.distance_m / 1000
+
+    def duree_dict(self) -> dict:
+        """Durée au format {'heures', 'minutes', 'secondes'} utilisé par l'affichage"""
+        return {
+            'heures': int(self.duration_s // 3600),
+            'minutes': int((self.duration_s % 3600) // 60),
+            'secondes': int(self.duration_s % 60)
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TrackSummary':
+        return cls(**data)
+
+
+class TrackMetricsAccumulator:
+    """
+    Accumule les métriques d'une trace bloc par bloc.
+
+    Chaque bloc de points est parcouru une seule fois pendant qu'il est encore
+    en cache : distance, dénivelés, bornes temporelles et emprise sont mis à
+    jour ensemble. Le dernier point de chaque bloc est conservé pour raccorder
+    le bloc suivant, ce qui permet d'alimenter l'accumulateur pendant le parsing.
+
+    Args:
+        keep_cumulative: Conserver la distance cumulée en chaque point
+    """
+
+    def __init__(self, keep_cumulative: bool = True):
+        self.keep_cumulative = keep_cumulative
+        self._summary = TrackSummary()
+        self._last_lat = None
+        self._last_lon = None
+        self._last_ele = np.nan
+        self._lat_min = self._lon_min = np.inf
+        self._lat_max = self._lon_max = -np.inf
+        self._cumulative_chunks = []
+
+    def update(self, latitudes, longitudes, elevations, times, validity):
+        """Intègre un bloc de points (tableaux NumPy de même longueur)"""
+        count = len(latitudes)
+        if count == 0:
+            return
+        summary = self._summary
+
+        # Distance (raccordée au dernier point du bloc précédent)
+        if self._last_lat is not None:
+            lats = np.concatenate(([self._last_lat], latitudes))
+            lons = np.concatenate(([self._last_lon], longitudes))
+        else:
+            lats, lons = latitudes, longitudes
+        segments = haversine_segments(lats, lons)
+        if self.keep_cumulative:
+            cumulative = np.cumsum(segments)
+            cumulative += summary.distance_m
+            if self._last_lat is None:
+                cumulative = np.concatenate(([0.0], cumulative))
+            self._cumulative_chunks.append(cumulative)
+        summary.distance_m += float(segments.sum())
+
+        # Dénivelés : seules les paires de points consécutifs ayant une altitude comptent
+        deniveles = np.diff(np.concatenate(([self._last_ele], elevations)))
+        deniveles = deniveles[~np.isnan(deniveles)]
+        summary.denivele_positif += float(deniveles[deniveles > 0].sum())
+        summary.denivele_negatif -= float(deniveles[deniveles < 0].sum())
+
+        # Bornes temporelles
+        timed = times[(validity & TIME_VALID).astype(bool)]
+        if len(timed):
+            first, last = int(timed.min()), int(timed.max())
+            if summary.start_time_us is None or first < summary.start_time_us:
+                summary.start_time_us = first
+            if summary.end_time_us is None or last > summary.end_time_us:
+                summary.end_time_us = last
+            summary.nb_points_time += len(timed)
+
+        # Emprise
+        self._lat_min = min(self._lat_min, float(latitudes.min()))
+        self._lat_max = max(self._lat_max, float(latitudes.max()))
+        self._lon_min = min(self._lon_min, float(longitudes.min()))
+        self._lon_max = max(self._lon_max, float(longitudes.max()))
+
+        summary.nb_points += count
+        summary.nb_points_elevation += int(np.count_nonzero(validity & ELEVATION_VALID))
+
+        self._last_lat = float(latitudes[-1])
+        self._last_lon = float(longitudes[-1])
+        self._last_ele = float(elevations[-1])
+
+    def update_store(self, store):
+        """Intègre tous les points d'un PointStore"""
+        self.update(store.latitudes, store.longitudes, store.elevations,
+                    store.times, store.validity)
+
+    def cumulative_distance(self) -> np.ndarray:
+        """Distance cumulée (m) en chaque point intégré"""
+        if not self._cumulative_chunks:
+            return np.zeros(self._summary.nb_points, dtype=np.float64)
+        if len(self._cumulative_chunks) > 1:
+            self._cumulative_chunks = [np.concatenate(self._cumulative_chunks)]
+        return self._cumulative_chunks[0]
+
+    def summary(self) -> TrackSummary:
+        """Retourne le résumé des points intégrés jusqu'ici"""
+        summary = self._summary
+        if summary.nb_points:
+            summary.bounds = [[self._lat_min, self._lon_min], [self._lat_max, self._lon_max]]
+        if summary.nb_points_time >= 2:
+            summary.duration_s = (summary.end_time_us - summary.start_time_us) / 1e6
+        else:
+            summary.duration_s = 0.0
+        return TrackSummary(**asdict(summary))
+
+
+def compute_summary(store) -> TrackSummary:
+    """Calcule le résumé complet d'un PointStore en une passe"""
+    accumulator = TrackMetricsAccumulator(keep_cumulative=False)
+    accumulator.update_store(store)
+    return accumulator.summary()
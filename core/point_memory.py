@@ -0,0 +1,125 @@
+"""
+Budget mémoire des points chargés : les traces inactives sont libérées en LRU
+"""
+import mmap
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+DEFAULT_POINT_MEMORY_BUDGET = 1024 * 1024 * 1024  # 1 Go
+
+# Clé des réglages de l'application (core.settings) donnant le budget, en Mo
+SETTINGS_BUDGET_KEY = 'memoire_points_mo'
+
+# Zoom de l'aperçu gardé après libération : la trace reste dessinable à
+# l'échelle régionale sans relire ses points
+OVERVIEW_ZOOM = 10
+
+
+def resident_nbytes(array) -> int:
+    """
+    Mémoire d'un tableau possédée par le processus (0 s'il projette un fichier).
+
+    Les colonnes relues depuis le cache des analyses sont des np.memmap : le
+    système les charge et les libère seul, les évincer ne rend rien. Les
+    segments de mémoire partagée (tampon memoryview) restent comptés.
+    """
+    if array is None:
+        return 0
+    base = array
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return 0
+        base = getattr(base, 'base', None)
+    return array.nbytes
+
+
+def trace_point_bytes(gpx_data: Dict) -> int:
+    """Mémoire occupée par les points d'une trace (colonnes et distances cumulées)"""
+    points = gpx_data.get('points')
+    if points is None:
+        return 0
+    total = sum(resident_nbytes(getattr(points, name))
+                for name in ('latitudes', 'longitudes', 'elevations', 'times', 'validity'))
+    return total + resident_nbytes(gpx_data.get('cumulative_distance_m'))
+
+
+def budget_from_settings(settings: Optional[Dict]) -> int:
+    """Budget mémoire des points (en octets) choisi dans les réglages, sinon celui par défaut"""
+    megabytes = settings.get(SETTINGS_BUDGET_KEY) if settings else None
+    if not megabytes:
+        return DEFAULT_POINT_MEMORY_BUDGET
+    return int(megabytes) * 1024 * 1024
+
+
+class PointMemoryBudget:
+    """
+    Traces dont les points sont en mémoire, de la moins à la plus récemment utilisée.
+
+    Au-delà du budget, les points des traces les plus anciennes sont libérés
+    (hors traces protégées : sélectionnée, affichée). Le résumé et l'aperçu
+    simplifié restent disponibles, les points sont relus à la demande.
+
+    Args:
+        budget_bytes: Mémoire maximale des points chargés, en octets
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_POINT_MEMORY_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.loaded_bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def touch(self, key: Hashable, gpx_data: Dict):
+        """Marque les points d'une trace comme utilisés (et les compte s'ils viennent d'être chargés)"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        size = trace_point_bytes(gpx_data)
+        if size:
+            self._entries[key] = size
+            self.loaded_bytes += size
+
+    def forget(self, key: Hashable):
+        """Retire une trace dont les points ont été libérés"""
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self.loaded_bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.loaded_bytes = 0
+
+    def over_budget(self) -> bool:
+        return self.loaded_bytes > self.budget_bytes
+
+    def evict(self, release: Callable[[Hashable], None],
+              is_protected: Optional[Callable[[Hashable], bool]] = None) -> List[Hashable]:
+        """
+        Libère les traces les moins récemment utilisées jusqu'à revenir sous le budget.
+
+        Args:
+            release: Appelée avec la clé de chaque trace à libérer
+            is_protected: Les traces pour lesquelles elle renvoie True sont gardées
+
+        Returns:
+            list: Clés des traces libérées
+        """
+        evicted = []
+        if not self.over_budget():
+            return evicted
+        for key in list(self._entries):
+            if not self.over_budget():
+                break
+            if is_protected is not None and is_protected(key):
+                continue
+            release(key)
+            self.forget(key)
+            evicted.append(key)
+        return evicted
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
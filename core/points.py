@@ -0,0 +1,210 @@
+"""
+Stockage colonnaire des points GPS (tableaux NumPy contigus)
+"""
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+# Bits du masque de validité
+ELEVATION_VALID = 1
+TIME_VALID = 2
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def datetime_to_epoch_us(time: datetime) -> int:
+    """Convertit un datetime en microsecondes depuis l'epoch (UTC si naïf)"""
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return (time - EPOCH) // ONE_MICROSECOND
+
+
+def epoch_us_to_datetime(value: int) -> datetime:
+    """Convertit des microsecondes depuis l'epoch en datetime UTC"""
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class TrackPointView:
+    """Vue légère sur un point du PointStore, compatible avec TrackPoint"""
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store: 'PointStore', index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def latitude(self) -> float:
+        return float(self._store.latitudes[self._index])
+
+    @property
+    def longitude(self) -> float:
+        return float(self._store.longitudes[self._index])
+
+    @property
+    def elevation(self) -> Optional[float]:
+        if not self._store.validity[self._index] & ELEVATION_VALID:
+            return None
+        return float(self._store.elevations[self._index])
+
+    @property
+    def time(self) -> Optional[datetime]:
+        if not self._store.validity[self._index] & TIME_VALID:
+            return None
+        return epoch_us_to_datetime(self._store.times[self._index])
+
+    def __repr__(self):
+        return f"Point(lat={self.latitude:.6f}, lon={self.longitude:.6f}, elev={self.elevation}m, time={self.time})"
+
+
+class PointStore:
+    """
+    Points d'une trace sous forme de colonnes (struct-of-arrays).
+
+    Attributs:
+        latitudes, longitudes: float64 en degrés
+        elevations: float64 en mètres (NaN si absente)
+        times: int64 en microsecondes depuis l'epoch UTC (0 si absent)
+        validity: uint8, bits ELEVATION_VALID / TIME_VALID
+    """
+    __slots__ = ('latitudes', 'longitudes', 'elevations', 'times', 'validity')
+
+    def __init__(self, latitudes, longitudes, elevations, times, validity):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.elevations = elevations
+        self.times = times
+        self.validity = validity
+
+    @classmethod
+    def empty(cls) -> 'PointStore':
+        return cls(np.empty(0, np.float64), np.empty(0, np.float64),
+                   np.empty(0, np.float64), np.empty(0, np.int64),
+                   np.empty(0, np.uint8))
+
+    @classmethod
+    def from_points(cls, points) -> 'PointStore':
+        """Construit un PointStore depuis des objets exposant latitude/longitude/elevation/time"""
+        builder = PointStoreBuilder()
+        for point in points:
+            builder.append(point.latitude, point.longitude, point.elevation, point.time)
+        return builder.build()
+
+    @property
+    def has_elevation(self) -> np.ndarray:
+        return (self.validity & ELEVATION_VALID).astype(bool)
+
+    @property
+    def has_time(self) -> np.ndarray:
+        return (self.validity & TIME_VALID).astype(bool)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.latitudes.nbytes + self.longitudes.nbytes + self.elevations.nbytes
+                + self.times.nbytes + self.validity.nbytes)
+
+    def bounds(self):
+        """Retourne [[lat_min, lon_min], [lat_max, lon_max]] ou None si vide"""
+        if not len(self):
+            return None
+        return [
+            [float(self.latitudes.min()), float(self.longitudes.min())],
+            [float(self.latitudes.max()), float(self.longitudes.max())]
+        ]
+
+    def latlngs(self):
+        """Coordonnées au format [[lat, lon], ...] attendu par Leaflet"""
+        return np.column_stack((self.latitudes, self.longitudes)).tolist()
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def __getitem__(self, index):
+        if isinstance(index, (slice, np.ndarray)):
+            # Tranche ou tableau d'indices : nouveau PointStore
+            return PointStore(self.latitudes[index], self.longitudes[index],
+                              self.elevations[index], self.times[index],
+                              self.validity[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index de point hors limites")
+        return TrackPointView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield TrackPointView(self, index)
+
+    def __repr__(self):
+        return f"PointStore({len(self)} points)"
+
+
+class PointStoreBuilder:
+    """
+    Collecteur incrémental de points (tampons array.array, sans objet par point)
+
+    Args:
+        accumulator: Objet optionnel exposant update(lat, lon, ele, times, validity),
+            alimenté par blocs de chunk_size points pendant la collecte
+        chunk_size: Nombre de points par bloc transmis à l'accumulateur
+    """
+
+    def __init__(self, accumulator=None, chunk_size: int = 65536):
+        self._latitudes = array('d')
+        self._longitudes = array('d')
+        self._elevations = array('d')
+        self._times = array('q')
+        self._validity = array('B')
+        self.accumulator = accumulator
+        self.chunk_size = chunk_size
+        self._flushed = 0
+
+    def append(self, latitude, longitude, elevation=None, time=None):
+        flags = 0
+        self._latitudes.append(latitude)
+        self._longitudes.append(longitude)
+        if elevation is None:
+            self._elevations.append(float('nan'))
+        else:
+            self._elevations.append(elevation)
+            flags |= ELEVATION_VALID
+        if time is None:
+            self._times.append(0)
+        else:
+            self._times.append(datetime_to_epoch_us(time))
+            flags |= TIME_VALID
+        self._validity.append(flags)
+        if self.accumulator is not None and len(self._validity) - self._flushed >= self.chunk_size:
+            self._flush()
+
+    def __len__(self):
+        return len(self._latitudes)
+
+    def _flush(self):
+        """Transmet les points pas encore vus à l'accumulateur"""
+        start, end = self._flushed, len(self._validity)
+        if end == start:
+            return
+        # Copie du bloc : une vue NumPy bloquerait l'agrandissement des tampons
+        self.accumulator.update(
+            np.frombuffer(self._latitudes[start:end], dtype=np.float64),
+            np.frombuffer(self._longitudes[start:end], dtype=np.float64),
+            np.frombuffer(self._elevations[start:end], dtype=np.float64),
+            np.frombuffer(self._times[start:end], dtype=np.int64),
+            np.frombuffer(self._validity[start:end], dtype=np.uint8),
+        )
+        self._flushed = end
+
+    def build(self) -> PointStore:
+        """Expose les tampons sous forme de tableaux NumPy (sans copie)"""
+        if self.accumulator is not None:
+            self._flush()
+        return PointStore(
+            np.frombuffer(self._latitudes, dtype=np.float64),
+            np.frombuffer(self._longitudes, dtype=np.float64),
+            np.frombuffer(self._elevations, dtype=np.float64),
+            np.frombuffer(self._times, dtype=np.int64),
+            np.frombuffer(self._validity, dtype=np.uint8),
+        )
@@ -0,0 +1,208 @@
+"""
+Profil utilisateur : lecture mise en cache, enregistrement et notifications (sans Qt)
+"""
+import hashlib
+import json
+import os
+import os.path
+from os import getcwd
+from typing import Callable, Dict, Optional, Set
+
+RESSOURCES_FOLDER = os.path.join(getcwd(), "ressources")
+CONFIG_FILE = RESSOURCES_FOLDER + '/user_profile.json'
+
+
+class ProfileCache:
+    """
+    Profil utilisateur gardé en mémoire pour tout le processus.
+
+    Le fichier n'est relu que si sa date de modification ou sa taille a changé.
+    Les écouteurs sont appelés avec les clés modifiées et le nouveau profil,
+    qu'il ait été enregistré par save() ou modifié sur le disque.
+
+    Args:
+        config_file: Chemin du fichier JSON du profil
+    """
+
+    def __init__(self, config_file: str = CONFIG_FILE):
+        self.config_file = config_file
+        self._config: Optional[Dict] = None
+        self._stat = None
+        self._fingerprint: Optional[str] = None
+        self._listeners = []
+
+    def get(self) -> Optional[Dict]:
+        """Retourne une copie du profil, ou None s'il n'existe pas ou est illisible"""
+        self._refresh()
+        return dict(self._config) if self._config is not None else None
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """Empreinte du contenu du profil (change dès qu'une valeur change)"""
+        self._refresh()
+        return self._fingerprint
+
+    def save(self, config: Dict):
+        """Enregistre le profil (écriture atomique) et prévient les écouteurs"""
+        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+        temp_file = f"{self.config_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4, ensure_ascii=False)
+        os.replace(temp_file, self.config_file)
+        self._update(dict(config), self._stat_file())
+
+    def add_listener(self, callback: Callable[[Set[str], Optional[Dict]], None]):
+        """callback(clés_modifiées, profil) est appelé à chaque changement du profil"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def invalidate(self):
+        """Force la relecture du fichier au prochain accès"""
+        self._stat = None
+
+    def _stat_file(self):
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        stat = self._stat_file()
+        if stat is not None and stat == self._stat:
+            return
+        if stat is None:
+            config = None
+        else:
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except (OSError, ValueError):
+                config = None
+        self._update(config, stat)
+
+    def _update(self, config: Optional[Dict], stat):
+        previous = self._config
+        self._config = config
+        self._stat = stat
+        self._fingerprint = profile_fingerprint(config)
+
+        changed = _changed_keys(previous, config)
+        if changed:
+            for callback in list(self._listeners):
+                callback(changed, self.get() if config is not None else None)
+
+
+def profile_fingerprint(config: Optional[Dict]) -> Optional[str]:
+    """Empreinte d'un profil (celle de ProfileCache.fingerprint pour le même contenu)"""
+    if config is None:
+        return None
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _changed_keys(previous: Optional[Dict], current: Optional[Dict]) -> Set[str]:
+    previous = previous or {}
+    current = current or {}
+    return {key for key in previous.keys() | current.keys()
+            if previous.get(key) != current.get(key)}
+
+
+_default_cache = None
+
+
+def get_profile_cache() -> ProfileCache:
+    """Retourne le cache du profil partagé par le processus"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ProfileCache()
+    return _default_cache
+
+
+def get_user_config(config_name="user_profile"):
+    """Fonction utilitaire pour récupérer la configuration utilisateur"""
+    return get_profile_cache().get()
+
+
+def save_user_config(config):
+    """Enregistre la configuration utilisateur et prévient les vues qui en dépendent"""
+    get_profile_cache().save(config)
+
+
+def detect_activity_from_filename(filename):
+    """
+    Détecte l'activité sportive à partir du nom de fichier.
+    Retourne le code d'activité (ex: 'course', 'velo') ou None si non détecté.
+    """
+    filename_upper = filename.upper()
+    
+    # Dictionnaire de mots-clés pour chaque activité
+    keywords = {
+        "marche": ["MARCHE", "WALK"],
+        "course": ["COURSE", "RUN", "RUNNING", "FOOTING", "JOGGING"],
+        "velo": ["VELO", "VÉLO", "BIKE", "CYCLING", "CYCLISME"],
+        "vtt": ["VTT", "MTB", "MOUNTAIN"],
+        "ski": ["SKI", "SKIING"],
+        "randonnee": ["RANDONNEE", "RANDONNÉE", "RANDO", "HIKING", "HIKE", "TREK"],
+        "natation": ["NATATION", "NAT", "SWIM", "SWIMMING", "PISCINE"]
+    }
+    
+    # Chercher les mots-clés dans le nom de fichier
+    for activity, words in keywords.items():
+        for word in words:
+            if word in filename_upper:
+                return activity
+    
+    return None
+
+
+def get_activity_display_name(activity_code):
+    """
+    Convertit le code d'activité en nom d'affichage.
+    """
+    display_map = {
+        "marche": "Marche",
+        "course": "Course à pied",
+        "velo": "Vélo",
+        "vtt": "VTT",
+        "ski": "Ski",
+        "randonnee": "Randonnée",
+        "natation": "Natation"
+    }
+    return display_map.get(activity_code, activity_code)
+
+
+def get_activity_for_trace(filename, user_config=None):
+    """
+    Détermine l'activité à utiliser pour une trace donnée.
+    
+    Args:
+        filename: Nom du fichier GPX
+        user_config: Configuration utilisateur (obtenue via get_user_config())
+    
+    Returns:
+        tuple: (activity_code, activity_display_name, is_detected)
+        - activity_code: code de l'activité (ex: 'course')
+        - activity_display_name: nom d'affichage (ex: 'Course à pied')
+        - is_detected: True si l'activité a été auto-détectée
+    """
+    if user_config is None:
+        user_config = get_user_config()
+    
+    # Activité par défaut
+    default_activity = user_config.get("activite_defaut", "marche") if user_config else "marche"
+    default_display = user_config.get("activite_defaut_display", "Marche") if user_config else "Marche"
+    
+    # Vérifier si l'auto-détection est activée
+    auto_detect = user_config.get("auto_detect_activity", True) if user_config else True
+    
+    if auto_detect:
+        detected_activity = detect_activity_from_filename(filename)
+        if detected_activity:
+            return (detected_activity, get_activity_display_name(detected_activity), True)
+    
+    # Retourner l'activité par défaut
+    return (default_activity, default_display, False)
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Réglages de l'application, séparés du profil utilisateur (sans Qt)
+
+Le profil ne contient que les données qui entrent dans les métriques (son
+empreinte invalide le cache des métriques et il est recopié dans les exports) ;
+les réglages techniques comme le budget mémoire sont enregistrés ici.
+"""
+import json
+import os
+import os.path
+from typing import Dict
+
+from core.profile import RESSOURCES_FOLDER
+
+SETTINGS_FILE = os.path.join(RESSOURCES_FOLDER, 'settings.json')
+
+
+def get_app_settings(settings_file: str = SETTINGS_FILE) -> Dict:
+    """Retourne les réglages enregistrés ({} si le fichier est absent ou illisible)"""
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+def save_app_settings(settings: Dict, settings_file: str = SETTINGS_FILE):
+    """Enregistre les réglages (écriture atomique)"""
+    os.makedirs(os.path.dirname(settings_file), exist_ok=True)
+    temp_file = f"{settings_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=4, ensure_ascii=False)
+    os.replace(temp_file, settings_file)
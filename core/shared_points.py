@@ -0,0 +1,231 @@
+"""
+Transfert des points analysés entre processus via la mémoire partagée
+"""
+import sys
+import time
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from core.gpx import load_gpx_data
+from core.points import PointStore
+from core.simplify import SimplificationPyramid
+
+# Colonnes float64/int64 du segment, suivies de la colonne uint8 'validity'
+WIDE_COLUMNS = (
+    ('latitudes', np.float64),
+    ('longitudes', np.float64),
+    ('elevations', np.float64),
+    ('times', np.int64),
+    ('cumulative_distance', np.float64),
+    ('significance', np.float64),
+)
+
+# Sous Windows un segment disparaît dès que plus aucun processus ne l'ouvre :
+# le processus d'import garde donc ses segments ouverts le temps qu'ils soient attachés
+WINDOWS_SEGMENT_GRACE_SECONDS = 60
+_published_segments = []
+
+
+class SharedPointsHandle:
+    """Description picklable d'un segment de points publié par un processus d'import"""
+
+    def __init__(self, name: str, count: int):
+        self.name = name
+        self.count = count
+
+    @staticmethod
+    def segment_size(count: int) -> int:
+        return count * (8 * len(WIDE_COLUMNS) + 1)
+
+
+def _untrack(segment):
+    """Empêche le resource_tracker du processus d'import de détruire le segment à sa sortie"""
+    if sys.platform != 'win32':
+        try:
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        except Exception:
+            pass
+
+
+def publish_points(points: PointStore, cumulative_distance: np.ndarray,
+                   significance: np.ndarray) -> Optional[SharedPointsHandle]:
+    """
+    Copie les colonnes d'une trace dans un segment de mémoire partagée.
+
+    Returns:
+        SharedPointsHandle ou None si la trace est vide
+    """
+    count = len(points)
+    if count == 0:
+        return None
+
+    segment = shared_memory.SharedMemory(create=True, size=SharedPointsHandle.segment_size(count))
+    _untrack(segment)
+
+    sources = {'cumulative_distance': cumulative_distance, 'significance': significance}
+    offset = 0
+    for name, dtype in WIDE_COLUMNS:
+        source = sources[name] if name in sources else getattr(points, name)
+        np.ndarray(count, dtype=dtype, buffer=segment.buf, offset=offset)[:] = source
+        offset += count * 8
+    np.ndarray(count, dtype=np.uint8, buffer=segment.buf, offset=offset)[:] = points.validity
+
+    handle = SharedPointsHandle(segment.name, count)
+    if sys.platform == 'win32':
+        now = time.monotonic()
+        while _published_segments and now - _published_segments[0][0] > WINDOWS_SEGMENT_GRACE_SECONDS:
+            _published_segments.pop(0)[1].close()
+        _published_segments.append((now, segment))
+    else:
+        segment.close()
+    return handle
+
+
+def load_gpx_data_shared(fichier_gpx):
+    """
+    Analyse un fichier GPX dans un processus d'import et publie ses points
+    en mémoire partagée au lieu de les renvoyer par pickle.
+    """
+    gpx_data = load_gpx_data(fichier_gpx)
+    handle = publish_points(gpx_data['points'], gpx_data['cumulative_distance_m'],
+                            gpx_data['simplification'].significance)
+    if handle is not None:
+        gpx_data['points'] = None
+        gpx_data['cumulative_distance_m'] = None
+        gpx_data['simplification'] = None
+    gpx_data['shared_points'] = handle
+    return gpx_data
+
+
+class SharedSegmentRegistry:
+    """
+    Segments de mémoire partagée attachés par le processus principal.
+
+    Chaque segment a un compteur de références : il est fermé et détruit quand
+    la dernière trace qui l'utilise est retirée. Un segment encore référencé par
+    des tableaux NumPy est détruit puis fermé plus tard, au prochain nettoyage.
+
+    NumPy ne bloque pas la fermeture d'un segment dont il lit le tampon : toutes
+    les colonnes sont donc des vues d'un tableau racine suivi par weakref, et le
+    segment n'est fermé qu'une fois ce tableau libéré.
+    """
+
+    def __init__(self):
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._blocks: Dict[str, list] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._pending_close = []
+
+    def attach(self, handle: SharedPointsHandle):
+        """
+        Attache un segment sans copie.
+
+        Returns:
+            tuple: (PointStore, distances_cumulees, significance) qui lisent directement le segment
+        """
+        self.collect()
+        segment = self._segments.get(handle.name)
+        if segment is None:
+            segment = shared_memory.SharedMemory(name=handle.name)
+            self._segments[handle.name] = segment
+            self._blocks[handle.name] = []
+            self._refcounts[handle.name] = 0
+        self._refcounts[handle.name] += 1
+
+        count = handle.count
+        block = np.ndarray(SharedPointsHandle.segment_size(count), dtype=np.uint8, buffer=segment.buf)
+        self._blocks[handle.name].append(weakref.ref(block))
+
+        columns = {}
+        offset = 0
+        for name, dtype in WIDE_COLUMNS:
+            columns[name] = block[offset:offset + count * 8].view(dtype)
+            offset += count * 8
+        validity = block[offset:offset + count]
+
+        points = PointStore(columns['latitudes'], columns['longitudes'],
+                            columns['elevations'], columns['times'], validity)
+        return points, columns['cumulative_distance'], columns['significance']
+
+    def retain(self, name: Optional[str]):
+        """Ajoute une référence à un segment déjà attaché"""
+        if name in self._refcounts:
+            self._refcounts[name] += 1
+
+    def release(self, name: Optional[str]):
+        """Retire une référence ; le segment est détruit à la dernière"""
+        if name not in self._refcounts:
+            return
+        self._refcounts[name] -= 1
+        if self._refcounts[name] > 0:
+            return
+
+        del self._refcounts[name]
+        segment = self._segments.pop(name)
+        blocks = self._blocks.pop(name)
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+        self._pending_close.append((segment, blocks))
+        self.collect()
+
+    def release_all(self):
+        """Détruit tous les segments attachés"""
+        for name in list(self._refcounts):
+            self._refcounts[name] = 1
+            self.release(name)
+
+    def collect(self):
+        """Ferme les segments détruits qui ne sont plus référencés par des tableaux"""
+        still_pending = []
+        for segment, blocks in self._pending_close:
+            if any(block() is not None for block in blocks):
+                still_pending.append((segment, blocks))
+                continue
+            try:
+                segment.close()
+            except BufferError:
+                still_pending.append((segment, blocks))
+        self._pending_close = still_pending
+
+
+def discard_shared_points(handle: Optional[SharedPointsHandle]):
+    """Détruit un segment publié dont le résultat ne sera pas utilisé (import annulé)"""
+    if handle is None:
+        return
+    try:
+        segment = shared_memory.SharedMemory(name=handle.name)
+    except FileNotFoundError:
+        return
+    segment.unlink()
+    segment.close()
+
+
+def attach_shared_trace(gpx_data: dict, registry: SharedSegmentRegistry) -> dict:
+    """Remplace la description du segment par les tableaux attachés (côté interface)"""
+    handle = gpx_data.pop('shared_points', None)
+    if handle is None:
+        gpx_data['shared_segment'] = None
+        return gpx_data
+
+    points, cumulative, significance = registry.attach(handle)
+    gpx_data['points'] = points
+    gpx_data['cumulative_distance_m'] = cumulative
+    gpx_data['simplification'] = SimplificationPyramid(significance)
+    gpx_data['shared_segment'] = handle.name
+    return gpx_data
+
+
+_default_registry = None
+
+
+def get_shared_registry() -> SharedSegmentRegistry:
+    """Retourne le registre de segments du processus principal"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = SharedSegmentRegistry()
+    return _default_registry
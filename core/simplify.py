@@ -0,0 +1,155 @@
+"""
+Simplification des traces selon le niveau de zoom (pyramide Douglas-Peucker)
+"""
+from typing import Dict
+
+import numpy as np
+
+from core.points import PointStore
+
+# Tolérance en pixels écran : sous le demi-pixel, la simplification est invisible
+SIMPLIFY_TOLERANCE_PX = 0.5
+TILE_SIZE_PX = 256
+
+# Au-delà de ce zoom, tous les points de la trace sont dessinés
+PYRAMID_MAX_ZOOM = 18
+
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+
+def mercator_xy(latitudes: np.ndarray, longitudes: np.ndarray):
+    """
+    Projette des coordonnées en Web Mercator normalisé (le monde entier tient dans [0, 1]²).
+
+    Au zoom z, une unité vaut TILE_SIZE_PX · 2^z pixels écran.
+    """
+    x = (np.asarray(longitudes, dtype=np.float64) + 180.0) / 360.0
+    lat = np.radians(np.clip(latitudes, -MAX_MERCATOR_LATITUDE, MAX_MERCATOR_LATITUDE))
+    y = 0.5 - np.log(np.tan(np.pi / 4 + lat / 2)) / (2 * np.pi)
+    return x, y
+
+
+def zoom_tolerance(zoom: float, tolerance_px: float = SIMPLIFY_TOLERANCE_PX) -> float:
+    """Tolérance en unités Mercator normalisées correspondant à tolerance_px au zoom donné"""
+    return tolerance_px / (TILE_SIZE_PX * 2.0 ** zoom)
+
+
+def douglas_peucker_significance(x: np.ndarray, y: np.ndarray, min_tolerance: float = 0.0) -> np.ndarray:
+    """
+    Calcule pour chaque point la plus grande tolérance Douglas-Peucker qui le conserve.
+
+    Garder les points dont la significance est > t donne exactement le résultat
+    de Douglas-Peucker à la tolérance t : tous les niveaux de zoom se déduisent
+    donc d'un seul calcul. Tous les segments d'un même niveau de récursion sont
+    traités ensemble (une passe NumPy par niveau, pas une par point).
+
+    Args:
+        x, y: Coordonnées projetées
+        min_tolerance: La récursion s'arrête sous cette distance (significance 0)
+
+    Returns:
+        np.ndarray: significance de chaque point (inf pour les extrémités)
+    """
+    n = len(x)
+    significance = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+
+    starts = np.array([0], dtype=np.int64)
+    ends = np.array([n - 1], dtype=np.int64)
+    parents = np.array([np.inf])
+
+    while len(starts):
+        interior = ends - starts - 1
+        keep = interior > 0
+        starts, ends, parents, interior = starts[keep], ends[keep], parents[keep], interior[keep]
+        if not len(starts):
+            break
+
+        # Indices des points intérieurs de chaque segment, à plat
+        offsets = np.zeros(len(starts), dtype=np.int64)
+        np.cumsum(interior[:-1], out=offsets[1:])
+        segment_ids = np.repeat(np.arange(len(starts)), interior)
+        indices = np.arange(len(segment_ids)) - offsets[segment_ids] + starts[segment_ids] + 1
+
+        # Distance de chaque point à la corde de son segment (pas à la droite :
+        # une boucle a une corde nulle)
+        ax, ay = x[starts][segment_ids], y[starts][segment_ids]
+        dx = x[ends][segment_ids] - ax
+        dy = y[ends][segment_ids] - ay
+        px = x[indices] - ax
+        py = y[indices] - ay
+        length_sq = dx * dx + dy * dy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(length_sq > 0, (px * dx + py * dy) / length_sq, 0.0)
+        np.clip(t, 0.0, 1.0, out=t)
+        px -= t * dx
+        py -= t * dy
+        distances = np.hypot(px, py)
+
+        # Point le plus éloigné de chaque segment (premier en cas d'égalité)
+        maxima = np.maximum.reduceat(distances, offsets)
+        candidates = np.flatnonzero(distances == maxima[segment_ids])
+        _, first = np.unique(segment_ids[candidates], return_index=True)
+        splits = indices[candidates[first]]
+
+        # Un point ne peut pas être plus significatif que celui qui l'a découpé
+        values = np.minimum(maxima, parents)
+        significance[splits] = values
+
+        deeper = maxima > min_tolerance
+        splits, values = splits[deeper], values[deeper]
+        starts = np.concatenate((starts[deeper], splits))
+        ends = np.concatenate((splits, ends[deeper]))
+        parents = np.concatenate((values, values))
+
+    return significance
+
+
+class SimplificationPyramid:
+    """
+    Niveaux de détail d'une trace, un par niveau de zoom.
+
+    Les niveaux sont emboîtés : chacun est le sous-ensemble des points dont la
+    significance dépasse la tolérance du zoom. Ils sont extraits à la demande
+    puis gardés en mémoire.
+
+    Args:
+        significance: Significance Douglas-Peucker de chaque point (en unités Mercator)
+    """
+
+    def __init__(self, significance: np.ndarray, tolerance_px: float = SIMPLIFY_TOLERANCE_PX):
+        self.significance = significance
+        self.tolerance_px = tolerance_px
+        self._levels: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_points(cls, points: PointStore, tolerance_px: float = SIMPLIFY_TOLERANCE_PX) -> 'SimplificationPyramid':
+        x, y = mercator_xy(points.latitudes, points.longitudes)
+        min_tolerance = zoom_tolerance(PYRAMID_MAX_ZOOM, tolerance_px)
+        return cls(douglas_peucker_significance(x, y, min_tolerance), tolerance_px)
+
+    @staticmethod
+    def level_for_zoom(zoom) -> int:
+        """Niveau de la pyramide à utiliser pour un zoom (éventuellement fractionnaire)"""
+        return int(min(max(np.ceil(zoom), 0), PYRAMID_MAX_ZOOM + 1))
+
+    def indices(self, zoom) -> np.ndarray:
+        """Indices des points conservés au zoom donné"""
+        level = self.level_for_zoom(zoom)
+        indices = self._levels.get(level)
+        if indices is None:
+            if level > PYRAMID_MAX_ZOOM:
+                indices = np.arange(len(self.significance))
+            else:
+                indices = np.flatnonzero(self.significance > zoom_tolerance(level, self.tolerance_px))
+            self._levels[level] = indices
+        return indices
+
+    def simplify(self, points: PointStore, zoom) -> PointStore:
+        """Points de la trace au niveau de détail du zoom"""
+        return points[self.indices(zoom)]
+
+    def __len__(self):
+        return len(self.significance)
@@ -0,0 +1,83 @@
+"""
+Index des emprises des traces pour savoir lesquelles sont dans la vue de la carte
+"""
+from typing import Dict
+
+import numpy as np
+
+
+class BoundsIndex:
+    """
+    Emprises [[lat_min, lon_min], [lat_max, lon_max]] indexées par clé entière.
+
+    Les emprises sont rangées en colonnes : une requête teste toutes les traces
+    en une opération NumPy. Les emplacements libérés sont réutilisés.
+
+    Args:
+        capacity: Nombre d'emprises réservées au départ
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._bounds = np.zeros((capacity, 4), dtype=np.float64)  # sud, ouest, nord, est
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._slots: Dict[int, int] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def add(self, key: int, bounds):
+        """Ajoute (ou remplace) l'emprise d'une clé"""
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[key] = slot
+        (south, west), (north, east) = bounds
+        self._bounds[slot] = (south, west, north, east)
+        self._keys[slot] = key
+        self._active[slot] = True
+
+    def remove(self, key: int):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._active[slot] = False
+            self._free.append(slot)
+
+    def clear(self):
+        self._active[:] = False
+        self._slots.clear()
+        self._free = list(range(len(self._active) - 1, -1, -1))
+
+    def query(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """
+        Clés dont l'emprise croise la zone donnée.
+
+        Les longitudes de la zone peuvent sortir de [-180, 180] (carte Leaflet
+        déplacée au-delà de l'antiméridien).
+        """
+        bounds = self._bounds
+        mask = self._active & (bounds[:, 0] <= north) & (bounds[:, 2] >= south)
+
+        if east - west < 360:
+            # Ramène la zone dans [-180, 180[ ; elle peut alors déborder à l'est
+            shift = np.floor((west + 180) / 360) * 360
+            west, east = west - shift, east - shift
+            longitudes = (bounds[:, 1] <= east) & (bounds[:, 3] >= west)
+            if east > 180:
+                longitudes |= (bounds[:, 1] <= east - 360) & (bounds[:, 3] >= west - 360)
+            mask &= longitudes
+
+        return self._keys[mask]
+
+    def _grow(self):
+        capacity = len(self._active)
+        self._bounds = np.concatenate((self._bounds, np.zeros((capacity, 4))))
+        self._keys = np.concatenate((self._keys, np.zeros(capacity, dtype=np.int64)))
+        self._active = np.concatenate((self._active, np.zeros(capacity, dtype=bool)))
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
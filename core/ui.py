@@ -1,21 +1,41 @@
 import os.path
+from itertools import count
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
                              QWidget, QPushButton, QSpinBox, QLabel, QFileDialog,
-                             QListWidget, QListWidgetItem, QCheckBox, QMessageBox, QMenu)
+                             QListWidget, QListWidgetItem, QCheckBox, QMessageBox, QMenu,
+                             QProgressDialog)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon
 from pyqtlet2 import L, MapWidget
 
-from core.gpx import get_info
+from core.aggregates import BoundsAggregate, TraceAggregate
+from core.geo import encode_polyline
+from core.gpx import archive_gpx_file, ensure_points, load_simplification, ARCHIVE_DIR
+from core.importer import GPXImportJob, HeaderScanJob, create_import_executor
+from core.map_view import EncodedPolyline, GandalfMap, TraceLayerGroup
+from core.point_memory import OVERVIEW_ZOOM, PointMemoryBudget, budget_from_settings
+from core.points import PointStore
+from core.profile import get_profile_cache
+from core.settings import get_app_settings
+from core.shared_points import get_shared_registry
+from core.simplify import SimplificationPyramid
+from core.spatial_index import BoundsIndex
 from core.user_config import UserConfigDialog, get_user_config, get_activity_for_trace
-from utils.calculator import calculate_calories, calculate_fitness_metrics
+from utils.metrics_cache import get_metrics_cache
 from utils.info_display import *
-from utils.export_data import export_to_json, export_to_csv
+from utils.export_data import export_to_json, export_to_csv, start_export
+from utils.point_export import PYARROW_FORMATS, pyarrow_available
 
 # Couleurs pour les différentes traces
 TRACE_COLORS = ['#FF0000', '#0000FF', '#00FF00', '#FF00FF', '#FFA500', 
                 '#00FFFF', '#FFFF00', '#8B00FF', '#FF1493', '#32CD32']
 
+# Clés du profil sans effet sur les statistiques affichées (l'activité est fixée à l'import)
+PROFILE_KEYS_WITHOUT_DISPLAY = {'auto_detect_activity'}
+
+# Marge autour de la vue (en fraction de sa taille) dans laquelle les traces restent chargées
+CULLING_MARGIN = 0.5
+
 
 class MapWindow(QMainWindow):
     def __init__(self):
@@ -121,6 +141,15 @@ class MapWindow(QMainWindow):
         btn_fit.clicked.connect(self.fit_bounds)
         controls_layout.addWidget(btn_fit)
         
+        # Afficher / masquer toutes les traces
+        btn_show_traces = QPushButton("Tout afficher")
+        btn_show_traces.clicked.connect(lambda: self.set_all_traces_visible(True))
+        controls_layout.addWidget(btn_show_traces)
+        
+        btn_hide_traces = QPushButton("Tout masquer")
+        btn_hide_traces.clicked.connect(lambda: self.set_all_traces_visible(False))
+        controls_layout.addWidget(btn_hide_traces)
+        
         controls_layout.addStretch()
         right_layout.addLayout(controls_layout)
         
@@ -152,7 +181,34 @@ class MapWindow(QMainWindow):
         # Stockage des traces
         self.loaded_traces = []  # Liste de dicts: {data, polyline, color, visible, checkbox}
         self.map = None
+        self.map_view = None  # Dernière vue connue : zoom et emprise visible
         self.selected_trace_index = None  # Index de la trace sélectionnée
+        
+        # Emprise de chaque trace, pour ne garder sur la carte que celles en vue
+        self.trace_index = BoundsIndex()
+        self._trace_ids = count()
+        
+        # Agrégats des traces visibles : emprise (« Centrer sur traces ») et totaux
+        self.visible_bounds = BoundsAggregate()
+        self.visible_stats = TraceAggregate()
+        
+        # Import parallèle (points reçus en mémoire partagée)
+        self.import_executor = None
+        self.import_job = None
+        self.import_jobs = []  # Imports pas encore terminés (abandonnés à la fermeture)
+        self.header_scans = []  # Premières phases d'import en cours (threads)
+        self._closing = False
+        self.shared_registry = get_shared_registry()
+        
+        # Exports en cours (threads) ; leurs traces ne sont pas libérées
+        self.export_jobs = []
+        
+        # Points chargés, du moins au plus récemment utilisé (libérés au-delà
+        # du budget, choisi dans les réglages de l'application)
+        self.point_memory = PointMemoryBudget(budget_from_settings(get_app_settings()))
+        
+        # Les statistiques sont recalculées quand le profil change
+        get_profile_cache().add_listener(self.on_profile_changed)
 
     def showEvent(self, event):
         """Appelé quand la fenêtre est affichée"""
@@ -163,14 +219,16 @@ class MapWindow(QMainWindow):
     def setup_map(self):
         """Initialise ou réinitialise la carte"""
         if hasattr(self, 'map') and self.map is not None:
-            # Nettoyer les anciennes polylines
+            # Nettoyer les anciennes polylines (une seule opération)
+            self.trace_group.clearLayers()
             for trace in self.loaded_traces:
-                if trace.get('polyline'):
-                    self.map.removeLayer(trace['polyline'])
+                trace['polyline'] = None
         
         # Créer la carte
-        self.map = L.map(self.map_widget)
-        self.map.setView([46.5, 2.5], 6)
+        self.map = GandalfMap(self.map_widget)
+        self.map_zoom = 6
+        self.map.setView([46.5, 2.5], self.map_zoom)
+        self.map.viewChanged.connect(self.on_map_view_changed)
         
         L.tileLayer(
             'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
@@ -180,30 +238,130 @@ class MapWindow(QMainWindow):
             }
         ).addTo(self.map)
         
+        # Toutes les traces sont regroupées dans un LayerGroup
+        self.trace_group = TraceLayerGroup()
+        self.trace_group.addTo(self.map)
+        
         # Redessiner toutes les traces visibles
-        for trace in self.loaded_traces:
-            if trace['visible']:
-                self.draw_trace(trace)
+        self.sync_trace_layers()
         
         print("Carte PyQtlet interactive générée !")
 
     def draw_trace(self, trace):
-        """Dessine une trace sur la carte"""
-        if not trace['data']['points']:
-            return
-        
-        coords = [[p.latitude, p.longitude] for p in trace['data']['points']]
-        
-        polyline = L.polyline(
-            coords,
+        """Crée la polyligne d'une trace (ajoutée à la carte par sync_trace_layers)"""
+        data = trace['data']
+        # Trace en cours d'analyse ou vide : rien à dessiner pour l'instant
+        if data.get('summary_pending') or not data['summary'].nb_points:
+            return None
+        
+        # Seuls les points visibles au zoom courant sont envoyés à Leaflet, encodés
+        polyline = EncodedPolyline.fromPoints(
+            self.trace_level_points(trace),
             {
                 'color': trace['color'],
                 'weight': 4,
                 'opacity': 0.8
             }
         )
-        polyline.addTo(self.map)
         trace['polyline'] = polyline
+        return polyline
+
+    def traces_in_view(self):
+        """Identifiants des traces dont l'emprise croise la vue (None = pas encore de vue)"""
+        if self.map_view is None:
+            return None
+        view = self.map_view
+        # Marge autour de la vue pour les petits déplacements
+        lat_margin = (view['north'] - view['south']) * CULLING_MARGIN
+        lon_margin = (view['east'] - view['west']) * CULLING_MARGIN
+        return set(self.trace_index.query(
+            view['south'] - lat_margin, view['west'] - lon_margin,
+            view['north'] + lat_margin, view['east'] + lon_margin
+        ).tolist())
+
+    def sync_trace_layers(self, traces=None):
+        """
+        Met la carte en accord avec la visibilité des traces et la vue courante.
+        
+        Une trace visible n'est sur la carte que si son emprise croise la vue.
+        Les traces qui sortent de la vue sont libérées côté page, leur géométrie
+        est renvoyée quand elles y reviennent.
+        """
+        if self.map is None:
+            return
+        
+        in_view = self.traces_in_view()
+        to_add, to_hide, to_dispose = [], [], []
+        for trace in (self.loaded_traces if traces is None else traces):
+            polyline = trace['polyline']
+            if in_view is not None and trace['id'] not in in_view:
+                if polyline is not None:
+                    to_dispose.append(polyline)
+                    trace['polyline'] = None
+            elif not trace['visible']:
+                if polyline is not None and self.trace_group.hasLayer(polyline):
+                    to_hide.append(polyline)
+            elif polyline is None:
+                polyline = self.draw_trace(trace)
+                if polyline is not None:
+                    to_add.append(polyline)
+            else:
+                # Le zoom a pu changer pendant que la trace était masquée
+                self.update_trace_level(trace)
+                if not self.trace_group.hasLayer(polyline):
+                    to_add.append(polyline)
+        
+        self.trace_group.removeLayers(to_hide)
+        self.trace_group.disposeLayers(to_dispose)
+        self.trace_group.addLayers(to_add)
+        
+        # Les traces sorties de la vue ou masquées peuvent être libérées
+        self.enforce_point_budget()
+
+    def trace_level_points(self, trace):
+        """Points de la trace simplifiés pour le zoom courant de la carte"""
+        data = trace['data']
+        level = SimplificationPyramid.level_for_zoom(self.map_zoom)
+        overview = data.get('overview')
+        if data.get('points') is None and overview is not None and level <= OVERVIEW_ZOOM:
+            # Trace libérée : son aperçu suffit à ce zoom
+            trace['level'] = level
+            return overview
+        
+        # Points chargés à la demande (chargement paresseux, voir import_gpx)
+        points = self.load_points(trace)
+        pyramid = data.get('simplification')
+        if pyramid is None:
+            pyramid = data['simplification'] = load_simplification(points, data.get('content_hash'))
+        trace['level'] = pyramid.level_for_zoom(self.map_zoom)
+        return pyramid.simplify(points, self.map_zoom)
+
+    def update_trace_level(self, trace):
+        """Remplace la géométrie d'une trace si le zoom demande un autre niveau de détail"""
+        polyline = trace.get('polyline')
+        if polyline is None:
+            return
+        if trace.get('level') == SimplificationPyramid.level_for_zoom(self.map_zoom):
+            return
+        
+        points = self.trace_level_points(trace)
+        polyline.setEncoded(encode_polyline(points.latitudes, points.longitudes))
+
+    def on_map_view_changed(self, view):
+        """Appelé après chaque déplacement ou zoom de la carte"""
+        if view.get('zoom') is None:
+            return
+        self.map_view = view
+        
+        if view['zoom'] != self.map_zoom:
+            self.map_zoom = view['zoom']
+            # Garder le sélecteur de zoom synchronisé sans renvoyer de setZoom
+            self.zoom_spinbox.blockSignals(True)
+            self.zoom_spinbox.setValue(int(round(self.map_zoom)))
+            self.zoom_spinbox.blockSignals(False)
+        
+        # Niveaux de détail et traces en vue
+        self.sync_trace_layers()
 
     def import_gpx(self):
         """Importe un ou plusieurs fichiers GPX"""
@@ -217,53 +375,258 @@ class MapWindow(QMainWindow):
         if not file_paths:
             return
 
-        user_config = get_user_config()
+        # Première phase, dans un thread : chaque fichier est listé depuis son
+        # en-tête ou son résumé en cache, sans lire ses points. Les entrées
+        # arrivent par lots et sont ajoutées au fur et à mesure.
+        self._import_user_config = get_user_config()
+        scan = HeaderScanJob(file_paths, self)
+        scan.color_base = len(self.loaded_traces)
+        scan.pending_traces = []
+        scan.new_count = 0
+        scan.headers_read.connect(lambda batch, scan=scan: self.on_headers_read(scan, batch))
+        scan.header_failed.connect(lambda index, message, scan=scan: print(
+            f"Échec de l'import de {scan.file_paths[index]} : {message}"))
+        scan.finished.connect(lambda scan=scan: self.on_header_scan_finished(scan))
+        self.header_scans.append(scan)
+        scan.start()
 
-        for file_path in file_paths:
-            gpx_data = get_info(file_path)
-            
-            # Détecter l'activité pour cette trace
-            activity_code, activity_display, is_detected = get_activity_for_trace(
-                gpx_data['filename'], 
-                user_config
-            )
-            
-            # Ajouter les infos d'activité aux données
-            gpx_data['activity'] = activity_code
-            gpx_data['activity_display'] = activity_display
-            gpx_data['activity_auto_detected'] = is_detected
-            
-            # Attribuer une couleur
-            color_index = len(self.loaded_traces) % len(TRACE_COLORS)
-            color = TRACE_COLORS[color_index]
-            
-            # Créer l'entrée de trace
-            trace = {
-                'data': gpx_data,
-                'color': color,
-                'visible': True,
-                'polyline': None
-            }
-            
-            self.loaded_traces.append(trace)
-            
-            # Ajouter à la liste
-            self.add_trace_to_list(trace, gpx_data['filename'])
-            
-            # Dessiner la trace
-            if self.map:
-                self.draw_trace(trace)
-            
-            # Log de l'activité détectée
-            if is_detected:
-                print(f"✓ {gpx_data['filename']}: Activité auto-détectée -> {activity_display}")
-            else:
-                print(f"  {gpx_data['filename']}: Activité par défaut -> {activity_display}")
+    def on_headers_read(self, scan, batch):
+        """Ajoute un lot d'entrées lues par la première phase"""
+        if self._closing:
+            return
+        new_traces = []
+        for index, gpx_data in batch:
+            color = TRACE_COLORS[(scan.color_base + index) % len(TRACE_COLORS)]
+            trace = self.add_trace(gpx_data, color)
+            new_traces.append(trace)
+            if gpx_data['summary_pending']:
+                scan.pending_traces.append(trace)
+        scan.new_count += len(new_traces)
+        
+        # Une seule synchronisation de la carte par lot ; les points ne sont
+        # lus que pour les traces dessinées
+        self.sync_trace_layers(new_traces)
+        if self.selected_trace_index is None:
+            self.update_info_display_global()
+
+    def on_header_scan_finished(self, scan):
+        """Fin de la première phase : analyse des fichiers inconnus du cache"""
+        self.header_scans.remove(scan)
+        scan.deleteLater()
+        if self._closing:
+            return
+        
+        pending_traces = [trace for trace in scan.pending_traces if not trace.get('removed')]
+        print(f"{scan.new_count - len(scan.pending_traces)} fichier(s) GPX repris du cache, "
+              f"{len(scan.pending_traces)} à analyser")
+        if self.selected_trace_index is None:
+            self.show_global_view()
+        
+        if pending_traces:
+            self.start_import_job(pending_traces)
+
+    def start_import_job(self, pending_traces):
+        """
+        Seconde phase : les fichiers jamais analysés passent par le pool de
+        processus, leur entrée est complétée à l'arrivée du résumé
+        """
+        if self.import_executor is None:
+            self.import_executor = create_import_executor()
+        
+        file_paths = [trace['data']['filepath'] for trace in pending_traces]
+        job = GPXImportJob(self.import_executor, file_paths, self.shared_registry, self)
+        job.traces = pending_traces
+        job.imported_count = 0
+        job.trace_loaded.connect(lambda index, gpx_data, job=job: self.on_trace_imported(job, index, gpx_data))
+        job.trace_failed.connect(lambda index, message, job=job: self.on_trace_import_failed(job, index, message))
+        job.finished.connect(lambda cancelled, job=job: self.on_import_finished(job, cancelled))
+        
+        # La fenêtre reste utilisable pendant l'analyse (les traces listées sont consultables)
+        job.progress_dialog = QProgressDialog("Analyse des fichiers GPX...", "Annuler", 0, len(file_paths), self)
+        job.progress_dialog.setWindowTitle("Import")
+        job.progress_dialog.setWindowModality(Qt.NonModal)
+        job.progress_dialog.setMinimumDuration(500)
+        job.progress_dialog.setValue(0)
+        job.progress_dialog.canceled.connect(job.cancel)
+        job.progress.connect(lambda done, total, job=job: job.progress_dialog.setValue(done))
+        
+        self.import_job = job
+        self.import_jobs.append(job)
+        job.start()
+
+    def add_trace(self, gpx_data, color):
+        """Ajoute une trace à la liste, aux index et à la carte"""
+        # Détecter l'activité pour cette trace
+        activity_code, activity_display, is_detected = get_activity_for_trace(
+            gpx_data['filename'], 
+            self._import_user_config
+        )
         
-        # Mise à jour de l'affichage en vue globale
-        self.show_global_view()
+        # Ajouter les infos d'activité aux données
+        gpx_data['activity'] = activity_code
+        gpx_data['activity_display'] = activity_display
+        gpx_data['activity_auto_detected'] = is_detected
+        
+        # Créer l'entrée de trace
+        trace = {
+            'id': next(self._trace_ids),
+            'data': gpx_data,
+            'color': color,
+            'visible': True,
+            'polyline': None
+        }
+        
+        self.loaded_traces.append(trace)
+        if gpx_data['bounds']:
+            self.trace_index.add(trace['id'], gpx_data['bounds'])
+        self.update_visible_aggregates(trace)
+        
+        # Ajouter à la liste (la trace est dessinée par sync_trace_layers)
+        self.add_trace_to_list(trace, gpx_data['filename'])
+        
+        # Log de l'activité détectée
+        if is_detected:
+            print(f"✓ {gpx_data['filename']}: Activité auto-détectée -> {activity_display}")
+        else:
+            print(f"  {gpx_data['filename']}: Activité par défaut -> {activity_display}")
+        return trace
+
+    def on_trace_imported(self, job, index, gpx_data):
+        """Complète l'entrée d'une trace analysée par le pool (appelé dans l'ordre des fichiers)"""
+        trace = job.traces[index]
+        if trace.get('removed'):
+            # Trace retirée pendant son analyse
+            self.shared_registry.release(gpx_data.get('shared_segment'))
+            return
+        
+        data = trace['data']
+        for key in ('activity', 'activity_display', 'activity_auto_detected'):
+            gpx_data[key] = data[key]
+        
+        # Le résumé remplace les valeurs provisoires lues dans l'en-tête
+        self.trace_index.remove(trace['id'])
+        self.visible_bounds.remove(trace['id'])
+        self.visible_stats.remove(trace['id'])
+        data.clear()
+        data.update(gpx_data)
+        if data['bounds']:
+            self.trace_index.add(trace['id'], data['bounds'])
+        self.update_visible_aggregates(trace)
+        self.point_memory.touch(trace['id'], data)
+        job.imported_count += 1
+        
+        trace['stats_label'].setText(f"{data['distance_km']:.1f} km")
+        self.sync_trace_layers([trace])
+        
+        if self.selected_trace_index is not None and self.loaded_traces[self.selected_trace_index] is trace:
+            self.update_info_display_single(self.selected_trace_index)
+        elif self.selected_trace_index is None:
+            self.update_info_display_global()
+
+    def on_trace_import_failed(self, job, index, message):
+        """Signale un fichier qui n'a pas pu être analysé (son entrée est retirée en fin d'import)"""
+        print(f"Échec de l'import de {job.file_paths[index]} : {message}")
+
+    def on_import_finished(self, job, cancelled):
+        """Fin de l'import : entrées non analysées retirées, vue globale mise à jour"""
+        job.progress_dialog.reset()
+        if job in self.import_jobs:
+            self.import_jobs.remove(job)
+        
+        # Échecs, ou import annulé : les entrées jamais analysées sont retirées en une fois
+        self.remove_traces([trace for trace in job.traces
+                            if trace['data'].get('summary_pending') and not trace.get('removed')])
+        
+        # La sélection de l'utilisateur est conservée
+        if job.imported_count and self.selected_trace_index is None:
+            self.show_global_view()
+        
+        if cancelled:
+            print(f"Import annulé : {job.imported_count} fichier(s) GPX analysé(s)")
+        else:
+            print(f"{job.imported_count} fichier(s) GPX analysé(s)")
+
+    def closeEvent(self, event):
+        """Arrête le pool d'import et l'export en cours à la fermeture de la fenêtre"""
+        self._closing = True
+        for scan in list(self.header_scans):
+            scan.cancel()
+            scan.wait()
+        if self.import_executor is not None:
+            # Les analyses en cours sont attendues pour détruire leurs segments
+            # (retirés du resource_tracker, ils survivraient au processus)
+            self.import_executor.shutdown(wait=True, cancel_futures=True)
+        for job in self.import_jobs:
+            job.abort()
+        self.import_jobs.clear()
+        for job in list(self.export_jobs):
+            # L'export annulé supprime son fichier temporaire
+            job.cancel()
+            job.wait()
+        for trace in self.loaded_traces:
+            self.release_trace_points(trace)
+        get_profile_cache().remove_listener(self.on_profile_changed)
+        super().closeEvent(event)
+
+    def load_points(self, trace):
+        """Points d'une trace, relus (cache des analyses ou fichier) s'ils ont été libérés"""
+        points = ensure_points(trace['data'])
+        self.point_memory.touch(trace['id'], trace['data'])
+        return points
+
+    def enforce_point_budget(self):
+        """Libère les points des traces inactives tant que le budget mémoire est dépassé"""
+        if not self.point_memory.over_budget():
+            return
         
-        print(f"{len(file_paths)} fichier(s) GPX importé(s)")
+        traces = {trace['id']: trace for trace in self.loaded_traces}
+        selected = self.loaded_traces[self.selected_trace_index]['id'] if self.selected_trace_index is not None else None
+        # Le thread d'export lit les points (et leur segment partagé) sans verrou
+        exported = set().union(*(job.trace_ids for job in self.export_jobs))
+        
+        def is_protected(key):
+            # Trace sélectionnée, en cours d'export, ou affichée sur la carte
+            # (visible et dans la vue)
+            trace = traces[key]
+            return (key == selected or key in exported
+                    or (trace['visible'] and trace['polyline'] is not None))
+        
+        evicted = self.point_memory.evict(lambda key: self.evict_trace_points(traces[key]), is_protected)
+        if evicted:
+            print(f"{len(evicted)} trace(s) inactive(s) libérée(s) de la mémoire "
+                  f"({self.point_memory.loaded_bytes / 1024 ** 2:.0f} Mo de points chargés)")
+
+    def evict_trace_points(self, trace):
+        """Libère les points d'une trace inactive ; résumé et aperçu simplifié sont gardés"""
+        data = trace['data']
+        points = data.get('points')
+        pyramid = data.get('simplification')
+        if points is not None and pyramid is not None:
+            # Copie indépendante des colonnes libérées
+            data['overview'] = pyramid.simplify(points, OVERVIEW_ZOOM)
+        
+        segment = data.get('shared_segment')
+        if segment is not None:
+            # La significance lit le segment partagé : elle sera relue depuis le cache
+            data['simplification'] = None
+        data['points'] = None
+        data['cumulative_distance_m'] = None
+        data['shared_segment'] = None
+        self.shared_registry.release(segment)
+
+    def release_trace_points(self, trace):
+        """Libère les points d'une trace retirée (et son segment de mémoire partagée)"""
+        data = trace['data']
+        segment = data.get('shared_segment')
+        # Une analyse encore en cours ne doit pas recréer l'entrée
+        trace['removed'] = True
+        self.point_memory.forget(trace['id'])
+        data['points'] = PointStore.empty()
+        data['cumulative_distance_m'] = None
+        data['simplification'] = None
+        data['overview'] = None
+        data['shared_segment'] = None
+        self.shared_registry.release(segment)
 
     def add_trace_to_list(self, trace, filename):
         """Ajoute une trace à la liste avec checkbox"""
@@ -291,9 +654,10 @@ class MapWindow(QMainWindow):
         item_layout.addStretch()
         
         # Stats rapides
-        stats_label = QLabel(f"{trace['data']['distance_km']:.1f} km")
+        stats_label = QLabel("…" if trace['data'].get('summary_pending') else f"{trace['data']['distance_km']:.1f} km")
         stats_label.setStyleSheet("color: #666; font-size: 11px;")
         item_layout.addWidget(stats_label)
+        trace['stats_label'] = stats_label
         
         # Créer l'item
         item = QListWidgetItem(self.traces_list)
@@ -306,6 +670,12 @@ class MapWindow(QMainWindow):
         index = self.traces_list.row(item)
         self.selected_trace_index = index
         
+        # Les points servent aux calories point par point
+        trace = self.loaded_traces[index]
+        if not trace['data'].get('summary_pending'):
+            self.load_points(trace)
+            self.enforce_point_budget()
+        
         # Afficher uniquement les infos de cette trace
         self.update_info_display_single(index)
         
@@ -317,44 +687,101 @@ class MapWindow(QMainWindow):
     def toggle_trace_visibility(self, trace, state):
         """Active/désactive la visibilité d'une trace"""
         trace['visible'] = (state == Qt.Checked)
+        self.update_visible_aggregates(trace)
+        self.sync_trace_layers([trace])
         
-        if trace['polyline']:
-            if trace['visible']:
-                trace['polyline'].addTo(self.map)
-            else:
-                self.map.removeLayer(trace['polyline'])
+        if self.selected_trace_index is None:
+            self.update_info_display_global()
+
+    def update_visible_aggregates(self, trace):
+        """Ajoute ou retire une trace des agrégats selon sa visibilité"""
+        if trace['visible']:
+            self.visible_bounds.add(trace['id'], trace['data']['bounds'])
+            self.visible_stats.add(trace['id'], trace['data'])
+        else:
+            self.visible_bounds.remove(trace['id'])
+            self.visible_stats.remove(trace['id'])
+
+    def set_all_traces_visible(self, visible):
+        """Affiche ou masque toutes les traces en une seule opération sur la carte"""
+        for trace in self.loaded_traces:
+            trace['visible'] = visible
+            # Les cases sont mises à jour sans déclencher toggle_trace_visibility
+            trace['checkbox'].blockSignals(True)
+            trace['checkbox'].setChecked(visible)
+            trace['checkbox'].blockSignals(False)
+            if visible:
+                self.update_visible_aggregates(trace)
+        if not visible:
+            self.visible_bounds.clear()
+            self.visible_stats.clear()
+        
+        self.sync_trace_layers()
+        
+        if self.selected_trace_index is None:
+            self.update_info_display_global()
 
     def remove_selected_trace(self):
         """Supprime la trace sélectionnée"""
         current_row = self.traces_list.currentRow()
         if current_row >= 0:
-            trace = self.loaded_traces[current_row]
-            
-            # Retirer de la carte
-            if trace.get('polyline'):
-                self.map.removeLayer(trace['polyline'])
-            
-            # Retirer de la liste
-            self.traces_list.takeItem(current_row)
-            self.loaded_traces.pop(current_row)
-            
-            # Réinitialiser la sélection
-            self.selected_trace_index = None
+            self.remove_traces([self.loaded_traces[current_row]])
             
             # Afficher la vue globale si des traces restent
             if self.loaded_traces:
                 self.show_global_view()
-            else:
-                self.update_info_display_global()
             
             print("Trace supprimée")
 
+    def remove_traces(self, traces):
+        """
+        Retire des traces de la carte, des index et de la liste en une passe.
+
+        La sélection est conservée si la trace sélectionnée n'est pas retirée ;
+        l'affichage est rafraîchi une seule fois.
+        """
+        if not traces:
+            return
+        ids = {trace['id'] for trace in traces}
+        selected = (self.loaded_traces[self.selected_trace_index]
+                    if self.selected_trace_index is not None else None)
+        
+        # Retirer de la carte (une seule opération)
+        polylines = [trace['polyline'] for trace in traces if trace.get('polyline')]
+        if polylines:
+            self.trace_group.disposeLayers(polylines)
+        
+        for trace in traces:
+            self.trace_index.remove(trace['id'])
+            self.visible_bounds.remove(trace['id'])
+            self.visible_stats.remove(trace['id'])
+            self.release_trace_points(trace)
+        
+        # Retirer de la liste (lignes parcourues à rebours)
+        for row in range(len(self.loaded_traces) - 1, -1, -1):
+            if self.loaded_traces[row]['id'] in ids:
+                self.traces_list.takeItem(row)
+        self.loaded_traces = [trace for trace in self.loaded_traces if trace['id'] not in ids]
+        
+        if selected is not None and selected['id'] not in ids:
+            self.selected_trace_index = next(row for row, trace in enumerate(self.loaded_traces) if trace is selected)
+            self.traces_list.setCurrentRow(self.selected_trace_index)
+        else:
+            self.selected_trace_index = None
+            self.update_info_display_global()
+
     def clear_all_traces(self):
         """Efface toutes les traces"""
+        # Une seule opération sur la carte pour toutes les traces
+        polylines = [trace['polyline'] for trace in self.loaded_traces if trace.get('polyline')]
+        if polylines:
+            self.trace_group.disposeLayers(polylines)
         for trace in self.loaded_traces:
-            if trace.get('polyline'):
-                self.map.removeLayer(trace['polyline'])
+            self.release_trace_points(trace)
         
+        self.trace_index.clear()
+        self.visible_bounds.clear()
+        self.visible_stats.clear()
         self.loaded_traces.clear()
         self.traces_list.clear()
         self.selected_trace_index = None
@@ -373,13 +800,21 @@ class MapWindow(QMainWindow):
         """Ouvre la fenêtre de configuration utilisateur"""
         dialog = UserConfigDialog(self)
         if dialog.exec_():
-            if self.loaded_traces:
-                if self.selected_trace_index is not None:
-                    self.update_info_display_single(self.selected_trace_index)
-                else:
-                    self.update_info_display_global()
+            # L'affichage est mis à jour par on_profile_changed ; le budget
+            # mémoire est relu dans les réglages
+            self.point_memory.budget_bytes = budget_from_settings(get_app_settings())
+            self.enforce_point_budget()
             print("Configuration mise à jour")
 
+    def on_profile_changed(self, changed_keys, config):
+        """Appelé par le cache du profil quand des valeurs changent"""
+        if not self.loaded_traces or not (changed_keys - PROFILE_KEYS_WITHOUT_DISPLAY):
+            return
+        if self.selected_trace_index is not None:
+            self.update_info_display_single(self.selected_trace_index)
+        else:
+            self.update_info_display_global()
+
     def export_data(self):
         """Ouvre un menu pour choisir le format d'export"""
         if not self.loaded_traces:
@@ -406,6 +841,24 @@ class MapWindow(QMainWindow):
         action_json_all = menu.addAction("JSON - Toutes les traces")
         action_csv_all = menu.addAction("CSV - Toutes les traces")
         
+        # Export point par point (trace sélectionnée, sinon toutes les traces)
+        menu.addSection("Exporter les points")
+        point_actions = {
+            menu.addAction("Points - NDJSON"): 'points_ndjson',
+            menu.addAction("Points - Parquet"): 'points_parquet',
+            menu.addAction("Points - Arrow"): 'points_arrow',
+        }
+        if not pyarrow_available():
+            # Formats proposés mais grisés : pyarrow n'est pas installé
+            for point_action, export_format in point_actions.items():
+                if export_format in PYARROW_FORMATS:
+                    point_action.setEnabled(False)
+                    point_action.setText(f"{point_action.text()} (pyarrow requis)")
+        
+        # Copie des fichiers GPX d'origine, uniquement sur demande
+        menu.addSection("Archiver")
+        action_archive = menu.addAction("Archiver les fichiers GPX")
+        
         # Afficher le menu à la position du bouton
         export_btn = self.sender()
         if export_btn:
@@ -421,10 +874,43 @@ class MapWindow(QMainWindow):
                     traces_to_export = self.loaded_traces
                 
                 # Exporter selon le format choisi
-                if action in [action_json_single, action_json_all]:
-                    export_to_json(self, traces_to_export)
+                if action == action_archive:
+                    # Archiver la trace sélectionnée, sinon toutes les traces
+                    if self.selected_trace_index is not None:
+                        self.archive_traces([self.loaded_traces[self.selected_trace_index]])
+                    else:
+                        self.archive_traces(self.loaded_traces)
+                elif action in point_actions:
+                    if self.selected_trace_index is not None:
+                        traces_to_export = [self.loaded_traces[self.selected_trace_index]]
+                    self.track_export_job(start_export(self, traces_to_export, point_actions[action]))
+                elif action in [action_json_single, action_json_all]:
+                    self.track_export_job(export_to_json(self, traces_to_export))
                 elif action in [action_csv_single, action_csv_all]:
-                    export_to_csv(self, traces_to_export)
+                    self.track_export_job(export_to_csv(self, traces_to_export))
+
+    def track_export_job(self, job):
+        """Garde une référence à l'export en cours (arrêté à la fermeture de la fenêtre)"""
+        if job is None:
+            return
+        self.export_jobs.append(job)
+        job.finished.connect(lambda: self._on_export_job_finished(job))
+
+    def _on_export_job_finished(self, job):
+        if job in self.export_jobs:
+            self.export_jobs.remove(job)
+
+    def archive_traces(self, traces):
+        """Copie les fichiers GPX d'origine dans le dossier d'archives"""
+        archived = 0
+        for trace in traces:
+            try:
+                archive_gpx_file(trace['data']['filepath'])
+                archived += 1
+            except OSError as e:
+                print(f"Archivage impossible pour {trace['data']['filename']} : {e}")
+        
+        QMessageBox.information(self, "Archivage", f"{archived} fichier(s) GPX archivé(s) dans:\n{ARCHIVE_DIR}")
 
     def update_info_display_single(self, trace_index):
         """Affiche les informations d'une seule trace"""
@@ -434,6 +920,14 @@ class MapWindow(QMainWindow):
         trace_data = self.loaded_traces[trace_index]['data']
         trace_color = self.loaded_traces[trace_index]['color']
         
+        if trace_data.get('summary_pending'):
+            self.trace_card.setText(
+                f"<h3 style='color: {trace_color}; margin-top: 0;'>{trace_data['filename']}</h3>"
+                f"<p>Analyse en cours...</p>"
+            )
+            self.trace_card.setTextFormat(Qt.RichText)
+            return
+        
         deniv = trace_data["denivele"]
         duree = trace_data["durée"]
         distance = trace_data["distance_km"]
@@ -444,30 +938,13 @@ class MapWindow(QMainWindow):
         activity_icon = "🔍" if is_auto_detected else "⚙️"
         activity_label = f"{activity_icon} {activity_display}"
         
-        # Durée totale en minutes
-        duree_minutes = duree['heures'] * 60 + duree['minutes'] + duree['secondes'] / 60
-        
         # Obtenir la configuration utilisateur
         config = get_user_config()
         
-        # Vérifier si la durée est à 0 et estimer si nécessaire
-        duree_dict_display = duree.copy()
-        if duree_minutes == 0 and config:
-            from utils.calculator import _estimate_duration
-            activity_code = trace_data.get('activity', config.get("activite_defaut", "marche"))
-            duree_estimee_minutes = _estimate_duration(
-                distance, 
-                deniv['positif'], 
-                activity_code, 
-                config.get("niveau", "Intermédiaire")
-            )
-            
-            duree_dict_display = {
-                'heures': int(duree_estimee_minutes // 60),
-                'minutes': int(duree_estimee_minutes % 60),
-                'secondes': int((duree_estimee_minutes % 1) * 60)
-            }
-            duree_minutes = duree_estimee_minutes
+        # Métriques dérivées (durée estimée si nécessaire), mises en cache par trace et profil
+        activity_code = trace_data.get('activity', config.get("activite_defaut", "marche") if config else None)
+        derived = get_metrics_cache().trace_metrics(trace_data, activity_code)
+        duree_dict_display = derived.duree_dict() if derived.duree_estimee else duree.copy()
         
         # === Carte Trace GPS ===
         trace_html = f"""
@@ -478,7 +955,7 @@ class MapWindow(QMainWindow):
             </p>
             <table style='width: 100%; border-spacing: 0;'>
                 <tr><td style='padding: 5px 0;'><b>Distance:</b></td><td style='text-align: right;'>{distance:.2f} km</td></tr>
-                <tr><td style='padding: 5px 0;'><b>Points:</b></td><td style='text-align: right;'>{len(trace_data['points'])}</td></tr>
+                <tr><td style='padding: 5px 0;'><b>Points:</b></td><td style='text-align: right;'>{trace_data['summary'].nb_points}</td></tr>
                 <tr style='background-color: #e8f5e9;'><td style='padding: 5px 0;'><b>D+ ⬆️:</b></td><td style='text-align: right;'>{deniv['positif']:.0f} m</td></tr>
                 <tr style='background-color: #ffebee;'><td style='padding: 5px 0;'><b>D- ⬇️:</b></td><td style='text-align: right;'>{deniv['negatif']:.0f} m</td></tr>
                 <tr><td style='padding: 5px 0;'><b>Durée:</b></td><td style='text-align: right;'>{duree_dict_display['heures']}h {duree_dict_display['minutes']}m {duree_dict_display['secondes']}s</td></tr>
@@ -492,7 +969,6 @@ class MapWindow(QMainWindow):
         # === Carte Fitness ===
         if config:
             # Utiliser l'activité de la trace pour les calculs
-            activity_code = trace_data.get('activity', config.get("activite_defaut", "marche"))
             activity_display_name = trace_data.get('activity_display', config.get("activite_defaut_display", "Marche"))
             
             # Créer une config temporaire avec l'activité de cette trace
@@ -500,8 +976,8 @@ class MapWindow(QMainWindow):
             trace_config['activite_defaut'] = activity_code
             trace_config['activite_defaut_display'] = activity_display_name
             
-            calories = calculate_calories(distance, deniv['positif'], duree_minutes, trace_config)
-            metrics = calculate_fitness_metrics(distance, deniv['positif'], duree_minutes, trace_config)
+            calories = derived.calories
+            metrics = derived.fitness
             
             if calories and metrics:
                 fitness_html = generate_fitness_html(trace_config, calories, metrics)
@@ -524,56 +1000,34 @@ class MapWindow(QMainWindow):
             self.fitness_card.setStyleSheet(FITNESS_CARD_STYLE_INACTIVE)
             return
         
-        # Calculer les totaux
-        total_distance = sum(t['data']['distance_km'] for t in self.loaded_traces)
-        total_deniv_pos = sum(t['data']['denivele']['positif'] for t in self.loaded_traces)
-        total_deniv_neg = sum(t['data']['denivele']['negatif'] for t in self.loaded_traces)
-        total_points = sum(len(t['data']['points']) for t in self.loaded_traces)
+        # Totaux des traces visibles, tenus à jour à chaque ajout/retrait/masquage
+        totals = self.visible_stats.totals
+        total_distance = totals.distance_km
+        total_deniv_pos = totals.denivele_positif
+        total_deniv_neg = totals.denivele_negatif
+        total_points = totals.nb_points
         
         # Compter les activités
-        activity_counts = {}
-        for trace in self.loaded_traces:
-            activity = trace['data'].get('activity_display', 'Non défini')
-            activity_counts[activity] = activity_counts.get(activity, 0) + 1
-        
-        activities_summary = ", ".join([f"{count}x {act}" for act, count in activity_counts.items()])
-        
-        # Calculer la durée totale
-        total_seconds = sum(
-            t['data']['durée']['heures'] * 3600 + 
-            t['data']['durée']['minutes'] * 60 + 
-            t['data']['durée']['secondes']
-            for t in self.loaded_traces
+        activities_summary = ", ".join(
+            [f"{count}x {act}" for act, count in self.visible_stats.activity_counts().items()]
         )
         
-        duree_dict = {
-            'heures': int(total_seconds // 3600),
-            'minutes': int((total_seconds % 3600) // 60),
-            'secondes': int(total_seconds % 60)
-        }
-        
-        # Vérifier si la durée totale est 0 et estimer si nécessaire
-        duree_minutes = total_seconds / 60
+        # Métriques des totaux (durée estimée si nécessaire), mises en cache par profil
         config = get_user_config()
+        derived = get_metrics_cache().metrics(total_distance, total_deniv_pos, totals.duration_s / 60)
+        duree_dict = derived.duree_dict() if derived.duree_estimee else totals.duree_dict()
         
-        if duree_minutes == 0 and config:
-            from utils.calculator import _estimate_duration
-            activity = config.get("activite_defaut", "marche")
-            duree_estimee_minutes = _estimate_duration(total_distance, total_deniv_pos, activity, config.get("niveau", "Intermédiaire"))
-            
-            duree_dict = {
-                'heures': int(duree_estimee_minutes // 60),
-                'minutes': int(duree_estimee_minutes % 60),
-                'secondes': int((duree_estimee_minutes % 1) * 60)
-            }
-            duree_minutes = duree_estimee_minutes
+        if totals.count == len(self.loaded_traces):
+            traces_label = f"{totals.count} trace(s) chargée(s)"
+        else:
+            traces_label = f"{totals.count} trace(s) visible(s) sur {len(self.loaded_traces)} chargée(s)"
         
         # Afficher les infos de trace
         trace_html = f"""
         <div style='font-family: Arial, sans-serif;'>
             <h3 style='color: #1976D2; margin-top: 0;'>Statistiques Globales</h3>
             <p style='background-color: #e3f2fd; padding: 5px; border-radius: 4px;'>
-                <b>{len(self.loaded_traces)} trace(s) chargée(s)</b>
+                <b>{traces_label}</b>
             </p>
             <p style='background-color: #f3e5f5; padding: 5px; border-radius: 4px; font-size: 11px;'>
                 {activities_summary}
@@ -591,25 +1045,10 @@ class MapWindow(QMainWindow):
         self.trace_card.setText(trace_html)
         self.trace_card.setTextFormat(Qt.RichText)
         
-        # Calculer les stats fitness (basées sur les totaux)
-        if config:
-            calories = calculate_calories(total_distance, total_deniv_pos, duree_minutes, config)
-            metrics = calculate_fitness_metrics(total_distance, total_deniv_pos, duree_minutes, config)
-            
-            if calories and metrics:
-                fitness_html = generate_fitness_html(config, calories, metrics)
-                self.fitness_card.setText(fitness_html)
-                self.fitness_card.setTextFormat(Qt.RichText)
-                self.fitness_card.setStyleSheet(FITNESS_CARD_STYLE_ACTIVE)
-        else:
-            self.fitness_card.setText(generate_no_profile_html())
-            self.fitness_card.setTextFormat(Qt.RichText)
-            self.fitness_card.setStyleSheet(FITNESS_CARD_STYLE_INACTIVE)
-        
-        # Calculer les stats fitness (basées sur les totaux)
+        # Stats fitness (basées sur les totaux)
         if config:
-            calories = calculate_calories(total_distance, total_deniv_pos, duree_minutes, config)
-            metrics = calculate_fitness_metrics(total_distance, total_deniv_pos, duree_minutes, config)
+            calories = derived.calories
+            metrics = derived.fitness
             
             if calories and metrics:
                 fitness_html = generate_fitness_html(config, calories, metrics)
@@ -631,36 +1070,17 @@ class MapWindow(QMainWindow):
         if trace_index >= len(self.loaded_traces):
             return
         
-        points = self.loaded_traces[trace_index]['data']['points']
-        if not points:
+        bounds = self.loaded_traces[trace_index]['data']['bounds']
+        if not bounds:
             return
         
-        lats = [p.latitude for p in points]
-        lons = [p.longitude for p in points]
-        
-        bounds = [
-            [min(lats), min(lons)],
-            [max(lats), max(lons)]
-        ]
-        
         self.map.fitBounds(bounds)
 
     def fit_bounds(self):
         """Centre la carte sur toutes les traces visibles"""
-        visible_points = []
-        for trace in self.loaded_traces:
-            if trace['visible']:
-                visible_points.extend(trace['data']['points'])
-        
-        if not visible_points:
+        # Union tenue à jour à l'import, au retrait et au changement de visibilité
+        bounds = self.visible_bounds.union()
+        if not bounds:
             return
         
-        lats = [p.latitude for p in visible_points]
-        lons = [p.longitude for p in visible_points]
-        
-        bounds = [
-            [min(lats), min(lons)],
-            [max(lats), max(lons)]
-        ]
-        
         self.map.fitBounds(bounds)
\ No newline at end of file
@@ -1,13 +1,14 @@
-from os import getcwd
-import os.path
-from json import load, dump
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QSpinBox, QDoubleSpinBox, QComboBox, QPushButton,
                              QGroupBox, QMessageBox, QCheckBox)
 from PyQt5.QtCore import Qt
 
-RESSOURCES_FOLDER = os.path.join(getcwd(), "ressources")
-CONFIG_FILE = RESSOURCES_FOLDER + '/user_profile.json'
+# Le profil (cache, enregistrement, activités) est géré sans Qt dans core.profile
+from core.profile import (RESSOURCES_FOLDER, CONFIG_FILE, get_user_config, save_user_config,
+                          detect_activity_from_filename, get_activity_display_name,
+                          get_activity_for_trace)
+from core.point_memory import SETTINGS_BUDGET_KEY, budget_from_settings
+from core.settings import get_app_settings, save_app_settings
 
 class UserConfigDialog(QDialog):
     def __init__(self, parent=None):
@@ -137,6 +138,29 @@ class UserConfigDialog(QDialog):
         sport_group.setLayout(sport_layout)
         main_layout.addWidget(sport_group)
         
+        # === Performances ===
+        perf_group = QGroupBox("Performances")
+        perf_layout = QVBoxLayout()
+        
+        # Mémoire des points chargés (au-delà, les traces inactives sont libérées)
+        memoire_layout = QHBoxLayout()
+        memoire_layout.addWidget(QLabel("Mémoire des points :"))
+        self.memoire_spinbox = QSpinBox()
+        self.memoire_spinbox.setRange(128, 65536)
+        self.memoire_spinbox.setSingleStep(256)
+        self.memoire_spinbox.setValue(budget_from_settings(get_app_settings()) // (1024 * 1024))
+        self.memoire_spinbox.setSuffix(" Mo")
+        self.memoire_spinbox.setToolTip(
+            "Au-delà, les points des traces non affichées sont libérés\n"
+            "(ils sont relus à la demande)"
+        )
+        memoire_layout.addWidget(self.memoire_spinbox)
+        memoire_layout.addStretch()
+        perf_layout.addLayout(memoire_layout)
+        
+        perf_group.setLayout(perf_layout)
+        main_layout.addWidget(perf_group)
+        
         # === Boutons ===
         buttons_layout = QHBoxLayout()
         
@@ -178,13 +202,20 @@ class UserConfigDialog(QDialog):
             "fc_repos": self.fc_repos_spinbox.value()
         }
     
+    def get_settings_data(self):
+        """Réglages de l'application, enregistrés hors du profil (sans effet sur les métriques)"""
+        settings = get_app_settings()
+        settings[SETTINGS_BUDGET_KEY] = self.memoire_spinbox.value()
+        return settings
+    
     def save_config(self):
         """Enregistre la configuration dans un fichier JSON"""
         try:
             config = self.get_config_data()
             
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                dump(config, f, indent=4, ensure_ascii=False)
+            # Met à jour le cache du profil et prévient les vues concernées
+            save_user_config(config)
+            save_app_settings(self.get_settings_data())
             
             QMessageBox.information(self, "Succès", "Profil enregistré avec succès !")
             self.accept()
@@ -194,13 +225,11 @@ class UserConfigDialog(QDialog):
     
     def load_config(self):
         """Charge la configuration depuis le fichier JSON"""
-        if not os.path.exists(CONFIG_FILE):
+        config = get_user_config()
+        if config is None:
             return
         
         try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = load(f)
-            
             self.age_spinbox.setValue(config.get("age", 30))
             self.poids_spinbox.setValue(config.get("poids", 70.0))
             self.taille_spinbox.setValue(config.get("taille", 170))
@@ -230,91 +259,3 @@ class UserConfigDialog(QDialog):
             
         except Exception as e:
             print(f"Erreur lors du chargement de la configuration : {e}")
-
-
-def detect_activity_from_filename(filename):
-    """
-    Détecte l'activité sportive à partir du nom de fichier.
-    Retourne le code d'activité (ex: 'course', 'velo') ou None si non détecté.
-    """
-    filename_upper = filename.upper()
-    
-    # Dictionnaire de mots-clés pour chaque activité
-    keywords = {
-        "marche": ["MARCHE", "WALK"],
-        "course": ["COURSE", "RUN", "RUNNING", "FOOTING", "JOGGING"],
-        "velo": ["VELO", "VÉLO", "BIKE", "CYCLING", "CYCLISME"],
-        "vtt": ["VTT", "MTB", "MOUNTAIN"],
-        "ski": ["SKI", "SKIING"],
-        "randonnee": ["RANDONNEE", "RANDONNÉE", "RANDO", "HIKING", "HIKE", "TREK"],
-        "natation": ["NATATION", "NAT", "SWIM", "SWIMMING", "PISCINE"]
-    }
-    
-    # Chercher les mots-clés dans le nom de fichier
-    for activity, words in keywords.items():
-        for word in words:
-            if word in filename_upper:
-                return activity
-    
-    return None
-
-
-def get_activity_display_name(activity_code):
-    """
-    Convertit le code d'activité en nom d'affichage.
-    """
-    display_map = {
-        "marche": "Marche",
-        "course": "Course à pied",
-        "velo": "Vélo",
-        "vtt": "VTT",
-        "ski": "Ski",
-        "randonnee": "Randonnée",
-        "natation": "Natation"
-    }
-    return display_map.get(activity_code, activity_code)
-
-
-def get_user_config(config_name="user_profile"):
-    """Fonction utilitaire pour récupérer la configuration utilisateur"""
-    if not os.path.exists(CONFIG_FILE):
-        return None
-    
-    try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return load(f)
-    except:
-        return None
-
-
-def get_activity_for_trace(filename, user_config=None):
-    """
-    Détermine l'activité à utiliser pour une trace donnée.
-    
-    Args:
-        filename: Nom du fichier GPX
-        user_config: Configuration utilisateur (obtenue via get_user_config())
-    
-    Returns:
-        tuple: (activity_code, activity_display_name, is_detected)
-        - activity_code: code de l'activité (ex: 'course')
-        - activity_display_name: nom d'affichage (ex: 'Course à pied')
-        - is_detected: True si l'activité a été auto-détectée
-    """
-    if user_config is None:
-        user_config = get_user_config()
-    
-    # Activité par défaut
-    default_activity = user_config.get("activite_defaut", "marche") if user_config else "marche"
-    default_display = user_config.get("activite_defaut_display", "Marche") if user_config else "Marche"
-    
-    # Vérifier si l'auto-détection est activée
-    auto_detect = user_config.get("auto_detect_activity", True) if user_config else True
-    
-    if auto_detect:
-        detected_activity = detect_activity_from_filename(filename)
-        if detected_activity:
-            return (detected_activity, get_activity_display_name(detected_activity), True)
-    
-    # Retourner l'activité par défaut
-    return (default_activity, default_display, False)
\ No newline at end of file
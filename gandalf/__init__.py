@@ -0,0 +1,5 @@
+"""
+Outils en ligne de commande de Gandalf (sans interface graphique)
+
+    python -m gandalf analyze <dossier>
+"""
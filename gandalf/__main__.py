@@ -0,0 +1,9 @@
+import multiprocessing
+import sys
+
+from gandalf.cli import main
+
+if __name__ == '__main__':
+    # Nécessaire pour le pool d'analyse (processus lancés en "spawn")
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Analyse en lot de fichiers GPX, sans interface graphique
+
+    python -m gandalf analyze <dossier> [--format json|csv|ndjson] [--output fichier]
+                                        [--cache-dir dossier]
+
+Les fichiers sont analysés dans un pool de processus (un par cœur). Les
+calories, la fitness et le CO2 sont ensuite calculés par lots vectorisés dans
+le processus principal. Aucun module Qt n'est importé. Le cache des analyses
+n'est utilisé que si --cache-dir est donné : rien n'est écrit dans le dossier
+courant.
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from itertools import islice
+
+import numpy as np
+
+from core.cache import ParseCache
+from core.gpx import get_info
+from core.points import epoch_us_to_datetime
+from core.profile import CONFIG_FILE, ProfileCache, get_activity_for_trace
+from utils.calculator import (calculate_calories_batch, calculate_calories_from_points,
+                              calculate_fitness_metrics_batch)
+from utils.co2_calculator import calculate_co2_saved_batch
+from utils.export_engine import CsvRowWriter, JsonArrayWriter, NdjsonWriter
+
+FORMATS = ('json', 'csv', 'ndjson')
+
+# Nombre de traces complétées ensemble par les calculs vectorisés
+BATCH_SIZE = 256
+
+CSV_FIELDS = [
+    'filename', 'filepath', 'activite', 'distance_km', 'denivele_positif_m', 'denivele_negatif_m',
+    'duree_s', 'debut', 'fin', 'nb_points', 'lat_min', 'lon_min', 'lat_max', 'lon_max',
+    'calories', 'vitesse_moy_kmh', 'fc_moyenne', 'intensite_pct',
+    'co2_voiture_kg', 'co2_bus_kg', 'co2_train_kg', 'arbres_jours', 'content_hash'
+]
+
+
+def find_gpx_files(directory, recursive=True):
+    """Liste triée des fichiers .gpx d'un dossier"""
+    if not recursive:
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith('.gpx') and os.path.isfile(os.path.join(directory, name))
+        )
+    files = []
+    for root, _, names in os.walk(directory):
+        files.extend(os.path.join(root, name) for name in names if name.lower().endswith('.gpx'))
+    return sorted(files)
+
+
+def _iso(time_us):
+    return epoch_us_to_datetime(time_us).isoformat() if time_us is not None else None
+
+
+def analyze_file(filepath, config=None, cache_dir=None):
+    """
+    Analyse un fichier GPX (exécuté dans un processus du pool).
+
+    Args:
+        filepath: Fichier GPX
+        config: Profil utilisateur (calories), ou None
+        cache_dir: Dossier du cache des analyses, ou None pour ne pas l'utiliser
+
+    Returns:
+        dict: Résumé de la trace, ou {'filename', 'filepath', 'erreur'} en cas d'échec
+    """
+    filename = os.path.basename(filepath)
+    try:
+        # Les messages du parseur ne doivent pas se mêler à la sortie des résultats
+        with contextlib.redirect_stdout(sys.stderr):
+            if cache_dir:
+                gpx_data = get_info(filepath, verbose=False, cache=ParseCache(cache_dir))
+            else:
+                gpx_data = get_info(filepath, verbose=False, use_cache=False)
+    except Exception as e:
+        return {'filename': filename, 'filepath': filepath, 'erreur': str(e)}
+
+    # Fichier illisible : message du parseur (expat, gpxpy...)
+    if gpx_data['parser'].error:
+        return {'filename': filename, 'filepath': filepath, 'erreur': gpx_data['parser'].error}
+
+    summary = gpx_data['summary']
+    if not summary.nb_points:
+        return {'filename': filename, 'filepath': filepath, 'erreur': "Aucun point lisible"}
+
+    activity = get_activity_for_trace(filename, config)[0]
+
+    # Calories intégrées point par point quand la trace est horodatée
+    calories = None
+    if config:
+        calories = calculate_calories_from_points(gpx_data['points'], config, activity,
+                                                  gpx_data['cumulative_distance_m'])
+
+    return {
+        'filename': filename,
+        'filepath': filepath,
+        'content_hash': gpx_data['content_hash'],
+        'activite': activity,
+        'distance_km': summary.distance_km,
+        'denivele_positif_m': summary.denivele_positif,
+        'denivele_negatif_m': summary.denivele_negatif,
+        'duree_s': summary.duration_s,
+        'debut': _iso(summary.start_time_us),
+        'fin': _iso(summary.end_time_us),
+        'nb_points': summary.nb_points,
+        'bounds': summary.bounds,
+        'calories': calories,
+    }
+
+
+def complete_records(records, config):
+    """Ajoute calories, fitness et CO2 à un lot de résumés (calculs vectorisés)"""
+    valid = [record for record in records if 'erreur' not in record]
+    if not valid:
+        return records
+
+    distances = np.array([r['distance_km'] for r in valid])
+    deniveles = np.array([r['denivele_positif_m'] for r in valid])
+    durees = np.array([r['duree_s'] for r in valid]) / 60
+    activities = [r['activite'] for r in valid]
+
+    if config:
+        calories = calculate_calories_batch(distances, deniveles, durees, config, activities)
+        fitness = calculate_fitness_metrics_batch(distances, deniveles, durees, config, activities)
+        for i, record in enumerate(valid):
+            if record['calories'] is None:
+                record['calories'] = float(calories[i])
+            record['vitesse_moy_kmh'] = float(fitness['vitesse_moy'][i])
+            record['fc_moyenne'] = int(fitness['fc_moyenne'][i])
+            record['intensite_pct'] = float(fitness['intensite'][i])
+
+    co2 = calculate_co2_saved_batch(distances)
+    columns = {
+        'co2_voiture_kg': co2.mode_kg('voiture'),
+        'co2_bus_kg': co2.mode_kg('bus'),
+        'co2_train_kg': co2.mode_kg('train'),
+        'arbres_jours': co2.equivalences['arbres_jours'],
+    }
+    for i, record in enumerate(valid):
+        for name, values in columns.items():
+            record[name] = float(values[i]) if co2.valid[i] else None
+
+    return records
+
+
+class SummaryTotals:
+    """Totaux de l'analyse, mis à jour trace par trace"""
+
+    def __init__(self):
+        self.traces = 0
+        self.erreurs = 0
+        self.distance_km = 0.0
+        self.denivele_positif_m = 0.0
+        self.denivele_negatif_m = 0.0
+        self.duree_s = 0.0
+        self.calories = None  # Reste None sans profil (comme les traces)
+        self.co2_voiture_kg = 0.0
+
+    def add(self, record):
+        if 'erreur' in record:
+            self.erreurs += 1
+            return
+        self.traces += 1
+        self.distance_km += record['distance_km']
+        self.denivele_positif_m += record['denivele_positif_m']
+        self.denivele_negatif_m += record['denivele_negatif_m']
+        self.duree_s += record['duree_s']
+        if record.get('calories') is not None:
+            self.calories = (self.calories or 0.0) + record['calories']
+        self.co2_voiture_kg += record.get('co2_voiture_kg') or 0.0
+
+    def to_dict(self):
+        return {
+            'traces': self.traces,
+            'erreurs': self.erreurs,
+            'distance_km': round(self.distance_km, 3),
+            'denivele_positif_m': round(self.denivele_positif_m, 1),
+            'denivele_negatif_m': round(self.denivele_negatif_m, 1),
+            'duree_s': round(self.duree_s, 1),
+            'calories': round(self.calories, 1) if self.calories is not None else None,
+            'co2_voiture_kg': round(self.co2_voiture_kg, 3),
+        }
+
+
+def _csv_row(record):
+    """Ligne CSV d'un résumé : emprise à plat"""
+    row = dict(record)
+    bounds = record.get('bounds')
+    if bounds:
+        (row['lat_min'], row['lon_min']), (row['lat_max'], row['lon_max']) = bounds
+    return row
+
+
+def _open_writer(output_format, stream, header):
+    if output_format == 'json':
+        return JsonArrayWriter(stream, header, 'traces')
+    if output_format == 'ndjson':
+        return NdjsonWriter(stream)
+    return CsvRowWriter(stream, CSV_FIELDS)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def analyze(directory, stream, output_format='json', jobs=None, config=None, recursive=True,
+            cache_dir=None):
+    """
+    Analyse tous les fichiers GPX d'un dossier et écrit le résumé dans stream.
+
+    Returns:
+        SummaryTotals: Totaux de l'analyse
+    """
+    files = find_gpx_files(directory, recursive)
+    jobs = jobs or os.cpu_count() or 1
+    worker = partial(analyze_file, config=config, cache_dir=cache_dir)
+
+    totals = SummaryTotals()
+    writer = _open_writer(output_format, stream, {
+        'export_date': datetime.now().isoformat(),
+        'source': os.path.abspath(directory),
+        'user_profile': config,
+    })
+
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and len(files) > 1:
+            # Import différé : inutile pour un seul fichier
+            from concurrent.futures import ProcessPoolExecutor
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs))
+            chunksize = max(1, min(32, len(files) // (jobs * 8)))
+            results = executor.map(worker, files, chunksize=chunksize)
+        else:
+            results = map(worker, files)
+
+        # Résultats dans l'ordre des fichiers, complétés par lots
+        for batch in _batches(results, BATCH_SIZE):
+            for record in complete_records(batch, config):
+                totals.add(record)
+                if 'erreur' in record:
+                    print(f"Échec : {record['filepath']} ({record['erreur']})", file=sys.stderr)
+                    # Le CSV ne contient que les traces analysées
+                    if output_format == 'csv':
+                        continue
+                writer.write(_csv_row(record) if output_format == 'csv' else record)
+
+    writer.close({'summary': totals.to_dict()} if output_format != 'csv' else None)
+    if output_format == 'json':
+        stream.write('\n')
+    return totals
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m gandalf', description="Outils Gandalf sans interface graphique")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze_parser = commands.add_parser('analyze', help="Résume tous les fichiers GPX d'un dossier")
+    analyze_parser.add_argument('directory', help="Dossier contenant les fichiers GPX")
+    analyze_parser.add_argument('-f', '--format', choices=FORMATS, default='json', help="Format de sortie (json par défaut)")
+    analyze_parser.add_argument('-o', '--output', help="Fichier de sortie (sortie standard par défaut)")
+    analyze_parser.add_argument('-j', '--jobs', type=int, default=None, help="Nombre de processus (un par cœur par défaut)")
+    analyze_parser.add_argument('--profile', default=CONFIG_FILE, help="Profil utilisateur pour les calories et la fitness")
+    analyze_parser.add_argument('--no-profile', action='store_true', help="Ne pas calculer calories et fitness")
+    analyze_parser.add_argument('--no-recursive', action='store_true', help="Ne pas parcourir les sous-dossiers")
+    analyze_parser.add_argument('--cache-dir', help="Dossier du cache des analyses (aucun cache par défaut)")
+    analyze_parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache, même avec --cache-dir")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"Erreur : dossier '{args.directory}' introuvable", file=sys.stderr)
+        return 2
+
+    config = None
+    if not args.no_profile:
+        if not os.path.exists(args.profile):
+            print(f"Attention : profil '{args.profile}' introuvable, calories et fitness non calculées "
+                  f"(--profile pour l'indiquer, --no-profile pour ignorer)", file=sys.stderr)
+        else:
+            config = ProfileCache(args.profile).get()
+            if config is None:
+                print(f"Attention : profil '{args.profile}' illisible, calories et fitness non calculées",
+                      file=sys.stderr)
+
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if args.output:
+            stream = stack.enter_context(open(args.output, 'w', newline='', encoding='utf-8'))
+        else:
+            stream = sys.stdout
+        totals = analyze(args.directory, stream, args.format, args.jobs, config,
+                         recursive=not args.no_recursive,
+                         cache_dir=None if args.no_cache else args.cache_dir)
+
+    print(f"{totals.traces} trace(s) analysée(s), {totals.erreurs} échec(s) "
+          f"en {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return 1 if totals.erreurs else 0
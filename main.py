@@ -1,7 +1,14 @@
-from core.ui import QApplication, MapWindow
+import multiprocessing
 import sys
 
-app = QApplication(sys.argv)
-window = MapWindow()
-window.show()
-sys.exit(app.exec_())
\ No newline at end of file
+if __name__ == '__main__':
+    # Nécessaire pour le pool d'import (processus lancés en "spawn" / exécutable PyInstaller)
+    multiprocessing.freeze_support()
+    
+    # Import de Qt uniquement dans le processus principal, pas dans les processus d'import
+    from core.ui import QApplication, MapWindow
+    
+    app = QApplication(sys.argv)
+    window = MapWindow()
+    window.show()
+    sys.exit(app.exec_())
\ No newline at end of file
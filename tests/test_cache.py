@@ -0,0 +1,63 @@
+"""
+Cache des analyses : l'index des fichiers suit l'éviction des entrées
+"""
+import os
+import time
+
+from core.cache import FILES_DIR, INDEX_STALE_SECONDS, ParseCache, _directory_size
+from core.gpx import GPXParser
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="45.0" lon="{lon}"><ele>1000</ele></trkpt>
+    <trkpt lat="45.001" lon="{lon}"><ele>1010</ele></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def _index_files(cache):
+    return sorted(os.listdir(os.path.join(cache.directory, FILES_DIR)))
+
+
+def test_eviction_retire_les_entrees_d_index_orphelines(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    first = tmp_path / "premiere.gpx"
+    first.write_text(GPX.format(lon=6.0), encoding='utf-8')
+    parser = GPXParser(str(first), cache=cache)
+    assert parser.parse()
+    assert cache.lookup_file(str(first)) == parser.content_hash
+
+    # Première entrée la plus ancienne, index écrit il y a longtemps
+    _age(cache._entry_path(parser.content_hash), 3600)
+    for name in _index_files(cache):
+        _age(os.path.join(cache.directory, FILES_DIR, name), INDEX_STALE_SECONDS + 1)
+
+    # Une seule entrée tient dans le cache : la seconde analyse évince la première
+    cache.max_bytes = _directory_size(cache._entry_path(parser.content_hash)) * 3 // 2
+    second = tmp_path / "seconde.gpx"
+    second.write_text(GPX.format(lon=7.0), encoding='utf-8')
+    other = GPXParser(str(second), cache=cache)
+    assert other.parse()
+
+    assert not os.path.exists(cache._entry_path(parser.content_hash))
+    assert os.path.exists(cache._entry_path(other.content_hash))
+    assert cache.lookup_file(str(first)) is None
+    assert cache.lookup_file(str(second)) == other.content_hash
+    assert len(_index_files(cache)) == 1
+
+
+def test_index_recent_garde_pendant_l_analyse(tmp_path):
+    # L'index est écrit avant la publication de l'entrée : il n'est pas retiré tout de suite
+    cache = ParseCache(str(tmp_path / "cache"), max_bytes=1)
+    path = tmp_path / "trace.gpx"
+    path.write_text(GPX.format(lon=6.0), encoding='utf-8')
+    cache.remember_file(str(path), "0" * 40)
+    cache._prune_file_index(set())
+    assert cache.lookup_file(str(path)) == "0" * 40
@@ -0,0 +1,54 @@
+"""
+Seuils des tables MET : les chemins scalaire, par lots et point par point
+doivent donner le même résultat aux bornes
+"""
+import numpy as np
+
+from core.points import PointStore
+from utils.calculator import (_calculate_met, calculate_calories, calculate_calories_batch,
+                              calculate_calories_from_points)
+
+CONFIG = {'poids': 70, 'age': 30, 'sexe': 'homme', 'taille': 175, 'activite_defaut': 'randonnee'}
+
+
+def test_met_randonnee_500m_reste_au_palier_bas():
+    # 7.3 seulement strictement au-delà de 500 m de D+
+    assert _calculate_met('randonnee', 5, 500) == 6.0
+    assert _calculate_met('randonnee', 5, 500.1) == 7.3
+
+
+def test_met_randonnee_500m_par_lots():
+    deniveles = np.array([499.0, 500.0, 501.0])
+    calories = calculate_calories_batch(np.full(3, 10.0), deniveles, np.full(3, 120.0),
+                                        CONFIG, ['randonnee'] * 3)
+    attendues = [calculate_calories(10.0, d, 120.0, CONFIG) for d in deniveles]
+    assert calories.tolist() == attendues
+
+
+def test_met_vitesse_seuil_atteint_passe_au_palier_suivant():
+    # Marche : vitesse < 5 km/h → 3.5, 5 km/h → 4.3 (comportement d'origine)
+    assert _calculate_met('marche', 5, 0) == 4.3
+    assert _calculate_met('marche', 4.99, 0) == 3.5
+
+
+def _trace_montee(n=3601):
+    """Une heure de marche sur ~5 km, 600 m de montée sur la première moitié"""
+    elevations = np.concatenate([np.linspace(0, 600, n // 2), np.full(n - n // 2, 600.0)])
+    return PointStore(45 + np.linspace(0, 0.045, n), np.full(n, 3.0), elevations,
+                      (np.arange(n) * 1e6).astype(np.int64), np.full(n, 3, dtype=np.uint8))
+
+
+def test_calories_points_montee_integree_par_segment():
+    points = _trace_montee()
+    # Vitesse constante : même total que le calcul sur les moyennes
+    assert calculate_calories_from_points(points, CONFIG, 'marche') == calculate_calories(5.0, 600, 60, CONFIG, 'marche')
+    # Randonnée : MET de montée sur la partie pentue seulement
+    assert calculate_calories_from_points(points, CONFIG, 'randonnee') < calculate_calories(5.0, 600, 60, CONFIG, 'randonnee')
+
+
+def test_calories_points_heures_desordonnees():
+    points = _trace_montee()
+    times = points.times.copy()
+    times[[10, 11]] = times[[11, 10]]
+    desordre = PointStore(points.latitudes, points.longitudes, points.elevations, times, points.validity)
+    assert calculate_calories_from_points(desordre, CONFIG, 'marche') is None
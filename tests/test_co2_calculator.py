@@ -0,0 +1,34 @@
+"""
+Bilan CO2 par lots : mêmes valeurs arrondies que le calcul trace par trace
+"""
+import numpy as np
+
+from utils.co2_calculator import calculate_co2_saved, calculate_co2_saved_batch, format_co2_for_export
+from utils.export_engine import _co2_csv_columns
+
+
+def _distances():
+    rng = np.random.default_rng(19)
+    # 79.12844237458852 km : np.round donnait 251.8 jours d'arbre au lieu de 251.9
+    return np.concatenate([[79.12844237458852, 0.0], rng.uniform(0.01, 300.0, 20000)])
+
+
+def test_colonnes_csv_identiques_au_calcul_scalaire():
+    distances = _distances()
+    rows = _co2_csv_columns(distances)
+    for distance, row in zip(distances.tolist(), rows):
+        assert row == format_co2_for_export(calculate_co2_saved(distance), "csv")
+
+
+def test_valeurs_par_lots_identiques_au_calcul_scalaire():
+    distances = _distances()
+    co2 = calculate_co2_saved_batch(distances)
+    voiture = co2.mode_kg('voiture')
+    equivalences = co2.equivalences
+    for i, distance in enumerate(distances.tolist()):
+        expected = calculate_co2_saved(distance)
+        if expected is None:
+            continue
+        assert voiture[i] == expected['transports']['voiture']['co2_kg']
+        for name, values in equivalences.items():
+            assert values[i] == expected['equivalences'][name]
@@ -0,0 +1,117 @@
+"""
+Moteur d'export : JSON identique à json.dump, colonnes CSV, export annulé
+"""
+import csv
+import io
+import json
+
+import pytest
+
+from core.gpx import get_info
+from core.profile import ProfileCache
+from utils.co2_calculator import calculate_co2_saved, format_co2_for_export
+from utils.export_engine import (CSV_FIELDNAMES, ExportCancelled, JsonArrayWriter, export_to_file,
+                                 write_csv_export, write_json_export)
+from utils.metrics_cache import MetricsCache
+
+PROFILE = {'age': 30, 'poids': 70, 'taille': 175, 'sexe': 'Homme', 'fc_repos': 60,
+           'niveau': 'Intermédiaire', 'activite_defaut': 'randonnee'}
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="45.0" lon="6.0"><ele>1000</ele><time>2024-01-05T10:00:00Z</time></trkpt>
+    <trkpt lat="45.01" lon="6.01"><ele>1080</ele><time>2024-01-05T10:20:00Z</time></trkpt>
+    <trkpt lat="45.02" lon="6.0"><ele>1050</ele><time>2024-01-05T10:35:00Z</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+@pytest.fixture
+def metrics_cache(tmp_path):
+    config_file = tmp_path / "user_profile.json"
+    config_file.write_text(json.dumps(PROFILE), encoding='utf-8')
+    return MetricsCache(profile_cache=ProfileCache(str(config_file)))
+
+
+@pytest.fixture
+def traces(tmp_path):
+    result = []
+    for index, color in enumerate(['#FF0000', '#00FF00']):
+        path = tmp_path / f"sortie_été_{index}.gpx"
+        path.write_text(GPX, encoding='utf-8')
+        data = get_info(str(path), verbose=False, use_cache=False)
+        data['activity'] = 'randonnee'
+        result.append({'data': data, 'color': color})
+    return result
+
+
+def _write_array(header, items, footer):
+    sink = io.StringIO()
+    writer = JsonArrayWriter(sink, header, 'traces')
+    for item in items:
+        writer.write(item)
+    writer.close(footer)
+    return sink.getvalue()
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    [{'nom': 'Été', 'valeurs': [1, 2.5, None], 'vide': {}, 'liste_vide': []}],
+    [{'a': 1}, {'b': {'c': [{'d': 'é'}]}}, 3, "texte"],
+])
+def test_tableau_json_identique_a_json_dump(items):
+    header = {'export_date': '2024-01-05T10:00:00', 'user_profile': {'poids': 70, 'sexe': 'Homme'}}
+    footer = {'summary': {'total_traces': len(items), 'message': "Ligne 1\nLigne 2"}}
+    expected = json.dumps(dict(header, traces=items, **footer), indent=2, ensure_ascii=False)
+    assert _write_array(header, items, footer) == expected
+
+
+def test_tableau_json_vide_sans_pied():
+    assert _write_array({'a': None}, [], None) == json.dumps({'a': None, 'traces': []}, indent=2)
+
+
+@pytest.mark.parametrize('count', [0, 2])
+def test_export_json_identique_a_json_dump(traces, metrics_cache, count):
+    sink = io.StringIO()
+    totals = write_json_export(traces[:count], sink, dict(PROFILE), metrics_cache)
+    output = sink.getvalue()
+    document = json.loads(output)
+    assert output == json.dumps(document, indent=2, ensure_ascii=False)
+    assert totals.traces == len(document['traces']) == count
+    assert document['summary']['total_traces'] == count
+
+
+def test_export_csv_colonnes_et_valeurs(traces, metrics_cache):
+    sink = io.StringIO(newline='')
+    write_csv_export(traces, sink, dict(PROFILE), metrics_cache)
+    rows = list(csv.DictReader(io.StringIO(sink.getvalue(), newline='')))
+
+    assert list(rows[0]) == CSV_FIELDNAMES
+    assert len(rows) == len(traces)
+    for trace, row in zip(traces, rows):
+        data = trace['data']
+        derived = metrics_cache.trace_metrics(data, config=dict(PROFILE))
+        assert row['Fichier'] == data['filename']
+        assert row['Couleur'] == trace['color']
+        assert row['Distance (km)'] == f"{data['distance_km']:.2f}"
+        assert row['D+ (m)'] == f"{data['denivele']['positif']:.0f}"
+        assert row['Points'] == str(data['summary'].nb_points)
+        assert row['Calories'] == f"{derived.calories:.0f}"
+        for column, value in format_co2_for_export(calculate_co2_saved(data['distance_km']), "csv").items():
+            assert row[column] == value
+
+
+@pytest.mark.parametrize('export_format', ['json', 'csv', 'points_ndjson'])
+def test_export_annule_ne_laisse_aucun_fichier(tmp_path, traces, metrics_cache, export_format):
+    output_dir = tmp_path / "exports"
+    output_dir.mkdir()
+
+    def cancel(done):
+        raise ExportCancelled()
+
+    with pytest.raises(ExportCancelled):
+        export_to_file(str(output_dir / "export.out"), export_format, traces, dict(PROFILE),
+                       metrics_cache, progress=cancel)
+    assert list(output_dir.iterdir()) == []
@@ -0,0 +1,150 @@
+"""
+Lecture en flux : mêmes points, même source et mêmes métadonnées que gpxpy
+"""
+import numpy as np
+import pytest
+
+from core.gpx import GPXParser
+from core.gpx_stream import parse_gpx_time, read_gpx_header
+
+GPX_11_TRACK = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <metadata>
+    <name>Boucle</name>
+    <desc>Sortie du matin</desc>
+    <author><name>Gandalf</name></author>
+    <time>2024-01-05T09:00:00Z</time>
+  </metadata>
+  <wpt lat="45.0" lon="6.0"><name>Départ</name></wpt>
+  <trk>
+    <name>Trace</name>
+    <trkseg>
+      <trkpt lat="45.0" lon="6.0"><ele>1000.0</ele><time>2024-01-05T10:00:00Z</time></trkpt>
+      <trkpt lat="45.001" lon="6.001"><ele>1010.5</ele><time>2024-01-05T10:01:00Z</time></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="45.002" lon="6.002"><time>2024-01-05T10:02:00Z</time></trkpt>
+      <trkpt lat="45.003" lon="6.003"><ele>1020.0</ele></trkpt>
+      <trkpt lat="45.004" lon="6.004"></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+GPX_10_TRACK = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.0" creator="test" xmlns="http://www.topografix.com/GPX/1/0">
+  <name>Ancienne trace</name>
+  <desc>Format 1.0</desc>
+  <author>Frodon</author>
+  <time>2010-06-01T08:00:00Z</time>
+  <trk>
+    <trkseg>
+      <trkpt lat="48.85" lon="2.35"><ele>35</ele><time>2010-06-01T08:00:00Z</time></trkpt>
+      <trkpt lat="48.86" lon="2.36"><ele>40</ele><time>2010-06-01T08:05:00Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+GPX_ROUTE = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <wpt lat="44.0" lon="5.0"><name>Ignoré</name></wpt>
+  <rte>
+    <name>Itinéraire</name>
+    <rtept lat="44.0" lon="5.0"><ele>500</ele></rtept>
+    <rtept lat="44.01" lon="5.01"></rtept>
+    <rtept lat="44.02" lon="5.02"><ele>520</ele></rtept>
+  </rte>
+</gpx>
+"""
+
+GPX_WAYPOINTS = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <wpt lat="43.0" lon="4.0"><ele>10</ele><time>2024-03-01T12:00:00Z</time></wpt>
+  <wpt lat="43.1" lon="4.1"></wpt>
+</gpx>
+"""
+
+# Horodatage refusé par datetime.fromisoformat : délégué à gpxpy
+GPX_UNUSUAL_TIME = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk>
+    <trkseg>
+      <trkpt lat="45.0" lon="6.0"><time>2024-1-5T10:00:00Z</time></trkpt>
+      <trkpt lat="45.001" lon="6.001"><time>2024-01-05T10:01:00.1234567Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+# Métadonnées avec éléments enfants : seul le texte qui précède le premier enfant compte
+GPX_NESTED_METADATA = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <metadata>
+    <name>Tour <b>du</b> lac</name>
+    <desc><p>Vide avant</p> ensuite</desc>
+    <author><name>Bilbon <i>S.</i></name></author>
+  </metadata>
+  <trk>
+    <trkseg>
+      <trkpt lat="45.0" lon="6.0"><ele>1000</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+def _parse(tmp_path, content, use_gpxpy):
+    path = tmp_path / "trace.gpx"
+    path.write_text(content, encoding='utf-8')
+    parser = GPXParser(str(path), use_cache=False)
+    assert parser.parse(use_gpxpy=use_gpxpy)
+    return parser
+
+
+@pytest.mark.parametrize('content, source_type', [
+    (GPX_11_TRACK, 'tracks'),
+    (GPX_10_TRACK, 'tracks'),
+    (GPX_ROUTE, 'routes'),
+    (GPX_WAYPOINTS, 'waypoints'),
+    (GPX_UNUSUAL_TIME, 'tracks'),
+])
+def test_lecture_en_flux_identique_a_gpxpy(tmp_path, content, source_type):
+    stream = _parse(tmp_path, content, use_gpxpy=False)
+    reference = _parse(tmp_path, content, use_gpxpy=True)
+
+    assert stream.source_type == reference.source_type == source_type
+    assert stream.metadata == reference.metadata
+    for column in ('latitudes', 'longitudes', 'elevations', 'times', 'validity'):
+        np.testing.assert_array_equal(getattr(stream.points, column), getattr(reference.points, column))
+    assert stream.get_summary() == reference.get_summary()
+
+
+def test_points_sans_altitude_ni_horodatage(tmp_path):
+    points = _parse(tmp_path, GPX_11_TRACK, use_gpxpy=False).points
+    assert [point.elevation for point in points] == [1000.0, 1010.5, None, 1020.0, None]
+    assert [point.time is None for point in points] == [False, False, False, True, True]
+
+
+def test_horodatage_inhabituel_repris_par_gpxpy():
+    assert parse_gpx_time('2024-1-5T10:00:00Z') == parse_gpx_time('2024-01-05T10:00:00Z')
+    assert parse_gpx_time('pas une date') is None
+
+
+def test_metadonnees_avec_elements_enfants(tmp_path):
+    stream = _parse(tmp_path, GPX_NESTED_METADATA, use_gpxpy=False)
+    reference = _parse(tmp_path, GPX_NESTED_METADATA, use_gpxpy=True)
+    # Texte avant le premier enfant, comme gpxpy (la lecture en flux retire les espaces)
+    assert stream.metadata['nom'] == reference.metadata['nom'].strip() == "Tour"
+    assert stream.metadata['auteur'] == reference.metadata['auteur'].strip() == "Bilbon"
+    assert stream.metadata['description'] == reference.metadata['description'] == "Aucune description"
+
+
+@pytest.mark.parametrize('content', [GPX_11_TRACK, GPX_10_TRACK, GPX_NESTED_METADATA])
+def test_en_tete_identique_a_la_lecture_complete(tmp_path, content):
+    parser = _parse(tmp_path, content, use_gpxpy=False)
+    header = read_gpx_header(str(tmp_path / "trace.gpx"))
+    for key in ('nom', 'description', 'auteur', 'date_creation'):
+        if header.get(key):
+            assert header[key] == parser.metadata[key]
+    assert (header.get('nom') or "Sans nom") == parser.metadata['nom']
@@ -0,0 +1,59 @@
+"""
+Cache des métriques : l'affichage et l'export d'une trace partagent leurs entrées
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.points import PointStoreBuilder
+from core.profile import ProfileCache
+from utils.metrics_cache import MetricsCache
+
+PROFILE = {'age': 30, 'poids': 70, 'taille': 175, 'sexe': 'Homme', 'fc_repos': 60,
+           'niveau': 'Intermédiaire', 'activite_defaut': 'marche'}
+
+
+@pytest.fixture
+def metrics_cache(tmp_path):
+    config_file = tmp_path / "user_profile.json"
+    config_file.write_text(json.dumps(PROFILE), encoding='utf-8')
+    return MetricsCache(profile_cache=ProfileCache(str(config_file)))
+
+
+def _trace(activity='randonnee', points=None):
+    return {
+        'distance_km': 12.0,
+        'denivele': {'positif': 600.0, 'negatif': 600.0},
+        'durée': {'heures': 3, 'minutes': 0, 'secondes': 0},
+        'content_hash': 'abc',
+        'activity': activity,
+        'points': points,
+        'cumulative_distance_m': None,
+    }
+
+
+def test_activite_de_la_trace_commune_a_l_affichage_et_a_l_export(metrics_cache):
+    # Affichage : activité explicite ; export : activité omise, copie du profil
+    displayed = metrics_cache.trace_metrics(_trace(), 'randonnee')
+    exported = metrics_cache.trace_metrics(_trace(), config=dict(PROFILE))
+    assert exported is displayed
+    assert len(metrics_cache) == 1
+
+
+def test_activite_par_defaut_resolue_avant_la_cle(metrics_cache):
+    implicit = metrics_cache.metrics(10.0, 100.0, 120.0)
+    explicit = metrics_cache.metrics(10.0, 100.0, 120.0, 'marche')
+    assert implicit is explicit
+
+
+def test_calories_par_points_et_moyennes_dans_des_entrees_distinctes(metrics_cache):
+    start = datetime(2024, 1, 5, 10, tzinfo=timezone.utc)
+    builder = PointStoreBuilder()
+    for i in range(10):
+        builder.append(45.0 + i * 0.001, 6.0, 1000.0 + i * 5, start + timedelta(seconds=60 * i))
+    points = builder.build()
+    averaged = metrics_cache.trace_metrics(_trace())
+    per_point = metrics_cache.trace_metrics(_trace(points=points))
+    assert per_point is not averaged
+    assert len(metrics_cache) == 2
@@ -0,0 +1,56 @@
+"""
+Budget mémoire des points : réglage hors profil et mémoire comptée
+"""
+import numpy as np
+
+from core.cache import ParseCache
+from core.gpx import get_info
+from core.point_memory import (DEFAULT_POINT_MEMORY_BUDGET, SETTINGS_BUDGET_KEY, budget_from_settings,
+                               resident_nbytes, trace_point_bytes)
+from core.settings import get_app_settings, save_app_settings
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="45.0" lon="6.0"><ele>1000</ele></trkpt>
+    <trkpt lat="45.001" lon="6.001"><ele>1010</ele></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+def test_budget_lu_dans_les_reglages(tmp_path):
+    settings_file = str(tmp_path / "settings.json")
+    assert get_app_settings(settings_file) == {}
+    assert budget_from_settings(get_app_settings(settings_file)) == DEFAULT_POINT_MEMORY_BUDGET
+
+    save_app_settings({SETTINGS_BUDGET_KEY: 512}, settings_file)
+    assert budget_from_settings(get_app_settings(settings_file)) == 512 * 1024 * 1024
+
+
+def test_reglages_illisibles_ignores(tmp_path):
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text("pas du json", encoding='utf-8')
+    assert get_app_settings(str(settings_file)) == {}
+
+
+def test_colonnes_projetees_depuis_le_cache_non_comptees(tmp_path):
+    path = tmp_path / "trace.gpx"
+    path.write_text(GPX, encoding='utf-8')
+    cache = ParseCache(str(tmp_path / "cache"))
+
+    # Première analyse : colonnes en mémoire, comptées
+    parsed = get_info(str(path), verbose=False, cache=cache)
+    assert trace_point_bytes(parsed) == parsed['points'].nbytes + parsed['cumulative_distance_m'].nbytes
+
+    # Relue depuis le cache : fichiers .npy projetés (np.memmap), rien à libérer
+    cached = get_info(str(path), verbose=False, cache=cache)
+    assert isinstance(cached['points'].latitudes, np.memmap)
+    assert trace_point_bytes(cached) == 0
+
+
+def test_vue_d_un_fichier_projete_non_comptee(tmp_path):
+    np.save(tmp_path / "colonne.npy", np.arange(100.0))
+    mapped = np.load(tmp_path / "colonne.npy", mmap_mode='r')
+    assert resident_nbytes(np.asarray(mapped)[10:]) == 0
+    assert resident_nbytes(np.array(mapped)) == mapped.nbytes
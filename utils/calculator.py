@@ -1,3 +1,10 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from core.geo import haversine_distances
+from core.points import TIME_VALID
+
 # Constantes de configuration
 VITESSE_BASE_INTERMEDIAIRE = {
     "marche": 5.0,
@@ -38,20 +45,49 @@ MET_BASE = {
 # Activités sans impact de dénivelé
 ACTIVITES_2D = {"natation", "voile"}
 
+# Codes d'activité des calculs par lots (indice dans ce tuple, -1 = inconnue)
+ACTIVITES = tuple(MET_BASE)
 
-def _estimate_duration(distance_km, denivele_positif, activity, niveau="Intermédiaire"):
+# Tables de seuils de vitesse (km/h) : (seuils croissants, valeurs).
+# La valeur retenue est celle du premier seuil strictement supérieur à la
+# vitesse, la dernière valeur s'applique au-delà du dernier seuil.
+MET_SEUILS = {
+    "voile": ((8, 12, 15, 18, 22), (2.0, 3.0, 3.3, 4.5, 6.5, 9.3)),  # 9.3 : compétition intensive
+    "natation": ((2.0, 2.5, 3.0, 3.5), (6.0, 7.0, 8.3, 10.0, 11.0)),
+    "marche": ((4, 5, 6), (2.5, 3.5, 4.3, 5.0)),
+    "course": ((8, 10, 12), (8.0, 9.0, 11.0, 12.5)),
+}
+
+INTENSITE_SEUILS = {
+    "voile": ((8, 12, 15, 18, 22), (0.30, 0.40, 0.50, 0.60, 0.70, 0.85)),
+    "natation": ((2.0, 2.5, 3.0, 3.5), (0.50, 0.60, 0.70, 0.80, 0.90)),
+}
+
+# Randonnée : MET selon le dénivelé positif (m), 7.3 strictement au-delà de 500 m
+# (table lue avec side='left' : un seuil atteint n'est pas dépassé)
+MET_RANDONNEE_SEUILS = ((500,), (6.0, 7.3))
+
+
+def _lookup_threshold(table, value, side='right'):
     """
-    Estime la durée en minutes pour une activité sans timestamps.
-    
-    Args:
-        distance_km: Distance parcourue en km
-        denivele_positif: Dénivelé positif en mètres
-        activity: Type d'activité
-        niveau: Niveau du pratiquant
-    
-    Returns:
-        float: Durée estimée en minutes
+    Valeur d'une table de seuils pour une valeur scalaire.
+
+    side='right' : premier seuil strictement supérieur à la valeur (valeur < seuil) ;
+    side='left' : premier seuil supérieur ou égal (valeur > seuil pour passer au suivant).
     """
+    seuils, valeurs = table
+    search = bisect_right if side == 'right' else bisect_left
+    return valeurs[search(seuils, value)]
+
+
+def _lookup_threshold_array(table, values, side='right'):
+    """Valeurs d'une table de seuils pour un tableau (searchsorted vectorisé)"""
+    seuils, valeurs = table
+    return np.asarray(valeurs, dtype=np.float64)[np.searchsorted(seuils, values, side=side)]
+
+
+def _estimated_minutes(distance_km, denivele_positif, activity, niveau):
+    """Durée estimée en minutes (scalaires ou tableaux NumPy)"""
     # Calcul temps de base
     vitesse_base = VITESSE_BASE_INTERMEDIAIRE.get(activity, 5.0)
     vitesse_ajustee = vitesse_base * COEF_NIVEAU.get(niveau, 1.0)
@@ -64,7 +100,23 @@ def _estimate_duration(distance_km, denivele_positif, activity, niveau="Intermé
         coef_ajuste = coef_base * COEF_DENIVELE_NIVEAU.get(niveau, 1.0)
         temps_denivele_heures = (denivele_positif / 100) * coef_ajuste
     
-    duree_minutes = (temps_base_heures + temps_denivele_heures) * 60
+    return (temps_base_heures + temps_denivele_heures) * 60
+
+
+def _estimate_duration(distance_km, denivele_positif, activity, niveau="Intermédiaire"):
+    """
+    Estime la durée en minutes pour une activité sans timestamps.
+    
+    Args:
+        distance_km: Distance parcourue en km
+        denivele_positif: Dénivelé positif en mètres
+        activity: Type d'activité
+        niveau: Niveau du pratiquant
+    
+    Returns:
+        float: Durée estimée en minutes
+    """
+    duree_minutes = _estimated_minutes(distance_km, denivele_positif, activity, niveau)
     print(f"⚠️ Durée estimée ({niveau}) : {duree_minutes:.1f} min ({duree_minutes/60:.2f}h)")
     
     return duree_minutes
@@ -72,42 +124,22 @@ def _estimate_duration(distance_km, denivele_positif, activity, niveau="Intermé
 
 def _get_met_voile(vitesse_kmh):
     """Calcule le MET pour la voile selon la vitesse."""
-    thresholds = [(8, 2.0), (12, 3.0), (15, 3.3), (18, 4.5), (22, 6.5)]
-    
-    for seuil, met in thresholds:
-        if vitesse_kmh < seuil:
-            return met
-    return 9.3  # Compétition intensive
+    return _lookup_threshold(MET_SEUILS["voile"], vitesse_kmh)
 
 
 def _get_met_natation(vitesse_kmh):
     """Calcule le MET pour la natation selon la vitesse."""
-    thresholds = [(2.0, 6.0), (2.5, 7.0), (3.0, 8.3), (3.5, 10.0)]
-    
-    for seuil, met in thresholds:
-        if vitesse_kmh < seuil:
-            return met
-    return 11.0
+    return _lookup_threshold(MET_SEUILS["natation"], vitesse_kmh)
 
 
 def _get_met_marche(vitesse_kmh):
     """Calcule le MET pour la marche selon la vitesse."""
-    thresholds = [(4, 2.5), (5, 3.5), (6, 4.3)]
-    
-    for seuil, met in thresholds:
-        if vitesse_kmh < seuil:
-            return met
-    return 5.0
+    return _lookup_threshold(MET_SEUILS["marche"], vitesse_kmh)
 
 
 def _get_met_course(vitesse_kmh):
     """Calcule le MET pour la course selon la vitesse."""
-    thresholds = [(8, 8.0), (10, 9.0), (12, 11.0)]
-    
-    for seuil, met in thresholds:
-        if vitesse_kmh < seuil:
-            return met
-    return 12.5
+    return _lookup_threshold(MET_SEUILS["course"], vitesse_kmh)
 
 
 def _calculate_met(activity, vitesse_kmh, denivele_positif):
@@ -133,7 +165,7 @@ def _calculate_met(activity, vitesse_kmh, denivele_positif):
         return met_calculators[activity](vitesse_kmh)
     
     if activity == "randonnee":
-        return 7.3 if denivele_positif > 500 else 6.0
+        return _lookup_threshold(MET_RANDONNEE_SEUILS, denivele_positif, side='left')
     
     return MET_BASE.get(activity, 5.0)
 
@@ -180,22 +212,12 @@ def calculate_calories(distance_km, denivele_positif, duree_minutes, config, act
 
 def _get_intensite_voile(vitesse_moy):
     """Calcule l'intensité pour la voile selon la vitesse."""
-    thresholds = [(8, 0.30), (12, 0.40), (15, 0.50), (18, 0.60), (22, 0.70)]
-    
-    for seuil, intensite in thresholds:
-        if vitesse_moy < seuil:
-            return intensite
-    return 0.85
+    return _lookup_threshold(INTENSITE_SEUILS["voile"], vitesse_moy)
 
 
 def _get_intensite_natation(vitesse_moy):
     """Calcule l'intensité pour la natation selon la vitesse."""
-    thresholds = [(2.0, 0.50), (2.5, 0.60), (3.0, 0.70), (3.5, 0.80)]
-    
-    for seuil, intensite in thresholds:
-        if vitesse_moy < seuil:
-            return intensite
-    return 0.90
+    return _lookup_threshold(INTENSITE_SEUILS["natation"], vitesse_moy)
 
 
 def _calculate_fc_moyenne(activity, vitesse_moy, denivele_positif, fc_repos, fc_max):
@@ -269,4 +291,253 @@ def calculate_fitness_metrics(distance_km, denivele_positif, duree_minutes, conf
         "fc_moyenne": round(fc_moyenne),
         "fc_max": fc_max,
         "intensite": round(intensite * 100, 1)
-    }
\ No newline at end of file
+    }
+
+
+def activity_codes(activities):
+    """
+    Convertit des noms d'activité en codes pour les calculs par lots.
+
+    Args:
+        activities: Nom d'activité ou séquence de noms
+
+    Returns:
+        np.ndarray: Indice de chaque activité dans ACTIVITES (-1 si inconnue)
+    """
+    lookup = {name: code for code, name in enumerate(ACTIVITES)}
+    if isinstance(activities, str):
+        return np.array([lookup.get(activities, -1)], dtype=np.int64)
+    return np.fromiter((lookup.get(a, -1) for a in activities), dtype=np.int64)
+
+
+def _prepare_batch(distance_km, denivele_positif, duree_minutes, activities, niveau):
+    """
+    Met les entrées d'un lot au même format et estime les durées manquantes.
+
+    Returns:
+        tuple: (distance, denivele, duree_minutes, vitesse_kmh, groupes)
+        - groupes: liste de (activité, indices des éléments de cette activité)
+    """
+    distance, denivele, duree = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(distance_km, dtype=np.float64)),
+        np.atleast_1d(np.asarray(denivele_positif, dtype=np.float64)),
+        np.atleast_1d(np.asarray(duree_minutes, dtype=np.float64)),
+    )
+    duree = duree.copy()
+
+    codes = np.asarray(activities)
+    if codes.dtype.kind not in 'iu':
+        codes = activity_codes(activities if codes.ndim else str(activities))
+    codes = np.broadcast_to(codes, distance.shape)
+
+    # Une passe vectorisée par activité présente dans le lot
+    groups = []
+    for code in np.unique(codes):
+        activity = ACTIVITES[code] if 0 <= code < len(ACTIVITES) else None
+        groups.append((activity, np.flatnonzero(codes == code)))
+
+    manquantes = duree == 0
+    for activity, indices in groups:
+        indices = indices[manquantes[indices]]
+        if len(indices):
+            duree[indices] = _estimated_minutes(distance[indices], denivele[indices], activity, niveau)
+
+    vitesse = np.zeros_like(distance)
+    np.divide(distance, duree / 60, out=vitesse, where=duree > 0)
+    return distance, denivele, duree, vitesse, groups
+
+
+def _calculate_met_array(activity, vitesse_kmh, denivele_positif):
+    """Version vectorisée de _calculate_met pour une seule activité"""
+    if activity in MET_SEUILS:
+        return _lookup_threshold_array(MET_SEUILS[activity], vitesse_kmh)
+    if activity == "randonnee":
+        return _lookup_threshold_array(MET_RANDONNEE_SEUILS, denivele_positif, side='left')
+    return np.full(len(vitesse_kmh), MET_BASE.get(activity, 5.0))
+
+
+def calculate_calories_batch(distance_km, denivele_positif, duree_minutes, config, activities=None):
+    """
+    Calcule les calories brûlées d'un lot de traces (même formule que calculate_calories).
+
+    Args:
+        distance_km: Distances en km (tableau)
+        denivele_positif: Dénivelés positifs en mètres (tableau)
+        duree_minutes: Durées en minutes, 0 = à estimer (tableau)
+        config: Configuration utilisateur (poids, activité, niveau)
+        activities: Noms ou codes d'activité (tableau ou valeur unique, sinon activité par défaut)
+
+    Returns:
+        np.ndarray: Calories brûlées (arrondies à 1 décimale)
+    """
+    if not config:
+        return None
+
+    if activities is None:
+        activities = config["activite_defaut"]
+    niveau = config.get("niveau", "Intermédiaire")
+    poids = config["poids"]
+
+    _, denivele, duree, vitesse, groups = _prepare_batch(
+        distance_km, denivele_positif, duree_minutes, activities, niveau
+    )
+
+    calories = np.empty_like(duree)
+    for activity, indices in groups:
+        met = _calculate_met_array(activity, vitesse[indices], denivele[indices])
+        calories[indices] = met * poids * (duree[indices] / 60)
+        # Bonus dénivelé (non applicable pour activités 2D)
+        if activity not in ACTIVITES_2D:
+            calories[indices] += (denivele[indices] / 100) * poids * 0.5
+
+    return np.round(calories, 1)
+
+
+def calculate_fitness_metrics_batch(distance_km, denivele_positif, duree_minutes, config, activities=None):
+    """
+    Calcule les indicateurs de fitness d'un lot de traces.
+
+    Args:
+        distance_km: Distances en km (tableau)
+        denivele_positif: Dénivelés positifs en mètres (tableau)
+        duree_minutes: Durées en minutes, 0 = à estimer (tableau)
+        config: Configuration utilisateur
+        activities: Noms ou codes d'activité (tableau ou valeur unique, sinon activité par défaut)
+
+    Returns:
+        dict: Tableaux vitesse_moy, fc_moyenne, intensite et fc_max (valeur unique)
+    """
+    if not config:
+        return None
+
+    if activities is None:
+        activities = config.get("activite_defaut", "marche")
+    niveau = config.get("niveau", "Intermédiaire")
+
+    _, denivele, _, vitesse, groups = _prepare_batch(
+        distance_km, denivele_positif, duree_minutes, activities, niveau
+    )
+
+    fc_max = 220 - config["age"]
+    fc_repos = config["fc_repos"]
+
+    intensite = np.empty_like(vitesse)
+    correction = np.zeros_like(vitesse)
+    for activity, indices in groups:
+        if activity in INTENSITE_SEUILS:
+            intensite[indices] = _lookup_threshold_array(INTENSITE_SEUILS[activity], vitesse[indices])
+            if activity == "natation":
+                correction[indices] = -13  # Correction spécifique natation
+        else:
+            # Calcul général pour autres activités
+            vitesse_factor = np.minimum(vitesse[indices] / 10, 0.8)
+            denivele_factor = np.minimum(denivele[indices] / 1000 * 0.1, 0.2)
+            intensite[indices] = np.minimum(0.5 + vitesse_factor + denivele_factor, 1.0)
+
+    fc_moyenne = fc_repos + (fc_max - fc_repos) * intensite + correction
+
+    return {
+        "vitesse_moy": np.round(vitesse, 2),
+        "fc_moyenne": np.rint(fc_moyenne).astype(np.int64),
+        "fc_max": fc_max,
+        "intensite": np.round(intensite * 100, 1)
+    }
+
+
+# Intégration point par point
+SPEED_WINDOW_S = 30  # Fenêtre de lissage de la vitesse et de la pente (bruit GPS)
+PAUSE_SPEED_KMH = 1.0  # En dessous : arrêt
+PAUSE_MAX_SEGMENT_S = 300  # Au-delà : pause ou perte de signal, durée plafonnée
+MET_REPOS = 1.0
+
+# Coût de la montée : 0.5 kcal/kg par 100 m gravis, le calibrage du bonus de
+# dénivelé de calculate_calories, converti en MET sur chaque segment
+COUT_MONTEE_KCAL_KG_M = 0.5 / 100
+
+# Randonnée : une pente locale au-delà de ce seuil compte au MET de montée
+# (MET_RANDONNEE_SEUILS), en dessous au MET de base
+PENTE_MONTEE_RANDONNEE = 0.05
+
+
+def _met_for_segments(activity, vitesse_kmh, pente):
+    """MET de chaque segment d'une trace d'après sa vitesse et sa pente locales (hors montée)"""
+    if activity in MET_SEUILS:
+        return _lookup_threshold_array(MET_SEUILS[activity], vitesse_kmh)
+    if activity == "randonnee":
+        _, (met_plat, met_montee) = MET_RANDONNEE_SEUILS
+        return np.where(pente > PENTE_MONTEE_RANDONNEE, met_montee, met_plat)
+    return np.full(len(vitesse_kmh), MET_BASE.get(activity, 5.0))
+
+
+def calculate_calories_from_points(points, config, activity_type=None, cumulative_distance=None):
+    """
+    Calcule les calories en intégrant le MET segment par segment.
+
+    La vitesse et la pente de chaque segment sont lissées sur SPEED_WINDOW_S
+    secondes. La vitesse donne le MET avec les mêmes seuils que
+    calculate_calories (la randonnée passe au MET de montée selon la pente
+    locale) ; les arrêts comptent au MET de repos. Chaque segment ajoute le
+    coût de sa propre montée, converti en MET sur sa durée.
+
+    Args:
+        points: PointStore de la trace
+        config: Configuration utilisateur (poids, activité)
+        activity_type: Type d'activité (optionnel, sinon utilise config)
+        cumulative_distance: Distance cumulée (m) en chaque point, recalculée si absente
+
+    Returns:
+        float: Calories brûlées (arrondi à 1 décimale), ou None sans profil,
+        avec moins de deux points horodatés ou des heures non croissantes
+        (l'appelant revient alors à calculate_calories)
+    """
+    if not config:
+        return None
+
+    timed = np.flatnonzero(points.validity & TIME_VALID)
+    if len(timed) < 2:
+        return None
+
+    # Segments entre points horodatés consécutifs (les points sans heure sont
+    # inclus dans la distance du segment qui les contient)
+    t = points.times[timed] / 1e6
+    dt = np.diff(t)
+    if (dt < 0).any():
+        # Heures dans le désordre : fenêtres et durées n'ont plus de sens
+        return None
+
+    activity = activity_type or config["activite_defaut"]
+    poids = config["poids"]
+
+    if cumulative_distance is None or len(cumulative_distance) != len(points):
+        _, cumulative_distance = haversine_distances(points.latitudes, points.longitudes)
+    distance = cumulative_distance[timed]
+
+    # Montée cumulée en chaque point (les NaN d'altitude ne comptent pas)
+    deniveles = np.diff(points.elevations)
+    montee_cumulee = np.concatenate(([0.0], np.cumsum(np.where(deniveles > 0, deniveles, 0.0))))
+    montee = montee_cumulee[timed]
+
+    # Fenêtre centrée sur chaque segment
+    milieu = (t[:-1] + t[1:]) * 0.5
+    segments = np.arange(len(dt))
+    debut = np.minimum(np.searchsorted(t, milieu - SPEED_WINDOW_S / 2, side='left'), segments)
+    fin = np.maximum(np.searchsorted(t, milieu + SPEED_WINDOW_S / 2, side='right') - 1, segments + 1)
+    duree_fenetre = t[fin] - t[debut]
+    distance_fenetre = distance[fin] - distance[debut]
+    vitesse = np.zeros(len(dt))
+    np.divide(distance_fenetre, duree_fenetre / 3.6, out=vitesse, where=duree_fenetre > 0)
+    pente = np.zeros(len(dt))
+    np.divide(montee[fin] - montee[debut], distance_fenetre, out=pente, where=distance_fenetre > 0)
+
+    met = _met_for_segments(activity, vitesse, pente)
+    met[vitesse < PAUSE_SPEED_KMH] = MET_REPOS
+    dt = np.clip(dt, 0, PAUSE_MAX_SEGMENT_S)
+
+    # Montée de chaque segment convertie en MET sur sa durée (activités 3D)
+    if activity not in ACTIVITES_2D:
+        met_montee = np.zeros(len(dt))
+        np.divide(np.diff(montee) * COUT_MONTEE_KCAL_KG_M * 3600, dt, out=met_montee, where=dt > 0)
+        met += met_montee
+
+    calories = float(np.dot(met, dt)) / 3600 * poids
+    return round(calories, 1)
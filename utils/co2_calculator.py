@@ -1,3 +1,5 @@
+import numpy as np
+
 # Émissions de CO2 en grammes par kilomètre par personne
 # Sources : ADEME Base Carbone, notre-environnement.gouv.fr, SNCF (2024)
 EMISSIONS_CO2_G_KM = {
@@ -21,6 +23,125 @@ KG_CO2_PAR_ARBRE_AN = 25  # kg de CO2 absorbés par un arbre mature par an
 KM_VOITURE_MOYEN_AN = 13000  # km moyens parcourus par an en voiture
 
 
+TRANSPORT_NAMES = {
+    "voiture": "Voiture thermique",
+    "voiture_elec": "Voiture électrique",
+    "bus": "Bus",
+    "car": "Autocar",
+    "train": "Train régional",
+    "tgv": "TGV",
+    "metro": "Métro",
+    "tramway": "Tramway",
+    "moto": "Moto",
+    "scooter": "Scooter",
+    "avion_court": "Avion court-courrier",
+    "avion_moyen": "Avion moyen-courrier",
+    "avion_long": "Avion long-courrier"
+}
+
+# Colonnes de la matrice CO2 (ordre de EMISSIONS_CO2_G_KM)
+TRANSPORT_MODES = tuple(EMISSIONS_CO2_G_KM)
+_EMISSIONS_VECTOR = np.array([EMISSIONS_CO2_G_KM[mode] for mode in TRANSPORT_MODES], dtype=np.float64)
+
+
+class CO2Matrix:
+    """
+    CO2 évité par un ensemble de traces, pour tous les modes de transport.
+
+    Les valeurs sont calculées en une seule opération (traces × modes). Le dict
+    de calculate_co2_saved n'est construit que pour les traces demandées.
+
+    Attributs:
+        distances_km: Distance de chaque trace (n,)
+        co2_grammes: CO2 en grammes, une colonne par mode de TRANSPORT_MODES (n, m)
+    """
+
+    def __init__(self, distances_km):
+        self.distances_km = np.atleast_1d(np.asarray(distances_km, dtype=np.float64))
+        self.co2_grammes = np.multiply.outer(self.distances_km, _EMISSIONS_VECTOR)
+
+    @property
+    def co2_kg(self) -> np.ndarray:
+        return self.co2_grammes / 1000
+
+    def mode(self, mode) -> np.ndarray:
+        """CO2 en kg de toutes les traces pour un mode de transport"""
+        return self.co2_grammes[:, TRANSPORT_MODES.index(mode)] / 1000
+
+    def mode_kg(self, mode) -> list:
+        """
+        CO2 en kg arrondi comme dans calculate_co2_saved, pour toutes les traces.
+
+        round() est appliqué valeur par valeur : np.round n'arrondit pas les
+        décimales comme round() (quelques écarts sur la dernière décimale).
+        """
+        column = self.co2_grammes[:, TRANSPORT_MODES.index(mode)]
+        return [round(co2_g / 1000, 3) for co2_g in column.tolist()]
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Traces pour lesquelles un bilan existe (distance > 0)"""
+        return self.distances_km > 0
+
+    @property
+    def equivalences(self) -> dict:
+        """Équivalences (listes), calculées et arrondies comme dans calculate_co2_saved"""
+        co2_voiture_kg = self.mode_kg("voiture")
+        return {
+            "arbres_jours": [round(kg / (KG_CO2_PAR_ARBRE_AN / 365), 1) for kg in co2_voiture_kg],
+            "arbres_mois": [round(kg / (KG_CO2_PAR_ARBRE_AN / 12), 2) for kg in co2_voiture_kg],
+            "pct_voiture_annuel": [
+                round((kg / (EMISSIONS_CO2_G_KM["voiture"] * KM_VOITURE_MOYEN_AN / 1000)) * 100, 2)
+                for kg in co2_voiture_kg
+            ]
+        }
+
+    def to_dict(self, index):
+        """Bilan d'une trace au format de calculate_co2_saved (None si distance nulle)"""
+        distance_km = float(self.distances_km[index])
+        if distance_km <= 0:
+            return None
+
+        results = {}
+        for mode, co2_g in zip(TRANSPORT_MODES, self.co2_grammes[index].tolist()):
+            results[mode] = {
+                "co2_grammes": round(co2_g, 1),
+                "co2_kg": round(co2_g / 1000, 3),
+                "nom_francais": _get_transport_name(mode)
+            }
+
+        # Ajout des équivalences pour la comparaison la plus impactante (voiture)
+        co2_voiture_kg = results["voiture"]["co2_kg"]
+
+        equivalences = {
+            "arbres_jours": round(co2_voiture_kg / (KG_CO2_PAR_ARBRE_AN / 365), 1),
+            "arbres_mois": round(co2_voiture_kg / (KG_CO2_PAR_ARBRE_AN / 12), 2),
+            "pct_voiture_annuel": round((co2_voiture_kg / (EMISSIONS_CO2_G_KM["voiture"] * KM_VOITURE_MOYEN_AN / 1000)) * 100, 2)
+        }
+
+        return {
+            "transports": results,
+            "equivalences": equivalences,
+            "distance_km": distance_km
+        }
+
+    def __len__(self):
+        return len(self.distances_km)
+
+
+def calculate_co2_saved_batch(distances_km) -> CO2Matrix:
+    """
+    Calcule le CO2 économisé par un lot de traces.
+
+    Args:
+        distances_km: Distances parcourues en km (tableau)
+
+    Returns:
+        CO2Matrix: Matrice traces × modes de transport
+    """
+    return CO2Matrix(distances_km)
+
+
 def calculate_co2_saved(distance_km):
     """
     Calcule le CO2 économisé par rapport à différents modes de transport.
@@ -34,56 +155,12 @@ def calculate_co2_saved(distance_km):
     if distance_km <= 0:
         return None
     
-    results = {}
-    total_max_co2 = 0
-    
-    # Calcul pour chaque mode de transport
-    for mode, emission_g_km in EMISSIONS_CO2_G_KM.items():
-        co2_g = distance_km * emission_g_km
-        co2_kg = co2_g / 1000
-        
-        results[mode] = {
-            "co2_grammes": round(co2_g, 1),
-            "co2_kg": round(co2_kg, 3),
-            "nom_francais": _get_transport_name(mode)
-        }
-        
-        total_max_co2 = max(total_max_co2, co2_kg)
-    
-    # Ajout des équivalences pour la comparaison la plus impactante (voiture)
-    co2_voiture_kg = results["voiture"]["co2_kg"]
-    
-    equivalences = {
-        "arbres_jours": round(co2_voiture_kg / (KG_CO2_PAR_ARBRE_AN / 365), 1),
-        "arbres_mois": round(co2_voiture_kg / (KG_CO2_PAR_ARBRE_AN / 12), 2),
-        "pct_voiture_annuel": round((co2_voiture_kg / (EMISSIONS_CO2_G_KM["voiture"] * KM_VOITURE_MOYEN_AN / 1000)) * 100, 2)
-    }
-    
-    return {
-        "transports": results,
-        "equivalences": equivalences,
-        "distance_km": distance_km
-    }
+    return CO2Matrix(distance_km).to_dict(0)
 
 
 def _get_transport_name(mode):
     """Retourne le nom français du mode de transport."""
-    names = {
-        "voiture": "Voiture thermique",
-        "voiture_elec": "Voiture électrique",
-        "bus": "Bus",
-        "car": "Autocar",
-        "train": "Train régional",
-        "tgv": "TGV",
-        "metro": "Métro",
-        "tramway": "Tramway",
-        "moto": "Moto",
-        "scooter": "Scooter",
-        "avion_court": "Avion court-courrier",
-        "avion_moyen": "Avion moyen-courrier",
-        "avion_long": "Avion long-courrier"
-    }
-    return names.get(mode, mode)
+    return TRANSPORT_NAMES.get(mode, mode)
 
 
 def get_co2_summary_text(co2_data, format="court"):
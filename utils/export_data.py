@@ -1,238 +1,145 @@
-import json
-import csv
 from datetime import datetime
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
 from core.user_config import get_user_config
-from utils.calculator import calculate_calories, calculate_fitness_metrics
-from utils.co2_calculator import calculate_co2_saved, format_co2_for_export, get_co2_summary_text
+from utils.export_engine import ExportCancelled, export_to_file
+from utils.metrics_cache import get_metrics_cache
 
+# Filtres des boîtes de dialogue, par format
+EXPORT_DIALOGS = {
+    'json': ("Exporter en JSON", "json", "Fichiers JSON (*.json)"),
+    'csv': ("Exporter en CSV", "csv", "Fichiers CSV (*.csv)"),
+    'points_ndjson': ("Exporter les points en NDJSON", "ndjson", "Fichiers NDJSON (*.ndjson *.jsonl)"),
+    'points_parquet': ("Exporter les points en Parquet", "parquet", "Fichiers Parquet (*.parquet)"),
+    'points_arrow': ("Exporter les points en Arrow", "arrow", "Fichiers Arrow (*.arrow *.feather)"),
+}
 
-def export_to_json(parent, traces_data):
-    """Exporte les données en JSON avec stats de santé et CO2"""
+
+class ExportJob(QThread):
+    """
+    Exporte des traces dans un thread, sans bloquer l'interface.
+
+    Le fichier est écrit dans un fichier temporaire puis renommé (voir
+    export_to_file) : un export annulé ne laisse rien sur le disque.
+
+    Signaux:
+        progress(écrites, total): avancement
+        succeeded(totaux): export terminé (ExportTotals)
+        failed(message): erreur d'écriture
+        cancelled(): export annulé
+    """
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_path, export_format, traces_data, config, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.export_format = export_format
+        # Copie de la liste : l'interface peut retirer des traces pendant l'export
+        self.traces_data = list(traces_data)
+        # Traces dont les points ne doivent pas être libérés pendant l'export
+        self.trace_ids = {trace['id'] for trace in self.traces_data}
+        # Copie du profil prise dans le thread de l'interface : le thread
+        # d'export ne relit pas le cache du profil (ses écouteurs touchent Qt)
+        self.config = config
+        self.metrics_cache = get_metrics_cache()
+        self._cancel_requested = False
+        # Au plus ~200 signaux de progression, quel que soit le nombre de traces
+        self._progress_step = max(1, len(self.traces_data) // 200)
+
+    def cancel(self):
+        """Demande l'arrêt de l'export (pris en compte à la trace suivante)"""
+        self._cancel_requested = True
+
+    def _on_progress(self, done):
+        if self._cancel_requested:
+            raise ExportCancelled()
+        if done % self._progress_step == 0 or done == len(self.traces_data):
+            self.progress.emit(done, len(self.traces_data))
+
+    def run(self):
+        try:
+            totals = export_to_file(self.file_path, self.export_format, self.traces_data,
+                                    self.config, self.metrics_cache, progress=self._on_progress)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(totals)
+
+
+def start_export(parent, traces_data, export_format):
+    """
+    Demande le fichier de destination puis lance l'export en arrière-plan.
+
+    Returns:
+        ExportJob: L'export démarré, ou None si rien n'est exporté
+    """
+    # Les traces encore en cours d'analyse n'ont pas de résumé
+    traces_data = [trace for trace in traces_data if not trace['data'].get('summary_pending')]
     if not traces_data:
         QMessageBox.warning(parent, "Aucune donnée", "Aucune trace à exporter.")
-        return
-    
+        return None
+
+    title, extension, file_filter = EXPORT_DIALOGS[export_format]
     file_path, _ = QFileDialog.getSaveFileName(
         parent,
-        "Exporter en JSON",
-        f"export_traces_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-        "Fichiers JSON (*.json)"
+        title,
+        f"export_traces_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        file_filter
     )
-    
+
     if not file_path:
-        return
-    
-    config = get_user_config()
-    export_data = {
-        "export_date": datetime.now().isoformat(),
-        "user_profile": config if config else None,
-        "traces": []
-    }
-    
-    total_co2_saved = None
-    
-    for trace in traces_data:
-        data = trace['data']
-        deniv = data['denivele']
-        duree = data['durée']
-        distance = data['distance_km']
-        
-        duree_minutes = duree['heures'] * 60 + duree['minutes'] + duree['secondes'] / 60
-        
-        # Estimation de durée si nécessaire
-        if duree_minutes == 0 and config:
-            from utils.calculator import _estimate_duration
-            activity = config.get("activite_defaut", "marche")
-            duree_minutes = _estimate_duration(distance, deniv['positif'], activity, config.get("niveau", "Intermédiaire"))
-        
-        trace_export = {
-            "filename": data['filename'],
-            "color": trace['color'],
-            "distance_km": distance,
-            "elevation_gain_m": deniv['positif'],
-            "elevation_loss_m": deniv['negatif'],
-            "duration_hours": duree['heures'],
-            "duration_minutes": duree['minutes'],
-            "duration_seconds": duree['secondes'],
-            "total_points": len(data['points'])
-        }
-        
-        # Ajouter les stats de santé si profil configuré
-        if config:
-            calories = calculate_calories(distance, deniv['positif'], duree_minutes, config)
-            metrics = calculate_fitness_metrics(distance, deniv['positif'], duree_minutes, config)
-            
-            if calories and metrics:
-                # Calcul de l'allure (pace en min/km)
-                allure = (duree_minutes / distance) if distance > 0 else 0
-                
-                trace_export["health_metrics"] = {
-                    "calories_burned": calories,
-                    "average_speed_kmh": metrics['vitesse_moy'],
-                    "average_pace_min_per_km": round(allure, 2),
-                    "average_heart_rate": metrics['fc_moyenne'],
-                    "max_heart_rate": metrics['fc_max'],
-                    "intensity_percent": metrics['intensite']
-                }
-        
-        # Calcul CO2 économisé pour cette trace
-        co2_data = calculate_co2_saved(distance)
-        if co2_data:
-            trace_export["environmental_impact"] = format_co2_for_export(co2_data, "json")
-        
-        export_data["traces"].append(trace_export)
-    
-    # Ajouter les totaux
-    total_distance = sum(t['data']['distance_km'] for t in traces_data)
-    total_deniv_pos = sum(t['data']['denivele']['positif'] for t in traces_data)
-    total_deniv_neg = sum(t['data']['denivele']['negatif'] for t in traces_data)
-    
-    total_seconds = sum(
-        t['data']['durée']['heures'] * 3600 + 
-        t['data']['durée']['minutes'] * 60 + 
-        t['data']['durée']['secondes']
-        for t in traces_data
-    )
-    
-    total_duree_minutes = total_seconds / 60
-    
-    if total_duree_minutes == 0 and config:
-        from utils.calculator import _estimate_duration
-        activity = config.get("activite_defaut", "marche")
-        total_duree_minutes = _estimate_duration(total_distance, total_deniv_pos, activity, config.get("niveau", "Intermédiaire"))
-    
-    export_data["summary"] = {
-        "total_traces": len(traces_data),
-        "total_distance_km": total_distance,
-        "total_elevation_gain_m": total_deniv_pos,
-        "total_elevation_loss_m": total_deniv_neg,
-        "total_duration_minutes": total_duree_minutes
-    }
-    
-    if config:
-        total_calories = calculate_calories(total_distance, total_deniv_pos, total_duree_minutes, config)
-        if total_calories:
-            export_data["summary"]["total_calories_burned"] = total_calories
-    
-    # Calcul CO2 total économisé
-    total_co2_data = calculate_co2_saved(total_distance)
-    if total_co2_data:
-        export_data["summary"]["total_environmental_impact"] = format_co2_for_export(total_co2_data, "json")
-        # Ajouter un message lisible
-        export_data["summary"]["environmental_message"] = get_co2_summary_text(total_co2_data, "detaille")
-    
-    # Sauvegarder
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
-        
-        # Message de succès avec info CO2
-        msg = f"Données exportées dans:\n{file_path}"
-        if total_co2_data:
-            msg += f"\n\n{get_co2_summary_text(total_co2_data, 'court')}"
-        
-        QMessageBox.information(parent, "Export réussi", msg)
-    except Exception as e:
-        QMessageBox.critical(parent, "Erreur d'export", f"Impossible d'exporter les données:\n{str(e)}")
+        return None
+
+    job = ExportJob(file_path, export_format, traces_data, get_user_config(), parent)
+
+    progress_dialog = QProgressDialog("Export des traces...", "Annuler", 0, len(job.traces_data), parent)
+    progress_dialog.setWindowTitle("Export")
+    progress_dialog.setWindowModality(Qt.WindowModal)
+    progress_dialog.setMinimumDuration(500)
+    progress_dialog.setValue(0)
+    progress_dialog.canceled.connect(job.cancel)
+    job.progress.connect(lambda done, total: progress_dialog.setValue(done))
+
+    def on_succeeded(totals):
+        progress_dialog.reset()
+        _show_export_success(parent, file_path, totals)
+
+    def on_failed(message):
+        progress_dialog.reset()
+        QMessageBox.critical(parent, "Erreur d'export", f"Impossible d'exporter les données:\n{message}")
+
+    job.succeeded.connect(on_succeeded)
+    job.failed.connect(on_failed)
+    job.cancelled.connect(progress_dialog.reset)
+    job.finished.connect(progress_dialog.deleteLater)
+    job.finished.connect(job.deleteLater)
+
+    job.start()
+    return job
+
+
+def export_to_json(parent, traces_data):
+    """Exporte les données en JSON avec stats de santé et CO2"""
+    return start_export(parent, traces_data, 'json')
 
 
 def export_to_csv(parent, traces_data):
     """Exporte les données en CSV avec stats de santé et CO2"""
-    if not traces_data:
-        QMessageBox.warning(parent, "Aucune donnée", "Aucune trace à exporter.")
-        return
-    
-    file_path, _ = QFileDialog.getSaveFileName(
-        parent,
-        "Exporter en CSV",
-        f"export_traces_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        "Fichiers CSV (*.csv)"
-    )
-    
-    if not file_path:
-        return
-    
-    config = get_user_config()
-    total_distance = 0
-    
-    try:
-        with open(file_path, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = [
-                'Fichier', 'Couleur', 'Distance (km)', 'D+ (m)', 'D- (m)',
-                'Durée (h)', 'Durée (min)', 'Durée (s)', 'Points',
-                'Calories', 'Vitesse moy. (km/h)', 'Allure (min/km)', 
-                'FC moy. (bpm)', 'Intensité (%)',
-                'CO2 économisé voiture (kg)', 'CO2 économisé bus (kg)', 
-                'CO2 économisé train (kg)', 'Équiv. arbres (jours)'
-            ]
-            
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for trace in traces_data:
-                data = trace['data']
-                deniv = data['denivele']
-                duree = data['durée']
-                distance = data['distance_km']
-                total_distance += distance
-                
-                duree_minutes = duree['heures'] * 60 + duree['minutes'] + duree['secondes'] / 60
-                
-                if duree_minutes == 0 and config:
-                    from utils.calculator import _estimate_duration
-                    activity = config.get("activite_defaut", "marche")
-                    duree_minutes = _estimate_duration(distance, deniv['positif'], activity, config.get("niveau", "Intermédiaire"))
-                
-                row = {
-                    'Fichier': data['filename'],
-                    'Couleur': trace['color'],
-                    'Distance (km)': f"{distance:.2f}",
-                    'D+ (m)': f"{deniv['positif']:.0f}",
-                    'D- (m)': f"{deniv['negatif']:.0f}",
-                    'Durée (h)': duree['heures'],
-                    'Durée (min)': duree['minutes'],
-                    'Durée (s)': duree['secondes'],
-                    'Points': len(data['points']),
-                    'Calories': '',
-                    'Vitesse moy. (km/h)': '',
-                    'Allure (min/km)': '',
-                    'FC moy. (bpm)': '',
-                    'Intensité (%)': '',
-                    'CO2 économisé voiture (kg)': '',
-                    'CO2 économisé bus (kg)': '',
-                    'CO2 économisé train (kg)': '',
-                    'Équiv. arbres (jours)': ''
-                }
-                
-                if config:
-                    calories = calculate_calories(distance, deniv['positif'], duree_minutes, config)
-                    metrics = calculate_fitness_metrics(distance, deniv['positif'], duree_minutes, config)
-                    
-                    if calories and metrics:
-                        # Calcul de l'allure
-                        allure = (duree_minutes / distance) if distance > 0 else 0
-                        
-                        row['Calories'] = f"{calories:.0f}"
-                        row['Vitesse moy. (km/h)'] = f"{metrics['vitesse_moy']:.2f}"
-                        row['Allure (min/km)'] = f"{allure:.2f}"
-                        row['FC moy. (bpm)'] = f"{metrics['fc_moyenne']:.0f}"
-                        row['Intensité (%)'] = f"{metrics['intensite']:.1f}"
-                
-                # Calcul CO2
-                co2_data = calculate_co2_saved(distance)
-                if co2_data:
-                    co2_csv = format_co2_for_export(co2_data, "csv")
-                    row.update(co2_csv)
-                
-                writer.writerow(row)
-        
-        # Message de succès avec info CO2
-        msg = f"Données exportées dans:\n{file_path}"
-        total_co2_data = calculate_co2_saved(total_distance)
-        if total_co2_data:
-            msg += f"\n\n{get_co2_summary_text(total_co2_data, 'court')}"
-        
-        QMessageBox.information(parent, "Export réussi", msg)
-    except Exception as e:
-        QMessageBox.critical(parent, "Erreur d'export", f"Impossible d'exporter les données:\n{str(e)}")
\ No newline at end of file
+    return start_export(parent, traces_data, 'csv')
+
+
+def _show_export_success(parent, file_path, totals):
+    """Message de succès avec info CO2"""
+    msg = f"Données exportées dans:\n{file_path}"
+    if totals.points:
+        msg += f"\n\n{totals.points} point(s) de {totals.traces} trace(s)"
+    co2_message = totals.message()
+    if co2_message:
+        msg += f"\n\n{co2_message}"
+
+    QMessageBox.information(parent, "Export réussi", msg)
@@ -0,0 +1,415 @@
+"""
+Moteur d'export des traces (JSON / CSV), sans dépendance à Qt
+
+Les enregistrements sont écrits dans le flux de sortie au fur et à mesure :
+la mémoire utilisée ne dépend pas du nombre de traces exportées. Les fonctions
+acceptent n'importe quel objet fichier texte et n'importe quel itérable de
+traces ({'data': gpx_data, 'color': ...}).
+"""
+import csv
+import json
+import os
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Optional
+
+from core.gpx import load_trace_points
+from utils.co2_calculator import calculate_co2_saved, calculate_co2_saved_batch, format_co2_for_export, get_co2_summary_text
+from utils.metrics_cache import MetricsCache, get_metrics_cache
+from utils.point_export import write_points_arrow, write_points_ndjson, write_points_parquet
+
+# Résumés par trace, puis export point par point (utils.point_export)
+EXPORT_FORMATS = ('json', 'csv', 'points_ndjson', 'points_parquet', 'points_arrow')
+POINT_EXPORT_FORMATS = ('points_ndjson', 'points_parquet', 'points_arrow')
+
+# Nombre de traces dont le CO2 est calculé ensemble (export CSV)
+CO2_BLOCK_SIZE = 256
+
+CSV_FIELDNAMES = [
+    'Fichier', 'Couleur', 'Distance (km)', 'D+ (m)', 'D- (m)',
+    'Durée (h)', 'Durée (min)', 'Durée (s)', 'Points',
+    'Calories', 'Vitesse moy. (km/h)', 'Allure (min/km)',
+    'FC moy. (bpm)', 'Intensité (%)',
+    'CO2 économisé voiture (kg)', 'CO2 économisé bus (kg)',
+    'CO2 économisé train (kg)', 'Équiv. arbres (jours)'
+]
+
+
+class ExportCancelled(Exception):
+    """Levée par le callback de progression pour interrompre un export"""
+
+
+ProgressCallback = Optional[Callable[[int], None]]
+
+
+class JsonArrayWriter:
+    """
+    Écrit un objet JSON dont une clé contient un tableau alimenté élément par élément.
+
+    Le résultat est identique à json.dump(document, indent=indent) : en-tête,
+    puis le tableau, puis les clés de fin passées à close().
+
+    Args:
+        sink: Flux texte de sortie
+        header: Clés écrites avant le tableau
+        items_key: Nom de la clé du tableau
+        indent: Indentation (comme json.dump)
+    """
+
+    def __init__(self, sink, header: Dict, items_key: str, indent: int = 2):
+        self.sink = sink
+        self.indent = indent
+        self.count = 0
+        sink.write('{')
+        for key, value in header.items():
+            self._write_member(key, value)
+            sink.write(',')
+        sink.write(f'\n{" " * indent}{json.dumps(items_key)}: [')
+
+    def _dumps(self, value, depth):
+        text = json.dumps(value, indent=self.indent, ensure_ascii=False)
+        return text.replace('\n', '\n' + ' ' * (self.indent * depth))
+
+    def _write_member(self, key, value):
+        self.sink.write(f'\n{" " * self.indent}{json.dumps(key)}: {self._dumps(value, 1)}')
+
+    def write(self, item):
+        """Ajoute un élément au tableau"""
+        self.sink.write(',\n' if self.count else '\n')
+        self.sink.write(' ' * (self.indent * 2) + self._dumps(item, 2))
+        self.count += 1
+
+    def close(self, footer: Optional[Dict] = None):
+        """Ferme le tableau puis l'objet, après les clés de fin"""
+        self.sink.write(f'\n{" " * self.indent}]' if self.count else ']')
+        for key, value in (footer or {}).items():
+            self.sink.write(',')
+            self._write_member(key, value)
+        self.sink.write('\n}')
+
+
+class NdjsonWriter:
+    """Écrit un objet JSON par ligne"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.count = 0
+
+    def write(self, item):
+        self.sink.write(json.dumps(item, ensure_ascii=False))
+        self.sink.write('\n')
+        self.count += 1
+
+    def close(self, footer: Optional[Dict] = None):
+        if footer:
+            self.write(footer)
+
+
+class CsvRowWriter:
+    """Écrit une ligne CSV par enregistrement (colonnes manquantes laissées vides)"""
+
+    def __init__(self, sink, fieldnames):
+        self.writer = csv.DictWriter(sink, fieldnames=fieldnames, extrasaction='ignore')
+        self.writer.writeheader()
+        self.count = 0
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.count += 1
+
+    def close(self, footer: Optional[Dict] = None):
+        pass
+
+
+class ExportTotals:
+    """Totaux des traces exportées, accumulés au fil de l'écriture"""
+
+    def __init__(self):
+        self.traces = 0
+        self.distance_km = 0
+        self.denivele_positif = 0
+        self.denivele_negatif = 0
+        self.seconds = 0
+        self.points = 0  # Export point par point uniquement
+        self.co2_data = None
+
+    def add(self, data: Dict):
+        self.traces += 1
+        self.distance_km += data['distance_km']
+        self.denivele_positif += data['denivele']['positif']
+        self.denivele_negatif += data['denivele']['negatif']
+        duree = data['durée']
+        self.seconds += duree['heures'] * 3600 + duree['minutes'] * 60 + duree['secondes']
+
+    def message(self) -> str:
+        """Résumé CO2 court pour le message de fin d'export"""
+        return get_co2_summary_text(self.co2_data, 'court') if self.co2_data else ""
+
+
+def _blocks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        block = list(islice(iterator, size))
+        if not block:
+            return
+        yield block
+
+
+def _trace_metrics(data: Dict, config: Optional[Dict], metrics_cache: MetricsCache):
+    """Métriques d'une trace ; les points d'une trace non chargée sont relus (calories point par point)"""
+    # Copie locale : l'interface peut libérer les points de data pendant l'export
+    points, cumulative_distance = load_trace_points(data)
+    return metrics_cache.trace_metrics(dict(data, points=points, cumulative_distance_m=cumulative_distance),
+                                       config=config)
+
+
+def json_trace_record(trace: Dict, config: Optional[Dict], metrics_cache: MetricsCache) -> Dict:
+    """Enregistrement JSON d'une trace (stats de santé et CO2 compris)"""
+    data = trace['data']
+    deniv = data['denivele']
+    duree = data['durée']
+    distance = data['distance_km']
+
+    # Métriques dérivées (durée estimée si nécessaire), déjà calculées si la trace a été affichée
+    derived = _trace_metrics(data, config, metrics_cache)
+    duree_minutes = derived.duree_minutes
+
+    trace_export = {
+        "filename": data['filename'],
+        "color": trace['color'],
+        "distance_km": distance,
+        "elevation_gain_m": deniv['positif'],
+        "elevation_loss_m": deniv['negatif'],
+        "duration_hours": duree['heures'],
+        "duration_minutes": duree['minutes'],
+        "duration_seconds": duree['secondes'],
+        "total_points": data['summary'].nb_points
+    }
+
+    # Ajouter les stats de santé si profil configuré
+    if config:
+        calories = derived.calories
+        metrics = derived.fitness
+
+        if calories and metrics:
+            # Calcul de l'allure (pace en min/km)
+            allure = (duree_minutes / distance) if distance > 0 else 0
+
+            trace_export["health_metrics"] = {
+                "calories_burned": calories,
+                "average_speed_kmh": metrics['vitesse_moy'],
+                "average_pace_min_per_km": round(allure, 2),
+                "average_heart_rate": metrics['fc_moyenne'],
+                "max_heart_rate": metrics['fc_max'],
+                "intensity_percent": metrics['intensite']
+            }
+
+    # CO2 économisé pour cette trace
+    co2_data = derived.co2
+    if co2_data:
+        trace_export["environmental_impact"] = format_co2_for_export(co2_data, "json")
+
+    return trace_export
+
+
+def write_json_export(traces: Iterable[Dict], sink, config: Optional[Dict] = None,
+                      metrics_cache: Optional[MetricsCache] = None,
+                      progress: ProgressCallback = None) -> ExportTotals:
+    """
+    Exporte des traces en JSON (stats de santé et CO2) dans un flux texte.
+
+    progress est appelé avec le nombre de traces écrites après chacune ; il
+    peut lever ExportCancelled pour interrompre l'export.
+
+    Returns:
+        ExportTotals: Totaux des traces exportées
+    """
+    metrics_cache = metrics_cache or get_metrics_cache()
+    totals = ExportTotals()
+    writer = JsonArrayWriter(sink, {
+        "export_date": datetime.now().isoformat(),
+        "user_profile": config if config else None,
+    }, "traces")
+
+    for trace in traces:
+        writer.write(json_trace_record(trace, config, metrics_cache))
+        totals.add(trace['data'])
+        if progress is not None:
+            progress(totals.traces)
+
+    total_derived = metrics_cache.metrics(totals.distance_km, totals.denivele_positif, totals.seconds / 60,
+                                          config=config)
+
+    summary = {
+        "total_traces": totals.traces,
+        "total_distance_km": totals.distance_km,
+        "total_elevation_gain_m": totals.denivele_positif,
+        "total_elevation_loss_m": totals.denivele_negatif,
+        "total_duration_minutes": total_derived.duree_minutes
+    }
+
+    if config:
+        total_calories = total_derived.calories
+        if total_calories:
+            summary["total_calories_burned"] = total_calories
+
+    # CO2 total économisé
+    totals.co2_data = total_derived.co2
+    if totals.co2_data:
+        summary["total_environmental_impact"] = format_co2_for_export(totals.co2_data, "json")
+        # Ajouter un message lisible
+        summary["environmental_message"] = get_co2_summary_text(totals.co2_data, "detaille")
+
+    writer.close({"summary": summary})
+    return totals
+
+
+def csv_trace_row(trace: Dict, config: Optional[Dict], metrics_cache: MetricsCache) -> Dict:
+    """Ligne CSV d'une trace, colonnes CO2 exceptées"""
+    data = trace['data']
+    deniv = data['denivele']
+    duree = data['durée']
+    distance = data['distance_km']
+
+    derived = _trace_metrics(data, config, metrics_cache)
+    duree_minutes = derived.duree_minutes
+
+    row = {
+        'Fichier': data['filename'],
+        'Couleur': trace['color'],
+        'Distance (km)': f"{distance:.2f}",
+        'D+ (m)': f"{deniv['positif']:.0f}",
+        'D- (m)': f"{deniv['negatif']:.0f}",
+        'Durée (h)': duree['heures'],
+        'Durée (min)': duree['minutes'],
+        'Durée (s)': duree['secondes'],
+        'Points': data['summary'].nb_points
+    }
+
+    if config:
+        calories = derived.calories
+        metrics = derived.fitness
+
+        if calories and metrics:
+            # Calcul de l'allure
+            allure = (duree_minutes / distance) if distance > 0 else 0
+
+            row['Calories'] = f"{calories:.0f}"
+            row['Vitesse moy. (km/h)'] = f"{metrics['vitesse_moy']:.2f}"
+            row['Allure (min/km)'] = f"{allure:.2f}"
+            row['FC moy. (bpm)'] = f"{metrics['fc_moyenne']:.0f}"
+            row['Intensité (%)'] = f"{metrics['intensite']:.1f}"
+
+    return row
+
+
+def _co2_csv_columns(distances_km):
+    """Colonnes CO2 d'un bloc de traces, calculées en une opération (None si distance nulle)"""
+    co2_matrix = calculate_co2_saved_batch(distances_km)
+    columns = {
+        'CO2 économisé voiture (kg)': [f"{v:.2f}" for v in co2_matrix.mode_kg('voiture')],
+        'CO2 économisé bus (kg)': [f"{v:.2f}" for v in co2_matrix.mode_kg('bus')],
+        'CO2 économisé train (kg)': [f"{v:.2f}" for v in co2_matrix.mode_kg('train')],
+        'Équiv. arbres (jours)': [f"{v:.1f}" for v in co2_matrix.equivalences['arbres_jours']]
+    }
+    return [
+        {column: values[i] for column, values in columns.items()} if valid else None
+        for i, valid in enumerate(co2_matrix.valid)
+    ]
+
+
+def write_csv_export(traces: Iterable[Dict], sink, config: Optional[Dict] = None,
+                     metrics_cache: Optional[MetricsCache] = None,
+                     progress: ProgressCallback = None) -> ExportTotals:
+    """
+    Exporte des traces en CSV (stats de santé et CO2) dans un flux texte.
+
+    Le flux doit être ouvert avec newline='' (module csv). progress se
+    comporte comme pour write_json_export.
+
+    Returns:
+        ExportTotals: Totaux des traces exportées
+    """
+    metrics_cache = metrics_cache or get_metrics_cache()
+    totals = ExportTotals()
+    writer = CsvRowWriter(sink, CSV_FIELDNAMES)
+
+    # CO2 calculé par blocs de traces : mémoire bornée, calcul vectorisé
+    for block in _blocks(traces, CO2_BLOCK_SIZE):
+        co2_rows = _co2_csv_columns([trace['data']['distance_km'] for trace in block])
+        for trace, co2_row in zip(block, co2_rows):
+            row = csv_trace_row(trace, config, metrics_cache)
+            if co2_row:
+                row.update(co2_row)
+            writer.write(row)
+            totals.add(trace['data'])
+            if progress is not None:
+                progress(totals.traces)
+
+    writer.close()
+    totals.co2_data = calculate_co2_saved(totals.distance_km)
+    return totals
+
+
+def export_to_file(file_path: str, export_format: str, traces: Iterable[Dict], config: Optional[Dict] = None,
+                   metrics_cache: Optional[MetricsCache] = None,
+                   progress: ProgressCallback = None) -> ExportTotals:
+    """
+    Exporte des traces dans un fichier, de façon atomique.
+
+    L'export est écrit dans un fichier temporaire du même dossier, qui ne
+    remplace le fichier de destination qu'une fois complet : un export annulé
+    ou en échec ne laisse ni fichier tronqué ni fichier temporaire.
+
+    Args:
+        file_path: Fichier de destination
+        export_format: Un des EXPORT_FORMATS
+        traces: Traces à exporter
+        config: Profil utilisateur (stats de santé), ou None ; sert aussi aux
+            métriques, le cache du profil n'est pas relu pendant l'export
+        progress: Callback de progression (peut lever ExportCancelled)
+
+    Returns:
+        ExportTotals: Totaux des traces exportées
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {export_format}")
+
+    # Nom unique : plusieurs exports vers la même destination peuvent tourner ensemble
+    temp_file = f"{file_path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    try:
+        if export_format == 'json':
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                totals = write_json_export(traces, f, config, metrics_cache, progress)
+        elif export_format == 'csv':
+            with open(temp_file, 'w', newline='', encoding='utf-8') as f:
+                totals = write_csv_export(traces, f, config, metrics_cache, progress)
+        else:
+            totals = _export_points(temp_file, export_format, traces, progress)
+        os.replace(temp_file, file_path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    return totals
+
+
+def _export_points(file_path: str, export_format: str, traces: Iterable[Dict],
+                   progress: ProgressCallback) -> ExportTotals:
+    """Export point par point ; les totaux par trace sont accumulés au passage"""
+    totals = ExportTotals()
+
+    def counted(traces):
+        for trace in traces:
+            totals.add(trace['data'])
+            yield trace
+
+    if export_format == 'points_ndjson':
+        with open(file_path, 'w', encoding='utf-8') as f:
+            totals.points = write_points_ndjson(counted(traces), f, progress)
+    else:
+        writer = write_points_parquet if export_format == 'points_parquet' else write_points_arrow
+        with open(file_path, 'wb') as f:
+            totals.points = writer(counted(traces), f, progress)
+    return totals
@@ -0,0 +1,202 @@
+"""
+Cache des métriques dérivées (calories, fitness, CO2) par trace, profil et activité
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from core.profile import ProfileCache, get_profile_cache, profile_fingerprint
+from utils.calculator import (_estimate_duration, calculate_calories, calculate_calories_from_points,
+                              calculate_fitness_metrics)
+from utils.co2_calculator import calculate_co2_saved
+
+DEFAULT_MAX_ENTRIES = 4096
+
+# Valeur par défaut de 'config' : profil courant, lu dans le cache du profil
+CURRENT_PROFILE = object()
+
+
+class TraceMetrics:
+    """
+    Métriques dérivées d'une trace (ou d'un total de traces).
+
+    Le bilan CO2 n'est construit qu'au premier accès (affichage ou export).
+    """
+    __slots__ = ('duree_minutes', 'duree_estimee', 'calories', 'fitness', 'distance_km', '_co2')
+
+    _NOT_COMPUTED = object()
+
+    def __init__(self, duree_minutes: float, duree_estimee: bool, calories: Optional[float],
+                 fitness: Optional[Dict], distance_km: float):
+        self.duree_minutes = duree_minutes
+        self.duree_estimee = duree_estimee
+        self.calories = calories
+        self.fitness = fitness
+        self.distance_km = distance_km
+        self._co2 = self._NOT_COMPUTED
+
+    @property
+    def co2(self) -> Optional[Dict]:
+        if self._co2 is self._NOT_COMPUTED:
+            self._co2 = calculate_co2_saved(self.distance_km)
+        return self._co2
+
+    def duree_dict(self) -> Dict[str, int]:
+        """Durée (éventuellement estimée) au format {'heures', 'minutes', 'secondes'}"""
+        return {
+            'heures': int(self.duree_minutes // 60),
+            'minutes': int(self.duree_minutes % 60),
+            'secondes': int((self.duree_minutes % 1) * 60)
+        }
+
+
+def duree_minutes_from_dict(duree: Dict) -> float:
+    """Convertit un dict {'heures', 'minutes', 'secondes'} en minutes"""
+    return duree['heures'] * 60 + duree['minutes'] + duree['secondes'] / 60
+
+
+def compute_trace_metrics(distance_km, denivele_positif, duree_minutes, config, activity=None,
+                          points=None, cumulative_distance=None) -> TraceMetrics:
+    """
+    Calcule les métriques dérivées sans cache.
+
+    Args:
+        distance_km: Distance en km
+        denivele_positif: Dénivelé positif en mètres
+        duree_minutes: Durée mesurée (0 si la trace n'a pas d'horodatage)
+        config: Profil utilisateur, ou None
+        activity: Code d'activité (par défaut celle du profil)
+        points: PointStore de la trace ; s'il est horodaté, les calories sont
+            intégrées point par point au lieu d'utiliser la vitesse moyenne
+        cumulative_distance: Distance cumulée en chaque point (optionnelle)
+
+    Returns:
+        TraceMetrics: calories et fitness valent None sans profil
+    """
+    calories = fitness = None
+    duree_estimee = False
+
+    if config:
+        activity = activity or config.get("activite_defaut", "marche")
+        trace_config = dict(config)
+        trace_config['activite_defaut'] = activity
+
+        # Durée estimée une seule fois pour les calories et la fitness
+        if duree_minutes == 0:
+            duree_minutes = _estimate_duration(distance_km, denivele_positif, activity,
+                                               config.get("niveau", "Intermédiaire"))
+            duree_estimee = True
+
+        if points is not None and not duree_estimee:
+            calories = calculate_calories_from_points(points, trace_config,
+                                                      cumulative_distance=cumulative_distance)
+        if calories is None:
+            calories = calculate_calories(distance_km, denivele_positif, duree_minutes, trace_config)
+        fitness = calculate_fitness_metrics(distance_km, denivele_positif, duree_minutes, trace_config)
+
+    return TraceMetrics(duree_minutes, duree_estimee, calories, fitness, distance_km)
+
+
+class MetricsCache:
+    """
+    Cache LRU des métriques dérivées.
+
+    Une entrée est indexée par (trace, empreinte du profil, activité). La trace
+    est identifiée par l'empreinte de son contenu (core.cache) : deux imports
+    du même fichier partagent leurs métriques. Quand le profil change, les
+    entrées calculées avec l'ancien profil sont supprimées.
+
+    Args:
+        max_entries: Nombre maximal d'entrées gardées
+        profile_cache: Cache du profil utilisateur (celui du processus par défaut)
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, profile_cache: Optional[ProfileCache] = None):
+        self.max_entries = max_entries
+        self.profile_cache = profile_cache or get_profile_cache()
+        self._entries = OrderedDict()
+        # Les exports tournent hors du thread de l'interface
+        self._lock = threading.Lock()
+        self.profile_cache.add_listener(self._on_profile_changed)
+
+    def trace_metrics(self, gpx_data: Dict, activity: Optional[str] = None,
+                      config=CURRENT_PROFILE) -> TraceMetrics:
+        """Métriques d'une trace (dict retourné par get_info) ; activité de la trace par défaut"""
+        key = gpx_data.get('content_hash') or gpx_data.get('filepath')
+        return self.metrics(
+            gpx_data['distance_km'],
+            gpx_data['denivele']['positif'],
+            duree_minutes_from_dict(gpx_data['durée']),
+            activity or gpx_data.get('activity'),
+            key=('trace', key) if key else None,
+            points=gpx_data.get('points'),
+            cumulative_distance=gpx_data.get('cumulative_distance_m'),
+            config=config
+        )
+
+    def metrics(self, distance_km, denivele_positif, duree_minutes,
+                activity: Optional[str] = None, key=None,
+                points=None, cumulative_distance=None,
+                config=CURRENT_PROFILE) -> TraceMetrics:
+        """
+        Métriques pour des valeurs quelconques (totaux par exemple).
+
+        Sans clé, les valeurs elles-mêmes servent de clé. Les points, s'ils
+        sont fournis, servent au calcul des calories point par point.
+
+        Hors du thread de l'interface, passer config (copie du profil prise
+        dans ce thread) : relire le cache du profil peut appeler ses écouteurs,
+        qui mettent à jour des widgets Qt.
+        """
+        if key is None:
+            key = ('valeurs', distance_km, denivele_positif, duree_minutes)
+        if config is CURRENT_PROFILE:
+            config = self.profile_cache.get()
+            fingerprint = self.profile_cache.fingerprint
+        else:
+            fingerprint = profile_fingerprint(config)
+        # Activité résolue avant la clé : None et l'activité par défaut du
+        # profil donnent la même entrée
+        if config:
+            activity = activity or config.get("activite_defaut", "marche")
+        # Calories point par point ou à la vitesse moyenne : entrées distinctes
+        cache_key = (key, fingerprint, activity, points is not None)
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                return entry
+
+        entry = compute_trace_metrics(distance_km, denivele_positif, duree_minutes,
+                                      config, activity, points, cumulative_distance)
+
+        with self._lock:
+            self._entries[cache_key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _on_profile_changed(self, changed_keys, config):
+        fingerprint = self.profile_cache.fingerprint
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[1] != fingerprint]:
+                del self._entries[cache_key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_default_cache = None
+
+
+def get_metrics_cache() -> MetricsCache:
+    """Retourne le cache de métriques partagé par l'application"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MetricsCache()
+    return _default_cache
@@ -0,0 +1,227 @@
+"""
+Export point par point des traces (Parquet, Arrow IPC ou NDJSON), sans dépendance à Qt
+
+Chaque point devient une ligne : trace, latitude, longitude, altitude, heure,
+distance cumulée, vitesse instantanée et pente. Les colonnes sont calculées
+sur les tableaux du PointStore sans boucle Python et écrites par groupes de
+lignes : seul le groupe en cours est gardé en mémoire.
+
+pyarrow est une dépendance optionnelle, requise uniquement pour Parquet et Arrow.
+"""
+import importlib.util
+import json
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+from core.geo import haversine_distances
+from core.gpx import load_trace_points
+from core.points import ELEVATION_VALID, TIME_VALID
+
+# Nombre de lignes par groupe (row group Parquet, lot Arrow, bloc NDJSON)
+ROW_GROUP_SIZE = 1 << 16
+
+POINT_COLUMNS = ('trace', 'latitude', 'longitude', 'elevation_m', 'time',
+                 'distance_m', 'speed_kmh', 'grade_pct')
+
+
+def point_columns(points, cumulative_distance=None) -> Dict[str, np.ndarray]:
+    """
+    Calcule les colonnes de l'export point par point d'une trace.
+
+    La vitesse et la pente d'un point sont celles du segment qui y arrive
+    (absentes pour le premier point, sans heure, ou sur place).
+
+    Args:
+        points: PointStore de la trace
+        cumulative_distance: Distance cumulée (m) en chaque point, recalculée si absente
+
+    Returns:
+        dict: Colonnes NumPy, et masques de validité '<colonne>_valid'
+    """
+    n = len(points)
+    if cumulative_distance is None or len(cumulative_distance) != n:
+        _, cumulative_distance = haversine_distances(points.latitudes, points.longitudes)
+
+    has_elevation = (points.validity & ELEVATION_VALID).astype(bool)
+    has_time = (points.validity & TIME_VALID).astype(bool)
+
+    segment = np.diff(cumulative_distance, prepend=np.nan)
+    dt = np.diff(points.times, prepend=0) / 1e6
+    speed_valid = has_time & np.roll(has_time, 1) & (dt > 0)
+    dz = np.diff(points.elevations, prepend=np.nan)
+    grade_valid = has_elevation & np.roll(has_elevation, 1) & (segment > 0)
+    if n:
+        speed_valid[0] = grade_valid[0] = False
+
+    speed = np.zeros(n)
+    np.divide(segment * 3.6, dt, out=speed, where=speed_valid)
+    grade = np.zeros(n)
+    np.divide(dz * 100, segment, out=grade, where=grade_valid)
+
+    return {
+        'latitude': points.latitudes,
+        'longitude': points.longitudes,
+        'elevation_m': points.elevations,
+        'elevation_m_valid': has_elevation,
+        'time': points.times,
+        'time_valid': has_time,
+        'distance_m': cumulative_distance,
+        'speed_kmh': speed,
+        'speed_kmh_valid': speed_valid,
+        'grade_pct': grade,
+        'grade_pct_valid': grade_valid,
+    }
+
+
+def _trace_chunks(traces: Iterable[Dict], progress: Optional[Callable[[int], None]]):
+    """Colonnes de chaque trace, découpées en blocs d'au plus ROW_GROUP_SIZE points"""
+    for done, trace in enumerate(traces, 1):
+        data = trace['data']
+        # Les traces non chargées sont relues une à une, sans rester en mémoire
+        columns = point_columns(*load_trace_points(data))
+        n = len(columns['latitude'])
+        for start in range(0, n, ROW_GROUP_SIZE):
+            yield data['filename'], {name: values[start:start + ROW_GROUP_SIZE] for name, values in columns.items()}
+        if progress is not None:
+            progress(done)
+
+
+def write_points_ndjson(traces: Iterable[Dict], sink, progress=None) -> int:
+    """
+    Écrit un objet JSON par point dans un flux texte (valeurs absentes à null).
+
+    Returns:
+        int: Nombre de points écrits
+    """
+    count = 0
+    for filename, chunk in _trace_chunks(traces, progress):
+        times = np.datetime_as_string(chunk['time'].astype('datetime64[us]'), unit='ms', timezone='UTC')
+        prefix = f'{{"trace": {json.dumps(filename, ensure_ascii=False)}, "latitude": '
+        # Valeurs converties en texte JSON colonne par colonne, puis assemblées par ligne
+        rows = zip(
+            _json_numbers(chunk['latitude']),
+            _json_numbers(chunk['longitude']),
+            _json_numbers(chunk['elevation_m'], chunk['elevation_m_valid']),
+            _json_strings(times, chunk['time_valid']),
+            _json_numbers(chunk['distance_m']),
+            _json_numbers(chunk['speed_kmh'], chunk['speed_kmh_valid']),
+            _json_numbers(chunk['grade_pct'], chunk['grade_pct_valid']),
+        )
+        sink.writelines(
+            f'{prefix}{lat}, "longitude": {lon}, "elevation_m": {ele}, "time": {time}, '
+            f'"distance_m": {dist}, "speed_kmh": {speed}, "grade_pct": {grade}}}\n'
+            for lat, lon, ele, time, dist, speed, grade in rows
+        )
+        count += len(chunk['latitude'])
+    return count
+
+
+def _json_numbers(values: np.ndarray, valid: Optional[np.ndarray] = None) -> list:
+    """Nombres au format JSON (null là où la valeur est absente)"""
+    result = list(map(repr, values.tolist()))
+    if valid is not None:
+        for index in np.flatnonzero(~valid).tolist():
+            result[index] = 'null'
+    return result
+
+
+def _json_strings(values: np.ndarray, valid: np.ndarray) -> list:
+    """Chaînes ASCII au format JSON (null là où la valeur est absente)"""
+    result = list(map('"{}"'.format, values.tolist()))
+    for index in np.flatnonzero(~valid).tolist():
+        result[index] = 'null'
+    return result
+
+
+# Formats qui nécessitent pyarrow
+PYARROW_FORMATS = ('points_parquet', 'points_arrow')
+
+
+def pyarrow_available() -> bool:
+    """True si pyarrow est installé (sans l'importer)"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("L'export Parquet / Arrow nécessite le module pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ('trace', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('elevation_m', pa.float64()),
+        ('time', pa.timestamp('us', tz='UTC')),
+        ('distance_m', pa.float64()),
+        ('speed_kmh', pa.float64()),
+        ('grade_pct', pa.float64()),
+    ])
+
+
+def _arrow_batches(pa, schema, traces, progress):
+    """Lots Arrow regroupés jusqu'à ROW_GROUP_SIZE lignes (petites traces fusionnées)"""
+    pending, pending_rows = [], 0
+    for filename, chunk in _trace_chunks(traces, progress):
+        n = len(chunk['latitude'])
+        # Les colonnes sans valeur absente sont reprises sans copie
+        arrays = [
+            pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([filename])).cast(pa.string()),
+            pa.array(chunk['latitude']),
+            pa.array(chunk['longitude']),
+            pa.array(chunk['elevation_m'], mask=~chunk['elevation_m_valid']),
+            pa.array(chunk['time'], type=pa.timestamp('us', tz='UTC'), mask=~chunk['time_valid']),
+            pa.array(chunk['distance_m']),
+            pa.array(chunk['speed_kmh'], mask=~chunk['speed_kmh_valid']),
+            pa.array(chunk['grade_pct'], mask=~chunk['grade_pct_valid']),
+        ]
+        pending.append(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        pending_rows += n
+        if pending_rows >= ROW_GROUP_SIZE:
+            yield pa.Table.from_batches(pending, schema=schema)
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending, schema=schema)
+
+
+def write_points_parquet(traces: Iterable[Dict], sink, progress=None) -> int:
+    """
+    Écrit les points dans un fichier Parquet (flux binaire), un row group par bloc.
+
+    Returns:
+        int: Nombre de points écrits
+    """
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    count = 0
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for table in _arrow_batches(pa, schema, traces, progress):
+            writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+            count += table.num_rows
+    return count
+
+
+def write_points_arrow(traces: Iterable[Dict], sink, progress=None) -> int:
+    """
+    Écrit les points au format Arrow IPC (fichier, flux binaire), lot par lot.
+
+    Returns:
+        int: Nombre de points écrits
+    """
+    pa = _import_pyarrow()
+    import pyarrow.ipc
+
+    schema = _arrow_schema(pa)
+    count = 0
+    with pyarrow.ipc.new_file(sink, schema) as writer:
+        for table in _arrow_batches(pa, schema, traces, progress):
+            writer.write_table(table)
+            count += table.num_rows
+    return count